@@ -1,36 +1,101 @@
-from flask import Flask, request, render_template
+from flask import Flask, abort, request, render_template, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
 from flask_mail import Mail
 from flask_wtf.csrf import CSRFProtect
 from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
 import logging
 import os
+import posixpath
 
 # Загружаем переменные окружения
 load_dotenv()
 
 db = SQLAlchemy()
-migrate = Migrate()
 login_manager = LoginManager()
 mail = Mail()
 csrf = CSRFProtect()
 
+def ensure_directories(app):
+    """Создает директории загрузок, логов и файла SQLite, если их нет"""
+    folders = [app.config['UPLOAD_FOLDER'], app.config['CHAT_FILES_FOLDER'], app.config['TICKET_FILES_FOLDER'], app.config['BLOB_FOLDER']]
+    folders.append(os.path.dirname(app.config['LOG_FILE']))
+    database_url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if database_url.drivername.startswith('sqlite') and database_url.database not in (None, '', ':memory:'):
+        folders.append(os.path.dirname(database_url.database))
+    for folder in folders:
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+
+
+def create_tables(app):
+    """Проверяет подключение к базе данных и создает недостающие таблицы"""
+    try:
+        with app.app_context():
+            # Проверяем подключение
+            with db.engine.connect():
+                app.logger.info('Database connection successful')
+            
+            # Принудительно создаем все таблицы
+            try:
+                db.create_all()
+                app.logger.info('All tables created successfully')
+            except Exception as e:
+                # Если не удалось создать таблицы, логируем ошибку но не прерываем работу
+                app.logger.error(f'create_all failed: {e}')
+    except Exception as e:
+        app.logger.error(f'Database connection failed: {e}')
+        if not app.debug and not app.testing:
+            raise
+
+
 def create_app():
     app = Flask(__name__, instance_path=None, instance_relative_config=False)
     
+    # Быстрый запуск для продакшена: без проверки подключения к БД, create_all,
+    # создания директорий и Flask-Migrate. Схемой и директориями управляет деплой
+    # (scripts/bootstrap_app.py и scripts/add_*.py)
+    app.config['FAST_START'] = os.getenv('FAST_START', 'False').lower() == 'true'
+    # Запуск потоков фоновых задач. Включается только для процесса сервера:
+    # скриптам, тестам и командам flask потоки, пишущие в БД, не нужны
+    app.config['RUN_BACKGROUND_TASKS'] = os.getenv('RUN_BACKGROUND_TASKS', 'False').lower() == 'true'
+    
     # Конфигурация из переменных окружения
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'default-secret-key-change-in-production')
-    # Конфигурация базы данных - создаем в корне проекта
-    db_path = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app.db'))
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-    
-    # Создаем директорию для базы данных если её нет
-    db_dir = os.path.dirname(db_path)
-    if not os.path.exists(db_dir):
-        os.makedirs(db_dir, exist_ok=True)
+    # Конфигурация базы данных: DATABASE_URL, по умолчанию SQLite в корне проекта
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    database_url = make_url(os.getenv('DATABASE_URL') or 'sqlite:///app.db')
+    if database_url.drivername == 'postgres':
+        # Формат postgres:// из панелей хостинга
+        database_url = database_url.set(drivername='postgresql')
+    is_sqlite = database_url.drivername.startswith('sqlite')
+    sqlite_in_memory = is_sqlite and database_url.database in (None, '', ':memory:')
+    if is_sqlite and not sqlite_in_memory:
+        # Относительный путь SQLite считаем от корня проекта, а не от instance/
+        database_url = database_url.set(database=os.path.join(project_root, database_url.database))
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url.render_as_string(hide_password=False)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Пул соединений (QueuePool): размер, переполнение, проверка соединения
+    # перед выдачей и пересоздание старых соединений (секунды)
+    if not sqlite_in_memory:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+            'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true',
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        }
+    # Профиль SQLite: PRAGMA, выполняемые на каждом соединении пула
+    app.config['SQLITE_PROFILE_ENABLED'] = os.getenv('SQLITE_PROFILE_ENABLED', 'True').lower() == 'true'
+    app.config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # миллисекунды
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))  # байты
+    app.config['SQLITE_CACHE_SIZE'] = int(os.getenv('SQLITE_CACHE_SIZE', -65536))  # < 0 — в килобайтах
+    app.config['SQLITE_TEMP_STORE'] = os.getenv('SQLITE_TEMP_STORE', 'MEMORY')
+    # Интервал wal_checkpoint и PRAGMA optimize (секунды, 0 — отключено)
+    app.config['SQLITE_MAINTENANCE_INTERVAL'] = int(os.getenv('SQLITE_MAINTENANCE_INTERVAL', 3600))
     
 
     
@@ -38,12 +103,27 @@ def create_app():
     app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'app/static/uploads')
     app.config['CHAT_FILES_FOLDER'] = os.getenv('CHAT_FILES_FOLDER', 'app/static/chat_files')
     app.config['TICKET_FILES_FOLDER'] = os.getenv('TICKET_FILES_FOLDER', 'app/static/ticket_files')
+    # Хранилище содержимого файлов по SHA-256: файлы загрузок — жесткие ссылки на него,
+    # поэтому папка должна быть на той же файловой системе, что и папки загрузок
+    app.config['BLOB_FOLDER'] = os.getenv('BLOB_FOLDER', 'app/blobs')
+    # Отдача загруженных файлов через /files: send_file (Flask), x-accel-redirect (nginx)
+    # или x-sendfile (Apache). Для nginx внутренний location FILE_ACCEL_PREFIX
+    # указывает на папку FILE_ACCEL_ROOT (по умолчанию корень проекта)
+    app.config['FILE_DELIVERY'] = os.getenv('FILE_DELIVERY', 'send_file').lower()
+    app.config['FILE_ACCEL_PREFIX'] = os.getenv('FILE_ACCEL_PREFIX', '/protected/')
+    app.config['FILE_ACCEL_ROOT'] = os.getenv('FILE_ACCEL_ROOT', project_root)
+    # Время кэширования статики без версии в URL (секунды); статика из static_url()
+    # с хэшем содержимого в ?v= кэшируется как неизменяемая на год
+    app.config['STATIC_CACHE_MAX_AGE'] = int(os.getenv('STATIC_CACHE_MAX_AGE', 3600))
+    # Пересчитывать хэш измененных файлов статики (для разработки; по умолчанию в debug)
+    app.config['STATIC_MANIFEST_RELOAD'] = os.getenv('STATIC_MANIFEST_RELOAD', str(app.debug)).lower() == 'true'
     app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 20 * 1024 * 1024))
-    
-    # Создаем необходимые директории для загрузки файлов
-    for folder in [app.config['UPLOAD_FOLDER'], app.config['CHAT_FILES_FOLDER'], app.config['TICKET_FILES_FOLDER']]:
-        if not os.path.exists(folder):
-            os.makedirs(folder, exist_ok=True)
+    # Очередь удаления файлов с диска: интервал воркера (секунды, 0 — удаление
+    # сразу в запросе) и путей в одной пачке
+    app.config['FILE_CLEANUP_INTERVAL'] = float(os.getenv('FILE_CLEANUP_INTERVAL', 60))
+    app.config['FILE_CLEANUP_BATCH_SIZE'] = int(os.getenv('FILE_CLEANUP_BATCH_SIZE', 200))
+    # Пользователей в одной транзакции при удалении всей группы
+    app.config['USER_DELETE_BATCH_SIZE'] = int(os.getenv('USER_DELETE_BATCH_SIZE', 500))
     
     # Конфигурация почты
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
@@ -53,11 +133,45 @@ def create_app():
     app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME', 'your-email@gmail.com')
     app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD', 'your-app-password')
     app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', 'your-email@gmail.com')
+    # Очередь исходящих писем: интервал воркера (секунды, 0 — воркер отключен),
+    # писем в пачке, число попыток и базовая задержка повтора (секунды, удваивается)
+    app.config['MAIL_QUEUE_INTERVAL'] = float(os.getenv('MAIL_QUEUE_INTERVAL', 2))
+    app.config['MAIL_QUEUE_BATCH_SIZE'] = int(os.getenv('MAIL_QUEUE_BATCH_SIZE', 50))
+    app.config['MAIL_QUEUE_MAX_ATTEMPTS'] = int(os.getenv('MAIL_QUEUE_MAX_ATTEMPTS', 5))
+    app.config['MAIL_QUEUE_RETRY_BACKOFF'] = float(os.getenv('MAIL_QUEUE_RETRY_BACKOFF', 30))
+    # Очистка отправленных и не отправленных писем старше MAIL_QUEUE_RETENTION_DAYS дней
+    # (интервал в секундах, 0 — отключено)
+    app.config['MAIL_QUEUE_PURGE_INTERVAL'] = int(os.getenv('MAIL_QUEUE_PURGE_INTERVAL', 3600))
+    app.config['MAIL_QUEUE_RETENTION_DAYS'] = int(os.getenv('MAIL_QUEUE_RETENTION_DAYS', 7))
+    # Очистка использованных и истекших кодов подтверждения и восстановления
+    # (интервал в секундах, 0 — отключено; строк в одной транзакции удаления)
+    app.config['AUTH_CODE_PURGE_INTERVAL'] = int(os.getenv('AUTH_CODE_PURGE_INTERVAL', 3600))
+    app.config['AUTH_CODE_PURGE_BATCH_SIZE'] = int(os.getenv('AUTH_CODE_PURGE_BATCH_SIZE', 1000))
     
     # Конфигурация платежей
     app.config['YOOKASSA_SHOP_ID'] = os.getenv('YOOKASSA_SHOP_ID', 'your-shop-id')
     app.config['YOOKASSA_SECRET_KEY'] = os.getenv('YOOKASHA_SECRET_KEY', 'your-secret-key')
     app.config['YOOKASSA_TEST_MODE'] = os.getenv('YOOKASSA_TEST_MODE', 'True').lower() == 'true'
+    app.config['YOOKASSA_API_URL'] = os.getenv('YOOKASSA_API_URL', 'https://api.yookassa.ru/v3')
+    # Пул соединений, таймауты (секунды) и повторы GET-запросов к API ЮKassa
+    app.config['YOOKASSA_POOL_SIZE'] = int(os.getenv('YOOKASSA_POOL_SIZE', 10))
+    app.config['YOOKASSA_CONNECT_TIMEOUT'] = float(os.getenv('YOOKASSA_CONNECT_TIMEOUT', 3.05))
+    app.config['YOOKASSA_READ_TIMEOUT'] = float(os.getenv('YOOKASSA_READ_TIMEOUT', 10))
+    app.config['YOOKASSA_MAX_RETRIES'] = int(os.getenv('YOOKASSA_MAX_RETRIES', 3))
+    app.config['YOOKASSA_RETRY_BACKOFF'] = float(os.getenv('YOOKASSA_RETRY_BACKOFF', 0.5))
+    # Сверка зависших платежей: интервал (секунды, 0 — отключено), возраст платежа
+    # в минутах, число параллельных запросов к API и размер пачки для записи в БД
+    app.config['PAYMENT_RECONCILE_INTERVAL'] = int(os.getenv('PAYMENT_RECONCILE_INTERVAL', 300))
+    app.config['PAYMENT_RECONCILE_AGE_MINUTES'] = int(os.getenv('PAYMENT_RECONCILE_AGE_MINUTES', 10))
+    app.config['PAYMENT_RECONCILE_WORKERS'] = int(os.getenv('PAYMENT_RECONCILE_WORKERS', 8))
+    app.config['PAYMENT_RECONCILE_BATCH_SIZE'] = int(os.getenv('PAYMENT_RECONCILE_BATCH_SIZE', 50))
+    # Интервал обработки журнала webhook'ов (секунды, 0 — обработка сразу в запросе)
+    # и число попыток применить событие, после которого оно остается в журнале с ошибкой
+    app.config['PAYMENT_WEBHOOK_INTERVAL'] = int(os.getenv('PAYMENT_WEBHOOK_INTERVAL', 5))
+    app.config['PAYMENT_WEBHOOK_MAX_ATTEMPTS'] = int(os.getenv('PAYMENT_WEBHOOK_MAX_ATTEMPTS', 5))
+    # Время жизни кэша промежуточного статуса платежа (секунды, 0 — без кэша);
+    # финальные статусы (succeeded, canceled) кэшируются бессрочно
+    app.config['PAYMENT_STATUS_CACHE_TTL'] = int(os.getenv('PAYMENT_STATUS_CACHE_TTL', 10))
     
     # Цены подписки
     app.config['SUBSCRIPTION_PRICES'] = {
@@ -67,17 +181,27 @@ def create_app():
         '12': float(os.getenv('SUBSCRIPTION_PRICE_12', 469.00))
     }
     app.config['SUBSCRIPTION_CURRENCY'] = os.getenv('SUBSCRIPTION_CURRENCY', 'RUB')
+    # Время жизни кэша статуса подписки (секунды, 0 — только в рамках запроса)
+    app.config['SUBSCRIPTION_CACHE_TTL'] = int(os.getenv('SUBSCRIPTION_CACHE_TTL', 60))
+    # Время жизни кэша пользователей для load_user (секунды, 0 — без кэша)
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 30))
+    # Проверка версии кэша пользователей (секунды): изменения пользователя в одном
+    # воркере сбрасывают кэш остальных не позже чем через этот интервал
+    app.config['USER_CACHE_CHECK_INTERVAL'] = float(os.getenv('USER_CACHE_CHECK_INTERVAL', 2))
+    # Интервал фоновой очистки истекших подписок (секунды, 0 — отключено)
+    app.config['SUBSCRIPTION_SWEEP_INTERVAL'] = int(os.getenv('SUBSCRIPTION_SWEEP_INTERVAL', 600))
+    # Как часто воркер проверяет версию настроек сайта в БД (секунды, 0 — на каждом чтении)
+    app.config['SITE_SETTINGS_CHECK_INTERVAL'] = float(os.getenv('SITE_SETTINGS_CHECK_INTERVAL', 5))
     
     # Настройки логирования
     app.config['LOG_FILE'] = os.getenv('LOG_FILE', 'logs/app.log')
     app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO')
     
-    # Настройка логирования
-    # Создаем директорию для логов если её нет
-    log_dir = os.path.dirname(app.config['LOG_FILE'])
-    if log_dir and not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    # Создаем директории загрузок, логов и базы данных если их нет
+    if not app.config['FAST_START']:
+        ensure_directories(app)
     
+    # Настройка логирования
     # Настраиваем файловый обработчик
     file_handler = logging.FileHandler(app.config['LOG_FILE'])
     file_handler.setLevel(getattr(logging, app.config['LOG_LEVEL']))
@@ -94,45 +218,25 @@ def create_app():
     
     app.logger.info('Приложение запущено')
     
-    # Настройка кэширования: только SVG кэшируется
-    @app.after_request
-    def add_cache_headers(response):
-        if request.endpoint == 'static':
-            filename = request.path.split('/')[-1]
-            if filename.endswith('.svg'):
-                # SVG файлы кэшируются на 1 год
-                response.cache_control.max_age = 31536000
-                response.cache_control.public = True
-            else:
-                # Все остальное не кэшируется
-                response.cache_control.no_cache = True
-                response.cache_control.no_store = True
-                response.cache_control.must_revalidate = True
-        return response
+    # Заголовки кэширования по таблице политик (services/http_cache.py)
+    from .services.http_cache import init_http_cache
+    init_http_cache(app)
+    # Версии статики по содержимому для static_url() в шаблонах
+    from .services.static_manifest import init_static_manifest
+    init_static_manifest(app)
     
     db.init_app(app)
+    from .services.sqlite_profile import init_sqlite_profile
+    init_sqlite_profile(app)
     
     # Проверка подключения к базе данных и создание таблиц
-    try:
-        with app.app_context():
-            # Проверяем подключение
-            db.engine.connect()
-            app.logger.info('Database connection successful')
-            
-            # Принудительно создаем все таблицы
-            try:
-                db.create_all()
-                app.logger.info('All tables created successfully')
-            except Exception as e:
-                app.logger.error(f'Error creating tables: {e}')
-                # Если не удалось создать таблицы, логируем ошибку но не прерываем работу
-                app.logger.error(f'create_all failed: {e}')
-    except Exception as e:
-        app.logger.error(f'Database connection failed: {e}')
-        if not app.debug and not app.testing:
-            raise
+    if not app.config['FAST_START']:
+        create_tables(app)
+        
+        # Flask-Migrate (команда flask db) тянет за собой alembic
+        from flask_migrate import Migrate
+        Migrate(app, db)
     
-    migrate.init_app(app, db)
     login_manager.init_app(app)
     mail.init_app(app)
     csrf.init_app(app)
@@ -143,6 +247,24 @@ def create_app():
     from .views import bp
     app.register_blueprint(bp)
     
+    # Фоновые задачи регистрируются всегда, а потоки запускаются только с
+    # RUN_BACKGROUND_TASKS (run.py включает их сам)
+    from .services.subscription_sweeper import start_subscription_sweeper
+    start_subscription_sweeper(app)
+    from .services.payment_reconciliation import start_payment_reconciliation
+    start_payment_reconciliation(app)
+    from .services.webhook_inbox import start_webhook_worker
+    start_webhook_worker(app)
+    from .services.mail_queue import start_mail_purge, start_mail_worker
+    start_mail_worker(app)
+    start_mail_purge(app)
+    from .services.auth_codes import start_auth_code_purge
+    start_auth_code_purge(app)
+    from .services.sqlite_profile import start_sqlite_maintenance
+    start_sqlite_maintenance(app)
+    from .services.file_cleanup import start_file_cleanup
+    start_file_cleanup(app)
+    
     # Context processor для проверки технических работ
     @app.context_processor
     def inject_maintenance_mode():
@@ -178,6 +300,24 @@ def create_app():
         except Exception as e:
             app.logger.error(f'Error checking maintenance mode: {e}')
     
+    # Загруженные файлы лежат в static, но отдаются только через /files
+    # с проверкой доступа
+    protected_static = tuple(
+        relative.replace(os.sep, '/') + '/'
+        for relative in (
+            os.path.relpath(os.path.abspath(app.config[key]), app.static_folder)
+            for key in ('UPLOAD_FOLDER', 'CHAT_FILES_FOLDER', 'TICKET_FILES_FOLDER')
+        )
+        if not relative.startswith(os.pardir)
+    )
+    
+    @app.before_request
+    def protect_uploaded_files():
+        if request.endpoint == 'static' and protected_static:
+            filename = posixpath.normpath(request.view_args.get('filename', ''))
+            if (filename + '/').startswith(protected_static):
+                abort(404)
+    
     # Обработчик ошибки 404 на уровне приложения
     @app.errorhandler(404)
     def not_found(error):
@@ -185,21 +325,4 @@ def create_app():
         app.logger.warning(f"404 ошибка: {request.url}")
         return render_template("404.html"), 404
     
-    # Настройка заголовков кеширования для статических файлов
-    @app.after_request
-    def add_cache_headers(response):
-        if response.mimetype in ['image/png', 'image/x-icon', 'image/jpeg', 'image/gif', 'image/webp']:
-            # Для иконок и изображений - короткий кеш
-            response.cache_control.max_age = 300  # 5 минут
-            response.cache_control.public = True
-        elif response.mimetype in ['text/css', 'application/javascript']:
-            # Для CSS и JS - средний кеш
-            response.cache_control.max_age = 3600  # 1 час
-            response.cache_control.public = True
-        else:
-            # Для остальных файлов - стандартный кеш
-            response.cache_control.max_age = 86400  # 24 часа
-            response.cache_control.public = True
-        return response
-    
     return app 
\ No newline at end of file
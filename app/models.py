@@ -4,6 +4,9 @@ from datetime import datetime, timedelta
 import secrets
 from typing import Optional
 
+# Значение access_until для подписок без даты окончания
+ACCESS_UNLIMITED = datetime(9999, 12, 31, 23, 59, 59)
+
 class Group(db.Model):
     """Модель для хранения групп пользователей"""
     id = db.Column(db.Integer, primary_key=True)
@@ -44,12 +47,50 @@ class User(UserMixin, db.Model):
     is_trial_subscription = db.Column(db.Boolean, default=False)  # Пробная подписка на 14 дней
     trial_subscription_expires = db.Column(db.DateTime)  # Дата окончания пробной подписки
     is_verified = db.Column(db.Boolean, default=False)  # Подтверждение email
-    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=True)  # Новая связь с группой
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=True, index=True)  # Новая связь с группой
+    # Денормализованное право доступа, пересчитывается через refresh_access()
+    # при платеже, выдаче подписки, пробном периоде и истечении
+    access_until = db.Column(db.DateTime, index=True)  # До какого момента открыт доступ
+    access_kind = db.Column(db.String(20))  # trial, paid, manual
     submissions = db.relationship('Submission', backref='user', lazy=True, cascade='all, delete-orphan')
     payments = db.relationship('Payment', backref='user', lazy=True, cascade='all, delete-orphan')
     tickets = db.relationship('Ticket', foreign_keys='Ticket.user_id', backref='user', lazy=True, cascade='all, delete-orphan')
     notifications = db.relationship('Notification', backref='user', lazy=True, cascade='all, delete-orphan')
 
+    def has_access(self, now: Optional[datetime] = None) -> bool:
+        """Проверяет право доступа одним сравнением access_until с текущим временем"""
+        if self.access_until is None:
+            return False
+        return self.access_until > (now or datetime.utcnow())
+
+    def refresh_access(self, has_paid: Optional[bool] = None) -> None:
+        """
+        Пересчитывает access_until/access_kind по флагам подписки.
+
+        Вызывается только при событиях, меняющих подписку. has_paid можно
+        передать заранее (например, при массовом пересчёте), иначе наличие
+        успешного платежа проверяется запросом.
+        """
+        grants = []
+        if self.is_trial_subscription:
+            grants.append((self.trial_subscription_expires or ACCESS_UNLIMITED, 'trial'))
+        if self.is_subscribed:
+            until = self.subscription_expires or ACCESS_UNLIMITED
+            if self.is_manual_subscription:
+                grants.append((until, 'manual'))
+            else:
+                if has_paid is None:
+                    has_paid = self.id is not None and Payment.query.filter_by(
+                        user_id=self.id, status='succeeded'
+                    ).first() is not None
+                if has_paid:
+                    grants.append((until, 'paid'))
+
+        if grants:
+            self.access_until, self.access_kind = max(grants, key=lambda grant: grant[0])
+        else:
+            self.access_until, self.access_kind = None, None
+
 class EmailVerification(db.Model):
     """Модель для хранения кодов подтверждения email"""
     id = db.Column(db.Integer, primary_key=True)
@@ -63,6 +104,13 @@ class EmailVerification(db.Model):
     # Связь с пользователем
     user = db.relationship('User', backref=db.backref('email_verifications', cascade='all, delete-orphan'))
     
+    __table_args__ = (
+        db.Index('ix_email_verification_email_is_used', 'email', 'is_used'),
+        db.Index('ix_email_verification_user_id', 'user_id'),
+        # Очистка: использованные коды и истекшие неиспользованные
+        db.Index('ix_email_verification_is_used_expires_at', 'is_used', 'expires_at'),
+    )
+    
     def __repr__(self) -> str:
         return f'<EmailVerification {self.id}: {self.user.email if self.user else "Unknown"}>'
     
@@ -99,6 +147,13 @@ class PasswordReset(db.Model):
     expires_at = db.Column(db.DateTime, nullable=False)
     is_used = db.Column(db.Boolean, default=False)
     
+    __table_args__ = (
+        db.Index('ix_password_reset_code_is_used_expires_at', 'code', 'is_used', 'expires_at'),
+        db.Index('ix_password_reset_email_is_used', 'email', 'is_used'),
+        # Очистка: использованные коды и истекшие неиспользованные
+        db.Index('ix_password_reset_is_used_expires_at', 'is_used', 'expires_at'),
+    )
+    
     def __repr__(self) -> str:
         return f'<PasswordReset {self.id}: {self.email}>'
     
@@ -147,14 +202,20 @@ class Material(db.Model):
     subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
     submissions = db.relationship('Submission', backref='material', lazy=True, cascade="all, delete-orphan")
 
+    # Лекции и задания предмета
+    __table_args__ = (db.Index('ix_material_subject_id_type', 'subject_id', 'type'),)
+
 class Submission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    material_id = db.Column(db.Integer, db.ForeignKey('material.id'), nullable=False)
+    material_id = db.Column(db.Integer, db.ForeignKey('material.id'), nullable=False, index=True)
     file = db.Column(db.String(255))
     text = db.Column(db.Text)
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Одна сдача задания на пользователя, повторная загрузка обновляет её
+    __table_args__ = (db.Index('ix_submission_user_id_material_id', 'user_id', 'material_id', unique=True),)
+
 class Payment(db.Model):
     """Модель для хранения информации о платежах"""
     id = db.Column(db.Integer, primary_key=True)
@@ -164,21 +225,100 @@ class Payment(db.Model):
     currency = db.Column(db.String(3), default='RUB')
     status = db.Column(db.String(20), default='pending')  # pending, succeeded, canceled, failed
     description = db.Column(db.Text)
+    # Когда оплата продлила подписку; NULL — еще не применена. Защищает от повторной
+    # активации независимо от того, кто первым записал статус succeeded
+    activated_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_payment_user_id_status_created_at', 'user_id', 'status', 'created_at'),
+        # Последний платеж пользователя
+        db.Index('ix_payment_user_id_created_at', 'user_id', 'created_at'),
+        # Сверка зависших платежей
+        db.Index('ix_payment_status_created_at', 'status', 'created_at'),
+    )
+    
     def __repr__(self) -> str:
         return f'<Payment {self.yookassa_payment_id}: {self.status}>'
 
+class PaymentWebhookEvent(db.Model):
+    """Входящие webhook'и ЮKassa: журнал только на добавление, обрабатывается фоновым воркером"""
+    id = db.Column(db.Integer, primary_key=True)
+    yookassa_payment_id = db.Column(db.String(255), nullable=False)
+    event = db.Column(db.String(50), nullable=False)  # payment.succeeded, payment.canceled, ...
+    status = db.Column(db.String(20))  # Статус платежа из уведомления
+    payload = db.Column(db.Text, nullable=False)  # Исходный JSON объекта платежа
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime, index=True)  # NULL — ещё не обработан
+    attempts = db.Column(db.Integer, default=0, nullable=False)  # Неудачные попытки применения
+    last_error = db.Column(db.Text)
+
+    # Повторы одного и того же уведомления отбрасываются при вставке
+    __table_args__ = (db.UniqueConstraint('yookassa_payment_id', 'event'),)
+
+    def __repr__(self) -> str:
+        return f'<PaymentWebhookEvent {self.yookassa_payment_id}: {self.event}>'
+
+class OutboundEmail(db.Model):
+    """Очередь исходящих писем, отправляется фоновым воркером"""
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_body = db.Column(db.Text)
+    text_body = db.Column(db.Text)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = db.Column(db.String(32))  # Метка воркера, взявшего письмо в отправку
+    claimed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime)
+
+    # Выборка воркера: письма в статусе pending, чей срок отправки наступил
+    __table_args__ = (db.Index('ix_outbound_email_status_next_attempt', 'status', 'next_attempt_at'),)
+
+    def __repr__(self) -> str:
+        return f'<OutboundEmail {self.id} -> {self.recipient}: {self.status}>'
+
+class FileDeletion(db.Model):
+    """Очередь удаления файлов и папок с диска, обрабатывается фоновым воркером"""
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(500), nullable=False)  # Путь к файлу или папке хранилища
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f'<FileDeletion {self.path}>'
+
+class StoredFile(db.Model):
+    """Реестр файлов хранилища: кто владелец, к чему относится и сколько занимает"""
+    id = db.Column(db.Integer, primary_key=True)
+    # Раздел и путь относительно его папки (uploads/12/3/file.pdf), см. services/stored_files.py
+    path = db.Column(db.String(500), unique=True, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # material, solution, submission, chat, ticket
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # Кто загрузил файл
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), index=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), index=True)
+    size = db.Column(db.BigInteger, nullable=False, default=0)  # Размер в байтах
+    sha256 = db.Column(db.String(64), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Файлы и занятое место пользователя по видам
+    __table_args__ = (db.Index('ix_stored_file_owner_id_kind', 'owner_id', 'kind'),)
+
+    def __repr__(self) -> str:
+        return f'<StoredFile {self.kind}: {self.path}>'
+
 class ChatMessage(db.Model):
     """Модель для хранения сообщений чата"""
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     message = db.Column(db.Text, nullable=False)
     file_path = db.Column(db.String(255))  # Путь к загруженному файлу
     file_name = db.Column(db.String(255))  # Оригинальное имя файла
     file_type = db.Column(db.String(50))   # Тип файла (image, document, etc.)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Связь с пользователем
     user = db.relationship('User', backref=db.backref('chat_messages', cascade='all, delete-orphan'))
@@ -189,11 +329,11 @@ class ChatMessage(db.Model):
 class Ticket(db.Model):
     """Модель для хранения тикетов поддержки"""
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     subject = db.Column(db.String(255), nullable=False)
     message = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, accepted, rejected, closed
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     admin_response = db.Column(db.Text)  # Ответ администратора
     admin_response_at = db.Column(db.DateTime)
@@ -213,7 +353,7 @@ class Ticket(db.Model):
 class TicketFile(db.Model):
     """Модель для хранения файлов, прикрепленных к тикетам"""
     id = db.Column(db.Integer, primary_key=True)
-    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False, index=True)
     file_path = db.Column(db.String(255), nullable=False)
     file_name = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.Integer)  # Размер файла в байтах
@@ -227,7 +367,7 @@ class TicketMessage(db.Model):
     """Модель для хранения сообщений в тикетах"""
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     message = db.Column(db.Text, nullable=False)
     is_admin = db.Column(db.Boolean, default=False)  # True если сообщение от администратора
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -236,6 +376,9 @@ class TicketMessage(db.Model):
     ticket = db.relationship('Ticket', backref='messages')
     user = db.relationship('User', backref='ticket_messages')
     
+    # Сообщения тикета и поиск ответа администратора
+    __table_args__ = (db.Index('ix_ticket_message_ticket_id_is_admin', 'ticket_id', 'is_admin'),)
+    
     def __repr__(self) -> str:
         return f'<TicketMessage {self.id}: {"Admin" if self.is_admin else "User"}>'
 
@@ -250,6 +393,9 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     link = db.Column(db.String(255))  # Ссылка для перехода
     
+    # Непрочитанные уведомления пользователя, новые первыми
+    __table_args__ = (db.Index('ix_notification_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),)
+    
     def __repr__(self) -> str:
         return f'<Notification {self.id}: {self.title}>' 
 
@@ -318,18 +464,14 @@ class SiteSettings(db.Model):
     
     @classmethod
     def get_setting(cls, key: str, default=None):
-        """Получает значение настройки по ключу"""
-        setting = cls.query.filter_by(key=key).first()
-        if setting:
-            # Пытаемся преобразовать в boolean для переключателей
-            if setting.value.lower() in ['true', 'false']:
-                return setting.value.lower() == 'true'
-            return setting.value
-        return default
+        """Получает значение настройки по ключу из снимка настроек процесса"""
+        from .services.site_settings import get_setting
+        return get_setting(key, default)
     
     @classmethod
     def set_setting(cls, key: str, value: str, description: str = None):
-        """Устанавливает значение настройки"""
+        """Устанавливает значение настройки и меняет версию настроек"""
+        from .services.site_settings import bump_settings_version, invalidate_settings
         setting = cls.query.filter_by(key=key).first()
         if setting:
             setting.value = str(value)
@@ -338,5 +480,7 @@ class SiteSettings(db.Model):
         else:
             setting = cls(key=key, value=str(value), description=description)
             db.session.add(setting)
+        bump_settings_version()
         db.session.commit()
+        invalidate_settings()
         return setting
\ No newline at end of file
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import delete, or_, select
+
+from .. import db
+from ..models import EmailVerification, PasswordReset
+from .background import PeriodicTask, start_periodic_task
+
+
+def _purge_table(model, now: datetime, batch_size: int) -> int:
+    """Удаляет использованные и истекшие коды пачками по batch_size строк.
+
+    Условие записано так, чтобы обе ветви OR шли по индексу (is_used, expires_at).
+    Каждая пачка — отдельная транзакция, чтобы не держать блокировку БД.
+    """
+    stale_ids = (
+        select(model.id)
+        .where(
+            or_(
+                model.is_used.is_(True),
+                (model.is_used.is_(False)) & (model.expires_at <= now),
+            )
+        )
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    total = 0
+    while True:
+        result = db.session.execute(
+            delete(model)
+            .where(model.id.in_(stale_ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+
+def purge_auth_codes(now: Optional[datetime] = None, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Удаляет использованные и истекшие коды подтверждения email и восстановления пароля.
+
+    Возвращает количество удалённых строк: {'email_verifications': ..., 'password_resets': ...}.
+    """
+    now = now or datetime.utcnow()
+    batch_size = batch_size or current_app.config["AUTH_CODE_PURGE_BATCH_SIZE"]
+
+    counts = {
+        "email_verifications": _purge_table(EmailVerification, now, batch_size),
+        "password_resets": _purge_table(PasswordReset, now, batch_size),
+    }
+    if any(counts.values()):
+        current_app.logger.info(f"Устаревшие коды удалены: {counts}")
+    return counts
+
+
+def start_auth_code_purge(app: Flask) -> Optional[PeriodicTask]:
+    """Запускает периодическую очистку кодов (AUTH_CODE_PURGE_INTERVAL секунд)."""
+    return start_periodic_task(
+        app,
+        "auth_code_purge",
+        app.config.get("AUTH_CODE_PURGE_INTERVAL", 0),
+        purge_auth_codes,
+    )
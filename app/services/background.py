@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from threading import Event, Thread
+from typing import Callable, Optional
+
+from flask import Flask
+
+from .. import db
+
+
+class PeriodicTask:
+    """Фоновый поток, периодически выполняющий функцию в контексте приложения.
+
+    Каждый процесс (воркер) запускает свою копию задачи, поэтому функции
+    должны быть идемпотентными.
+    """
+
+    def __init__(self, app: Flask, name: str, interval: float, func: Callable[[], object]) -> None:
+        self.app = app
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._wakeup = Event()
+        self._stopped = Event()
+        self._thread: Optional[Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        """True, если поток задачи запущен."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Запускает поток задачи (daemon), если он ещё не запущен."""
+        if self.is_running:
+            return
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, name=f"periodic-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает поток после текущей итерации."""
+        self._stopped.set()
+        self._wakeup.set()
+
+    def trigger(self) -> None:
+        """Запускает внеочередное выполнение, не дожидаясь интервала."""
+        self._wakeup.set()
+
+    def run_once(self) -> object:
+        """Выполняет задачу один раз в контексте приложения."""
+        with self.app.app_context():
+            try:
+                return self.func()
+            except Exception as e:
+                self.app.logger.error(f"Ошибка фоновой задачи {self.name}: {e}")
+                db.session.rollback()
+                return None
+            finally:
+                db.session.remove()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            self.run_once()
+
+
+def start_periodic_task(
+    app: Flask, name: str, interval: float, func: Callable[[], object]
+) -> Optional[PeriodicTask]:
+    """Регистрирует периодическую задачу и запускает ее при RUN_BACKGROUND_TASKS.
+
+    interval <= 0 отключает задачу. Без RUN_BACKGROUND_TASKS (скрипты, тесты,
+    CLI) поток не запускается, но задача регистрируется: ее можно выполнить
+    через run_once(), а очереди обрабатываются сразу в запросе.
+    """
+    if interval <= 0:
+        return None
+    tasks = app.extensions.setdefault("periodic_tasks", {})
+    task = tasks.get(name)
+    if task is None:
+        task = PeriodicTask(app, name, interval, func)
+        tasks[name] = task
+    if app.config.get("RUN_BACKGROUND_TASKS"):
+        task.start()
+    return task
+
+
+def start_background_tasks(app: Flask) -> None:
+    """Запускает все зарегистрированные задачи (точка входа сервера)."""
+    for task in app.extensions.get("periodic_tasks", {}).values():
+        task.start()
+
+
+def get_periodic_task(app: Flask, name: str) -> Optional[PeriodicTask]:
+    """Возвращает зарегистрированную задачу по имени."""
+    return app.extensions.get("periodic_tasks", {}).get(name)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import os
+import uuid
+from typing import Iterable, List
+
+from flask import current_app
+from sqlalchemy import select
+
+from .. import db
+from ..models import StoredFile
+
+
+def blob_path(sha256: str) -> str:
+    """Путь к содержимому в хранилище: BLOB_FOLDER/ab/cd/abcd....
+
+    Два уровня папок по префиксу хэша держат число файлов в папке
+    ограниченным при любом числе загрузок.
+    """
+    return os.path.abspath(
+        os.path.join(current_app.config["BLOB_FOLDER"], sha256[:2], sha256[2:4], sha256)
+    )
+
+
+def link_to_blob(path: str, sha256: str) -> bool:
+    """Делает файл загрузки жесткой ссылкой на содержимое в хранилище.
+
+    Если такое содержимое уже есть, файл по path заменяется ссылкой на него
+    и копия освобождает место. Иначе файл сам становится содержимым
+    хранилища. Путь загрузки при этом не меняется, поэтому пути в БД
+    и ссылки на /static продолжают работать. Возвращает True, если файл
+    был заменен ссылкой на уже хранившуюся копию.
+    """
+    blob = blob_path(sha256)
+    try:
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            os.link(path, blob)
+            return False
+        except FileExistsError:
+            pass
+        if os.path.samefile(path, blob):
+            return False
+        # Ссылка создается рядом под временным именем и атомарно заменяет файл
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        os.link(blob, temp_path)
+        os.replace(temp_path, path)
+        return True
+    except OSError as e:
+        # Например, папки загрузок и хранилища на разных файловых системах:
+        # файл остается самостоятельной копией
+        current_app.logger.warning(f"Хранилище файлов: не удалось связать {path}: {e}")
+        return False
+
+
+def orphan_blob_paths(sha256s: Iterable[str]) -> List[str]:
+    """Пути содержимого, на которое больше не ссылается ни один файл реестра.
+
+    Число ссылок — число строк stored_file с этим хэшем (по индексу).
+    """
+    hashes = {sha256 for sha256 in sha256s if sha256}
+    if not hashes:
+        return []
+    referenced = set(db.session.execute(
+        select(StoredFile.sha256).where(StoredFile.sha256.in_(hashes)).distinct()
+    ).scalars())
+    return [blob_path(sha256) for sha256 in sorted(hashes - referenced)]
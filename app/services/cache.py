@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Hashable, Optional
+import time
+
+
+_DEFAULT = object()
+
+
+class TTLCache:
+    """Потокобезопасный in-memory кэш с временем жизни записей и LRU-вытеснением.
+
+    Живёт в пределах одного процесса: каждый воркер gunicorn держит свою копию,
+    поэтому после изменения данных записи нужно явно инвалидировать.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Возвращает значение по ключу или default, если записи нет или она устарела."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Any = _DEFAULT) -> None:
+        """Сохраняет значение. ttl=None — бессрочно, по умолчанию используется self.ttl."""
+        if ttl is _DEFAULT:
+            ttl = self.ttl
+        if ttl is not None and ttl <= 0:
+            return
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Удаляет запись, если она есть."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Полностью очищает кэш."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
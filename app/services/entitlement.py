@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from flask import current_app, g, has_app_context, has_request_context
+
+from .cache import TTLCache
+
+
+# Кэш результатов check_user_subscription: user_id -> bool.
+# TTL задаётся конфигом SUBSCRIPTION_CACHE_TTL при первом обращении.
+entitlement_cache = TTLCache(ttl=60)
+
+
+def _request_memo() -> Optional[dict]:
+    """Словарь с результатами проверок в рамках текущего запроса."""
+    if not has_request_context():
+        return None
+    memo = g.get("_entitlements")
+    if memo is None:
+        memo = {}
+        g._entitlements = memo
+    return memo
+
+
+def _cache_ttl() -> float:
+    if has_app_context():
+        return float(current_app.config.get("SUBSCRIPTION_CACHE_TTL", entitlement_cache.ttl))
+    return entitlement_cache.ttl
+
+
+def get_cached_entitlement(user_id: int) -> Optional[bool]:
+    """Возвращает закэшированный статус подписки или None, если его нужно вычислить."""
+    memo = _request_memo()
+    if memo is not None and user_id in memo:
+        return memo[user_id]
+    value = entitlement_cache.get(user_id)
+    if value is not None and memo is not None:
+        memo[user_id] = value
+    return value
+
+
+def remember_entitlement(user_id: int, is_active: bool, valid_until: Optional[datetime] = None) -> None:
+    """Сохраняет статус подписки.
+
+    valid_until — момент, после которого активная подписка истекает; запись
+    не переживёт его, даже если TTL кэша больше.
+    """
+    memo = _request_memo()
+    if memo is not None:
+        memo[user_id] = is_active
+
+    ttl = _cache_ttl()
+    if is_active and valid_until is not None:
+        ttl = min(ttl, (valid_until - datetime.utcnow()).total_seconds())
+    entitlement_cache.set(user_id, is_active, ttl=ttl)
+
+
+def invalidate_entitlement(user_id: int) -> None:
+    """Сбрасывает статус подписки пользователя после платежа, выдачи или истечения."""
+    entitlement_cache.delete(user_id)
+    memo = _request_memo()
+    if memo is not None:
+        memo.pop(user_id, None)
+
+
+def clear_entitlements() -> None:
+    """Сбрасывает статусы подписки всех пользователей."""
+    entitlement_cache.clear()
+    memo = _request_memo()
+    if memo is not None:
+        memo.clear()
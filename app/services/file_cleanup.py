@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import os
+import shutil
+from typing import Iterable, List, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import delete, select
+
+from .. import db
+from ..models import FileDeletion
+from .background import PeriodicTask, get_periodic_task, start_periodic_task
+
+
+TASK_NAME = "file_cleanup"
+
+# Папки хранилища, внутри которых воркеру разрешено удалять файлы
+STORAGE_FOLDERS = ("UPLOAD_FOLDER", "CHAT_FILES_FOLDER", "TICKET_FILES_FOLDER", "BLOB_FOLDER")
+
+
+def enqueue_file_deletions(paths: Iterable[str]) -> int:
+    """Добавляет пути в очередь удаления в текущей транзакции.
+
+    Коммит делает вызывающий код: если транзакция откатится, файлы останутся.
+    После коммита нужно вызвать wake_file_cleanup().
+    """
+    rows = [{"path": path} for path in dict.fromkeys(paths)]
+    if rows:
+        db.session.execute(FileDeletion.__table__.insert(), rows)
+    return len(rows)
+
+
+def wake_file_cleanup() -> None:
+    """Будит воркер очистки, а без воркера удаляет файлы сразу."""
+    task = get_periodic_task(current_app._get_current_object(), TASK_NAME)
+    if task is not None and task.is_running:
+        task.trigger()
+    else:
+        process_file_deletions()
+
+
+def _storage_roots() -> List[str]:
+    return [
+        os.path.realpath(current_app.config[key])
+        for key in STORAGE_FOLDERS
+        if current_app.config.get(key)
+    ]
+
+
+def _remove_path(path: str, roots: List[str]) -> None:
+    """Удаляет файл или папку, если путь лежит внутри хранилища.
+
+    После удаления файла удаляет и его папку, если она опустела
+    (сами папки хранилища не удаляются).
+    """
+    real_path = os.path.realpath(path)
+    if not any(real_path.startswith(root + os.sep) for root in roots):
+        current_app.logger.warning(f"Очистка файлов: путь вне хранилища пропущен: {path}")
+        return
+    try:
+        if os.path.isdir(real_path):
+            shutil.rmtree(real_path)
+        elif os.path.exists(real_path):
+            os.remove(real_path)
+    except OSError as e:
+        current_app.logger.error(f"Очистка файлов: не удалось удалить {path}: {e}")
+        return
+    parent = os.path.dirname(real_path)
+    if parent not in roots:
+        try:
+            os.rmdir(parent)
+        except OSError:
+            # В папке остались другие файлы или она уже удалена
+            pass
+
+
+def remove_paths(paths: Iterable[str]) -> None:
+    """Сразу удаляет пути хранилища с диска, минуя очередь."""
+    roots = _storage_roots()
+    for path in paths:
+        _remove_path(path, roots)
+
+
+def process_file_deletions(batch_size: Optional[int] = None) -> int:
+    """Удаляет с диска все пути из очереди. Возвращает число обработанных путей.
+
+    Удаление идемпотентно: если очередь разбирают несколько воркеров,
+    повторное удаление уже удаленного пути ничего не делает.
+    """
+    batch_size = batch_size or current_app.config.get("FILE_CLEANUP_BATCH_SIZE", 200)
+    roots = _storage_roots()
+    processed = 0
+    while True:
+        rows = db.session.execute(
+            select(FileDeletion.id, FileDeletion.path).order_by(FileDeletion.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            _remove_path(row.path, roots)
+        db.session.execute(
+            delete(FileDeletion)
+            .where(FileDeletion.id.in_([row.id for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        processed += len(rows)
+
+    if processed:
+        current_app.logger.info(f"Очистка файлов: удалено путей: {processed}")
+    return processed
+
+
+def start_file_cleanup(app: Flask) -> Optional[PeriodicTask]:
+    """Запускает воркер очистки файлов (FILE_CLEANUP_INTERVAL секунд)."""
+    return start_periodic_task(
+        app,
+        TASK_NAME,
+        app.config.get("FILE_CLEANUP_INTERVAL", 0),
+        process_file_deletions,
+    )
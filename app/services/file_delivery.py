@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+from typing import Optional
+from urllib.parse import quote
+
+from flask import Response, current_app, request, send_file
+from sqlalchemy import select
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file as werkzeug_send_file
+
+from .. import db
+from ..models import StoredFile, SubjectGroup, Ticket, User
+from ..utils.file_storage import FileStorageManager
+from ..utils.payment_service import get_payment_service
+from .stored_files import (
+    KIND_CHAT,
+    KIND_MATERIAL,
+    KIND_SOLUTION,
+    KIND_SUBMISSION,
+    KIND_TICKET,
+    STORAGE_AREAS,
+    storage_key,
+    storage_path,
+)
+
+
+# Способы отдачи файла: сам Flask или фронт-прокси по заголовку ответа
+DELIVERY_SEND_FILE = "send_file"
+DELIVERY_X_ACCEL = "x-accel-redirect"  # nginx
+DELIVERY_X_SENDFILE = "x-sendfile"     # Apache mod_xsendfile, lighttpd
+
+def resolve_file(area: str, relative_path: str) -> Optional[StoredFile]:
+    """Находит файл реестра по разделу и пути из БД.
+
+    Путь не может выйти за пределы папки раздела. Отдаются только файлы
+    из реестра: по его записи проверяется доступ.
+    """
+    if area == "ticket_files":
+        # Вложения ответов пользователя хранятся как ticket_files/файл
+        if ".." in relative_path.split("/"):
+            return None
+        full_path = FileStorageManager.get_ticket_file_full_path(relative_path)
+    elif area in STORAGE_AREAS:
+        # Разделы URL /files/<раздел>/<путь> — разделы хранилища, путь — тот же
+        # относительный путь, что хранится в БД
+        full_path = safe_join(current_app.config[STORAGE_AREAS[area]], relative_path)
+    else:
+        return None
+    if full_path is None:
+        return None
+    try:
+        key = storage_key(full_path)
+    except ValueError:
+        return None
+    return db.session.execute(
+        select(StoredFile).where(StoredFile.path == key)
+    ).scalar_one_or_none()
+
+
+def _has_subject_access(user: User, subject_id: Optional[int]) -> bool:
+    """Подписка и доступ группы пользователя к предмету, как на странице предмета."""
+    if subject_id is None or user.group_id is None:
+        return False
+    if not get_payment_service().check_user_subscription(user):
+        return False
+    return db.session.execute(
+        select(SubjectGroup.id).where(
+            SubjectGroup.subject_id == subject_id,
+            SubjectGroup.group_id == user.group_id,
+        )
+    ).first() is not None
+
+
+def can_download(user: User, stored: StoredFile) -> bool:
+    """Проверяет право пользователя скачать файл реестра."""
+    if user.is_admin:
+        return True
+    if stored.kind in (KIND_MATERIAL, KIND_SOLUTION):
+        return _has_subject_access(user, stored.subject_id)
+    if stored.kind == KIND_SUBMISSION:
+        return stored.owner_id == user.id
+    if stored.kind == KIND_CHAT:
+        # Общий чат: вложения видят все пользователи
+        return True
+    if stored.kind == KIND_TICKET:
+        return db.session.execute(
+            select(Ticket.id).where(Ticket.id == stored.ticket_id, Ticket.user_id == user.id)
+        ).first() is not None
+    return False
+
+
+def _accel_path(path: str) -> Optional[str]:
+    """Внутренний URL nginx для файла или None, если файл вне FILE_ACCEL_ROOT."""
+    root = os.path.abspath(current_app.config["FILE_ACCEL_ROOT"])
+    relative = os.path.relpath(path, root)
+    if relative.startswith(os.pardir):
+        return None
+    prefix = current_app.config["FILE_ACCEL_PREFIX"].rstrip("/")
+    return f"{prefix}/{quote(relative.replace(os.sep, '/'))}"
+
+
+def send_stored_file(stored: StoredFile, download_name: Optional[str] = None) -> Response:
+    """Отдает файл реестра.
+
+    С FILE_DELIVERY=x-accel-redirect или x-sendfile Flask отвечает только
+    заголовками, а байты, Range и условные запросы обрабатывает фронт-прокси,
+    не занимая воркер. Иначе файл отдает send_file с поддержкой Range,
+    If-Modified-Since и ETag.
+    """
+    mode = current_app.config["FILE_DELIVERY"]
+    path = storage_path(stored.path)
+    name = download_name or os.path.basename(path)
+    accel_path = _accel_path(path) if mode == DELIVERY_X_ACCEL else None
+    if mode == DELIVERY_X_ACCEL and accel_path is None:
+        current_app.logger.warning(f"Файл {path} вне FILE_ACCEL_ROOT, отдается через Flask")
+
+    if accel_path is not None or mode == DELIVERY_X_SENDFILE:
+        response = werkzeug_send_file(
+            path,
+            request.environ,
+            download_name=name,
+            use_x_sendfile=True,
+            conditional=False,
+        )
+        if accel_path is not None:
+            del response.headers["X-Sendfile"]
+            response.headers["X-Accel-Redirect"] = accel_path
+    else:
+        response = send_file(path, download_name=name, conditional=True, etag=True)
+    return response
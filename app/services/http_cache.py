@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from typing import Callable, NamedTuple, Tuple
+
+from flask import Flask, Request, Response, current_app, request
+
+from .static_manifest import is_fingerprinted
+
+
+class CachePolicy(NamedTuple):
+    """Политика кэширования класса ответов."""
+
+    name: str
+    cache_control: str
+    # Считать ETag по телу ответа и отвечать 304 на If-None-Match.
+    # Статика и send_file ставят ETag и Last-Modified сами
+    etag: bool = False
+
+
+# Хэш содержимого в URL (static_url): URL меняется вместе с файлом
+IMMUTABLE = CachePolicy("immutable", "public, max-age=31536000, immutable")
+STATIC = CachePolicy("static", "public, max-age={static_max_age}")
+# Закрытые файлы: кэш только в браузере и с проверкой доступа на каждый запрос
+UPLOAD = CachePolicy("upload", "private, no-cache")
+DYNAMIC = CachePolicy("dynamic", "private, no-cache", etag=True)
+
+Rule = Tuple[Callable[[Request, Response], bool], CachePolicy]
+
+# Первое подходящее правило определяет политику ответа
+CACHE_RULES: Tuple[Rule, ...] = (
+    (
+        lambda req, resp: req.endpoint == "static"
+        and is_fingerprinted(req.view_args.get("filename", ""), req.args.get("v")),
+        IMMUTABLE,
+    ),
+    (lambda req, resp: req.endpoint == "static", STATIC),
+    (lambda req, resp: req.endpoint == "main.download_file", UPLOAD),
+    (lambda req, resp: True, DYNAMIC),
+)
+
+
+def cache_policy_for(req: Request, response: Response) -> CachePolicy:
+    """Политика кэширования для ответа на запрос."""
+    for matches, policy in CACHE_RULES:
+        if matches(req, response):
+            return policy
+    return DYNAMIC
+
+
+def apply_cache_policy(response: Response) -> Response:
+    """Ставит Cache-Control по таблице политик и обрабатывает If-None-Match."""
+    policy = cache_policy_for(request, response)
+    response.headers["Cache-Control"] = policy.cache_control.format(
+        static_max_age=current_app.config["STATIC_CACHE_MAX_AGE"]
+    )
+    if (
+        policy.etag
+        and request.method in ("GET", "HEAD")
+        and response.status_code == 200
+        and not response.is_streamed
+        and not response.direct_passthrough
+        and "ETag" not in response.headers
+    ):
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+def init_http_cache(app: Flask) -> None:
+    """Подключает политику кэширования ко всем ответам приложения."""
+    app.after_request(apply_cache_policy)
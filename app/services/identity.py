@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import time
+from threading import Lock
+from typing import Iterable, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy.orm import joinedload
+
+from .. import db
+from ..models import User
+from .cache import TTLCache
+from .entitlement import clear_entitlements, invalidate_entitlement
+from .site_settings import IDENTITY_VERSION_KEY, bump_version, read_version
+
+
+# Кэш пользователей для load_user: user_id -> отсоединённый User с группой.
+# TTL задаётся конфигом USER_CACHE_TTL при каждой записи.
+identity_cache = TTLCache(ttl=30, maxsize=5000)
+
+# Последняя увиденная версия строки identity_version и время проверки
+_known_version: Optional[str] = None
+_checked_at = float("-inf")
+_check_lock = Lock()
+
+
+def _cache_ttl() -> float:
+    if has_app_context():
+        return float(current_app.config.get("USER_CACHE_TTL", identity_cache.ttl))
+    return identity_cache.ttl
+
+
+def _check_interval() -> float:
+    return float(current_app.config.get("USER_CACHE_CHECK_INTERVAL", 2))
+
+
+def _sync_identity_version() -> None:
+    """Сбрасывает кэши пользователей и подписок процесса, если пользователей изменил другой воркер.
+
+    Не чаще раза в USER_CACHE_CHECK_INTERVAL секунд читает строку
+    identity_version таблицы site_settings. Пока один поток проверяет
+    версию, остальные используют кэш как есть.
+    """
+    global _known_version, _checked_at
+    if time.monotonic() - _checked_at < _check_interval():
+        return
+    if not _check_lock.acquire(blocking=False):
+        return
+    try:
+        if time.monotonic() - _checked_at < _check_interval():
+            return
+        version = read_version(IDENTITY_VERSION_KEY)
+        if version != _known_version:
+            identity_cache.clear()
+            clear_entitlements()
+            _known_version = version
+        _checked_at = time.monotonic()
+    finally:
+        _check_lock.release()
+
+
+def _bump_identity_version() -> None:
+    """Меняет версию кэша пользователей, чтобы остальные воркеры сбросили свой кэш.
+
+    Вызывается после коммита изменений пользователя, поэтому коммитит сам.
+    """
+    try:
+        bump_version(IDENTITY_VERSION_KEY, "Версия кэша пользователей, меняется при изменении пользователя")
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Не удалось обновить версию кэша пользователей: {e}")
+
+
+def load_cached_user(user_id: int) -> Optional[User]:
+    """Возвращает пользователя, привязанного к текущей сессии.
+
+    При попадании в кэш запрос к БД не выполняется: отсоединённая копия
+    вливается в сессию через merge(load=False). При промахе пользователь
+    загружается вместе с группой, и в кэш кладётся отсоединённая копия.
+    Изменения из других воркеров сбрасывают кэш не позже чем через
+    USER_CACHE_CHECK_INTERVAL секунд.
+    """
+    _sync_identity_version()
+    cached = identity_cache.get(user_id)
+    if cached is None:
+        user = (
+            User.query.options(joinedload(User.group))
+            .filter(User.id == user_id)
+            .first()
+        )
+        if user is None:
+            return None
+        db.session.expunge(user)
+        identity_cache.set(user_id, user, ttl=_cache_ttl())
+        cached = user
+    return db.session.merge(cached, load=False)
+
+
+def invalidate_users(user_ids: Iterable[int]) -> None:
+    """Сбрасывает кэш пользователей и их статус подписки во всех воркерах.
+
+    Вызывается после коммита изменений.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    for user_id in user_ids:
+        identity_cache.delete(user_id)
+        invalidate_entitlement(user_id)
+    _bump_identity_version()
+
+
+def invalidate_user(user_id: int) -> None:
+    """Сбрасывает кэш пользователя и его статус подписки после изменения."""
+    invalidate_users([user_id])
+
+
+def clear_identities() -> None:
+    """Сбрасывает кэш всех пользователей (массовые изменения, правка групп)."""
+    identity_cache.clear()
+    _bump_identity_version()
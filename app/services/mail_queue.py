@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from flask import Flask, current_app
+from flask_mail import Message
+from sqlalchemy import delete, select, update
+
+from .. import db, mail
+from ..models import OutboundEmail
+from .background import PeriodicTask, get_periodic_task, start_periodic_task
+
+
+TASK_NAME = "mail_queue"
+
+# Через сколько письмо в статусе sending считается брошенным упавшим воркером
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# Строк за одну транзакцию при удалении старых писем
+PURGE_BATCH_SIZE = 1000
+
+
+def enqueue_email(msg: Message) -> int:
+    """Сохраняет письмо в очередь и будит воркер. Возвращает id письма.
+
+    Запрос не ждет SMTP: письмо отправит воркер очереди (RUN_BACKGROUND_TASKS).
+    Только в режиме тестирования без воркера очередь обрабатывается сразу.
+    """
+    email = OutboundEmail(
+        recipient=", ".join(msg.recipients),
+        subject=msg.subject,
+        html_body=msg.html,
+        text_body=msg.body,
+    )
+    db.session.add(email)
+    db.session.commit()
+
+    task = get_periodic_task(current_app._get_current_object(), TASK_NAME)
+    if task is not None and task.is_running:
+        task.trigger()
+    elif current_app.testing:
+        process_mail_queue()
+    return email.id
+
+
+def _release_stale_claims(now: datetime) -> None:
+    """Возвращает в очередь письма, зависшие в отправке."""
+    db.session.execute(
+        update(OutboundEmail)
+        .where(
+            OutboundEmail.status == "sending",
+            OutboundEmail.claimed_at < now - CLAIM_TIMEOUT,
+        )
+        .values(status="pending", claim_token=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def _claim_batch(limit: int) -> List[OutboundEmail]:
+    """Забирает пачку писем, срок отправки которых наступил.
+
+    Письма помечаются меткой воркера одним UPDATE, поэтому несколько
+    процессов не отправят одно письмо дважды.
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due_ids = (
+        select(OutboundEmail.id)
+        .where(OutboundEmail.status == "pending", OutboundEmail.next_attempt_at <= now)
+        .order_by(OutboundEmail.id)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.id.in_(due_ids), OutboundEmail.status == "pending")
+        .values(status="sending", claim_token=token, claimed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return (
+        OutboundEmail.query.filter_by(claim_token=token, status="sending")
+        .order_by(OutboundEmail.id)
+        .all()
+    )
+
+
+def _to_message(email: OutboundEmail) -> Message:
+    return Message(
+        subject=email.subject,
+        recipients=[address.strip() for address in email.recipient.split(",")],
+        html=email.html_body,
+        body=email.text_body,
+    )
+
+
+def _schedule_retry(email: OutboundEmail, error: Exception, counts: Dict[str, int]) -> None:
+    """Откладывает письмо с экспоненциальной задержкой или помечает его failed."""
+    config = current_app.config
+    email.attempts += 1
+    email.last_error = str(error)
+    email.claim_token = None
+    if email.attempts >= config["MAIL_QUEUE_MAX_ATTEMPTS"]:
+        email.status = "failed"
+        counts["failed"] += 1
+        current_app.logger.error(
+            f"Письмо {email.id} для {email.recipient} не отправлено после {email.attempts} попыток: {error}"
+        )
+        return
+    delay = config["MAIL_QUEUE_RETRY_BACKOFF"] * 2 ** (email.attempts - 1)
+    email.status = "pending"
+    email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    counts["retried"] += 1
+    current_app.logger.warning(
+        f"Ошибка отправки письма {email.id} для {email.recipient}, повтор через {delay:.0f} с: {error}"
+    )
+
+
+def process_mail_queue(batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Отправляет все письма, срок отправки которых наступил.
+
+    Письма забираются пачками по batch_size и отправляются через одно
+    SMTP-соединение на весь проход. Возвращает счётчики: sent, retried, failed.
+    """
+    batch_size = batch_size or current_app.config["MAIL_QUEUE_BATCH_SIZE"]
+    counts = {"sent": 0, "retried": 0, "failed": 0}
+
+    _release_stale_claims(datetime.utcnow())
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return counts
+
+    try:
+        with mail.connect() as connection:
+            while batch:
+                for email in batch:
+                    try:
+                        connection.send(_to_message(email))
+                    except Exception as e:
+                        _schedule_retry(email, e, counts)
+                    else:
+                        email.status = "sent"
+                        email.attempts += 1
+                        email.sent_at = datetime.utcnow()
+                        email.claim_token = None
+                        # В письмах коды подтверждения и восстановления пароля:
+                        # после отправки текст хранить незачем
+                        email.html_body = None
+                        email.text_body = None
+                        counts["sent"] += 1
+                db.session.commit()
+                batch = _claim_batch(batch_size)
+    except Exception as e:
+        # Не удалось подключиться к SMTP-серверу: откладываем всю пачку
+        for email in batch:
+            if email.status == "sending":
+                _schedule_retry(email, e, counts)
+        db.session.commit()
+
+    current_app.logger.info(f"Очередь писем обработана: {counts}")
+    return counts
+
+
+def purge_mail_queue(now: Optional[datetime] = None) -> int:
+    """Удаляет отправленные и окончательно не отправленные письма старше MAIL_QUEUE_RETENTION_DAYS.
+
+    Удаление идет пачками, каждая — отдельная транзакция. Возвращает количество удаленных писем.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=current_app.config["MAIL_QUEUE_RETENTION_DAYS"])
+    stale_ids = (
+        select(OutboundEmail.id)
+        .where(OutboundEmail.status.in_(("sent", "failed")), OutboundEmail.created_at < cutoff)
+        .limit(PURGE_BATCH_SIZE)
+        .scalar_subquery()
+    )
+    total = 0
+    while True:
+        result = db.session.execute(
+            delete(OutboundEmail)
+            .where(OutboundEmail.id.in_(stale_ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += result.rowcount
+        if result.rowcount < PURGE_BATCH_SIZE:
+            break
+    if total:
+        current_app.logger.info(f"Удалено старых писем из очереди: {total}")
+    return total
+
+
+def start_mail_purge(app: Flask) -> Optional[PeriodicTask]:
+    """Запускает очистку старых писем очереди (MAIL_QUEUE_PURGE_INTERVAL секунд)."""
+    return start_periodic_task(
+        app,
+        "mail_queue_purge",
+        app.config.get("MAIL_QUEUE_PURGE_INTERVAL", 0),
+        purge_mail_queue,
+    )
+
+
+def start_mail_worker(app: Flask) -> Optional[PeriodicTask]:
+    """Запускает отправку очереди писем (MAIL_QUEUE_INTERVAL секунд)."""
+    return start_periodic_task(
+        app,
+        TASK_NAME,
+        app.config.get("MAIL_QUEUE_INTERVAL", 0),
+        process_mail_queue,
+    )
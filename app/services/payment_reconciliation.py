@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from flask import Flask, current_app
+
+from .. import db
+from ..models import Payment, User
+from ..utils.payment_service import (
+    forget_payment_status,
+    get_payment_service,
+    get_yookassa_client,
+)
+from .background import PeriodicTask, start_periodic_task
+from .identity import invalidate_users
+
+if TYPE_CHECKING:
+    from ..utils.yookassa_client import YooKassaClient
+
+
+# Статусы, которые могут измениться на стороне ЮKassa
+RECONCILE_STATUSES = ("pending", "waiting_for_capture")
+
+
+def _fetch_status(client: YooKassaClient, payment_id: str) -> Tuple[str, Dict[str, Any]]:
+    """Запрашивает платеж в API. Выполняется в пуле потоков, без доступа к БД."""
+    try:
+        response = client.request("GET", f"payments/{payment_id}")
+        if response.status_code == 200:
+            return payment_id, response.json()
+        return payment_id, {"error": f"HTTP {response.status_code}"}
+    except Exception as e:
+        return payment_id, {"error": str(e)}
+
+
+def _chunks(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def reconcile_pending_payments(
+    older_than_minutes: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> Dict[str, int]:
+    """Сверяет зависшие платежи со статусами в ЮKassa.
+
+    Выбирает платежи в статусах pending/waiting_for_capture старше
+    older_than_minutes, параллельно (не более max_workers запросов
+    одновременно) запрашивает их статус и применяет изменения пачками
+    по batch_size платежей в одной транзакции.
+
+    Возвращает счётчики: checked, updated, activated, errors.
+    """
+    config = current_app.config
+    older_than_minutes = older_than_minutes or config["PAYMENT_RECONCILE_AGE_MINUTES"]
+    max_workers = max_workers or config["PAYMENT_RECONCILE_WORKERS"]
+    batch_size = batch_size or config["PAYMENT_RECONCILE_BATCH_SIZE"]
+
+    counts = {"checked": 0, "updated": 0, "activated": 0, "errors": 0}
+
+    service = get_payment_service()
+    if service.simulation_mode:
+        current_app.logger.info("Сверка платежей пропущена: режим симуляции ЮKassa")
+        return counts
+
+    cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
+    rows = (
+        db.session.query(Payment.id, Payment.yookassa_payment_id)
+        .filter(Payment.status.in_(RECONCILE_STATUSES), Payment.created_at <= cutoff)
+        .order_by(Payment.id)
+        .all()
+    )
+    # Закрываем читающую транзакцию до сетевых запросов
+    db.session.commit()
+    if not rows:
+        return counts
+
+    client = get_yookassa_client()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        statuses = dict(
+            pool.map(lambda row: _fetch_status(client, row.yookassa_payment_id), rows)
+        )
+    counts["checked"] = len(rows)
+
+    for chunk in _chunks(rows, batch_size):
+        changed_users = set()
+        payments = Payment.query.filter(Payment.id.in_([row.id for row in chunk])).all()
+        for payment in payments:
+            remote = statuses.get(payment.yookassa_payment_id, {})
+            if "error" in remote:
+                counts["errors"] += 1
+                current_app.logger.warning(
+                    f"Сверка: не удалось получить платеж {payment.yookassa_payment_id}: {remote['error']}"
+                )
+                continue
+
+            new_status = remote.get("status")
+            if not new_status or new_status == payment.status:
+                continue
+
+            payment.status = new_status
+            payment.updated_at = datetime.utcnow()
+            forget_payment_status(payment.yookassa_payment_id)
+            counts["updated"] += 1
+
+            if (
+                new_status == "succeeded"
+                and remote.get("paid", False)
+                and payment.activated_at is None
+            ):
+                user = User.query.get(payment.user_id)
+                if user:
+                    service.activate_subscription(user, payment)
+                    changed_users.add(user.id)
+                    counts["activated"] += 1
+
+        db.session.commit()
+        invalidate_users(changed_users)
+
+    current_app.logger.info(f"Сверка зависших платежей завершена: {counts}")
+    # Накопленные с запуска процесса задержки запросов к API ЮKassa
+    current_app.logger.info(f"Задержки API ЮKassa: {client.latency.summary()}")
+    return counts
+
+
+def start_payment_reconciliation(app: Flask) -> Optional[PeriodicTask]:
+    """Запускает периодическую сверку платежей (PAYMENT_RECONCILE_INTERVAL секунд)."""
+    return start_periodic_task(
+        app,
+        "payment_reconciliation",
+        app.config.get("PAYMENT_RECONCILE_INTERVAL", 0),
+        reconcile_pending_payments,
+    )
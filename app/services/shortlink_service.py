@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 import re
 
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+
 from .. import db
 from ..models import ShortLink, ShortLinkRule
 
@@ -32,6 +35,29 @@ def parse_max_clicks(value: str) -> Optional[int]:
     return int(value) if value.isdigit() else None
 
 
+SHORT_LINKS_PER_PAGE = 50
+
+
+def short_links_page(
+    before_id: Optional[int] = None, per_page: int = SHORT_LINKS_PER_PAGE
+) -> Tuple[List[ShortLink], Optional[int]]:
+    """Страница ссылок от новых к старым с ID меньше before_id.
+
+    Возвращает ссылки с правилами и before_id следующей страницы (или None).
+    """
+    query = ShortLink.query.options(selectinload(ShortLink.rule))
+    if before_id is not None:
+        query = query.filter(ShortLink.id < before_id)
+    links = query.order_by(ShortLink.id.desc()).limit(per_page + 1).all()
+    next_before_id = links[per_page - 1].id if len(links) > per_page else None
+    return links[:per_page], next_before_id
+
+
+def count_short_links() -> int:
+    """Количество коротких ссылок."""
+    return db.session.query(func.count(ShortLink.id)).scalar()
+
+
 def create_short_link(original_url: str, ttl: str = "", max_clicks: str = "") -> ShortLink:
     """Создает короткую ссылку и при необходимости правило ограничения."""
     normalized = normalize_url(original_url)
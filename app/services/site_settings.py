@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import time
+import uuid
+from datetime import datetime
+from threading import Lock
+from types import MappingProxyType
+from typing import Any, Mapping, NamedTuple, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import select, update
+
+from .. import db
+from ..models import SiteSettings
+
+
+# Служебная строка site_settings: получает новое значение при каждом
+# сохранении настроек, по ней воркеры узнают, что снимок устарел
+VERSION_KEY = "settings_version"
+# Такая же строка для кэша пользователей (services/identity.py)
+IDENTITY_VERSION_KEY = "identity_version"
+# Служебные строки не являются настройками и не попадают в снимок
+VERSION_KEYS = (VERSION_KEY, IDENTITY_VERSION_KEY)
+
+
+class SettingsSnapshot(NamedTuple):
+    """Неизменяемый снимок всех настроек сайта в памяти процесса."""
+
+    version: Optional[str]
+    values: Mapping[str, Any]
+    checked_at: float
+
+
+_snapshot: Optional[SettingsSnapshot] = None
+_refresh_lock = Lock()
+
+
+def parse_setting(value: str) -> Any:
+    """Преобразует значения переключателей 'true'/'false' в bool."""
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    return value
+
+
+def _check_interval() -> float:
+    if has_app_context():
+        return float(current_app.config.get("SITE_SETTINGS_CHECK_INTERVAL", 5))
+    return 5.0
+
+
+def _load_snapshot() -> SettingsSnapshot:
+    rows = dict(db.session.execute(select(SiteSettings.key, SiteSettings.value)).all())
+    version = rows.pop(VERSION_KEY, None)
+    for key in VERSION_KEYS:
+        rows.pop(key, None)
+    values = MappingProxyType({key: parse_setting(value) for key, value in rows.items()})
+    return SettingsSnapshot(version, values, time.monotonic())
+
+
+def get_settings() -> Mapping[str, Any]:
+    """Возвращает снимок настроек сайта.
+
+    Не чаще раза в SITE_SETTINGS_CHECK_INTERVAL секунд читает из БД строку
+    версии и перечитывает все настройки, только если версия изменилась.
+    Пока один поток проверяет версию, остальные читают прежний снимок.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    interval = _check_interval()
+    if snapshot is not None and time.monotonic() - snapshot.checked_at < interval:
+        return snapshot.values
+
+    if not _refresh_lock.acquire(blocking=snapshot is None):
+        return snapshot.values
+    try:
+        snapshot = _snapshot
+        if snapshot is None or time.monotonic() - snapshot.checked_at >= interval:
+            version = None
+            if snapshot is not None:
+                version = read_version(VERSION_KEY)
+            if snapshot is not None and version == snapshot.version:
+                snapshot = snapshot._replace(checked_at=time.monotonic())
+            else:
+                snapshot = _load_snapshot()
+            _snapshot = snapshot
+        return snapshot.values
+    finally:
+        _refresh_lock.release()
+
+
+def get_setting(key: str, default: Any = None) -> Any:
+    """Возвращает значение настройки из снимка или default."""
+    return get_settings().get(key, default)
+
+
+def read_version(key: str) -> Optional[str]:
+    """Текущее значение служебной строки версии или None, если ее еще нет."""
+    return db.session.execute(
+        select(SiteSettings.value).where(SiteSettings.key == key)
+    ).scalar()
+
+
+def bump_version(key: str, description: str) -> None:
+    """Меняет служебную строку версии в текущей транзакции (коммит делает вызывающий)."""
+    version = uuid.uuid4().hex
+    result = db.session.execute(
+        update(SiteSettings)
+        .where(SiteSettings.key == key)
+        .values(value=version, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        db.session.add(SiteSettings(key=key, value=version, description=description))
+
+
+def bump_settings_version() -> None:
+    """Меняет версию настроек в текущей транзакции (коммит делает вызывающий)."""
+    bump_version(VERSION_KEY, "Версия настроек сайта, меняется при каждом сохранении")
+
+
+def invalidate_settings() -> None:
+    """Сбрасывает снимок процесса: следующее чтение загрузит настройки из БД."""
+    global _snapshot
+    _snapshot = None
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Mapping, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .. import db
+from .background import PeriodicTask, start_periodic_task
+
+
+# Ключ конфига -> PRAGMA, выполняемая на каждом новом соединении
+PRAGMA_SETTINGS = (
+    ("SQLITE_JOURNAL_MODE", "journal_mode"),
+    ("SQLITE_BUSY_TIMEOUT", "busy_timeout"),
+    ("SQLITE_SYNCHRONOUS", "synchronous"),
+    ("SQLITE_MMAP_SIZE", "mmap_size"),
+    ("SQLITE_CACHE_SIZE", "cache_size"),
+    ("SQLITE_TEMP_STORE", "temp_store"),
+)
+
+
+def sqlite_pragmas(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """Возвращает PRAGMA профиля из конфига (пустые значения пропускаются)."""
+    return {
+        pragma: config[key]
+        for key, pragma in PRAGMA_SETTINGS
+        if config.get(key) not in (None, "")
+    }
+
+
+def set_sqlite_pragmas(dbapi_connection, pragmas: Mapping[str, Any]) -> None:
+    """Выполняет PRAGMA на DBAPI-соединении sqlite3."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+
+def install_sqlite_profile(engine: Engine, pragmas: Mapping[str, Any]) -> bool:
+    """Подписывает движок на установку PRAGMA для каждого соединения пула.
+
+    Возвращает False, если движок не SQLite или профиль пуст.
+    """
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return False
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        set_sqlite_pragmas(dbapi_connection, pragmas)
+
+    return True
+
+
+# Имя функции SQLite, переводящей строку в нижний регистр с учетом Unicode
+UNICODE_LOWER = "py_lower"
+
+
+def _unicode_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def install_unicode_lower(engine: Engine) -> bool:
+    """Регистрирует функцию py_lower() — lower() с поддержкой Unicode.
+
+    Встроенная lower() SQLite меняет регистр только у ASCII, из-за чего
+    поиск без учета регистра не находит кириллицу в другом регистре. Встроенные
+    функции не переопределяются: py_lower() используется только там, где
+    нужна (поиск пользователей), и не мешает индексам по lower(колонка).
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        dbapi_connection.create_function(UNICODE_LOWER, 1, _unicode_lower, deterministic=True)
+
+    return True
+
+
+def init_sqlite_profile(app: Flask) -> None:
+    """Применяет профиль SQLite из конфига к движку приложения.
+
+    Вызывается сразу после db.init_app, до первого соединения с БД.
+    """
+    with app.app_context():
+        install_unicode_lower(db.engine)
+        if not app.config.get("SQLITE_PROFILE_ENABLED", True):
+            return
+        if install_sqlite_profile(db.engine, sqlite_pragmas(app.config)):
+            app.logger.info("Профиль SQLite применен")
+
+
+def sqlite_maintenance() -> Optional[Dict[str, Any]]:
+    """Переносит WAL в основной файл БД и обновляет статистику планировщика."""
+    if db.engine.dialect.name != "sqlite":
+        return None
+    with db.engine.connect() as connection:
+        busy, wal_pages, checkpointed = connection.exec_driver_sql(
+            "PRAGMA wal_checkpoint(TRUNCATE)"
+        ).one()
+        connection.exec_driver_sql("PRAGMA optimize")
+    result = {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed": checkpointed}
+    current_app.logger.info(f"Обслуживание SQLite выполнено: {result}")
+    return result
+
+
+def start_sqlite_maintenance(app: Flask) -> Optional[PeriodicTask]:
+    """Запускает обслуживание SQLite (SQLITE_MAINTENANCE_INTERVAL секунд)."""
+    if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return None
+    return start_periodic_task(
+        app,
+        "sqlite_maintenance",
+        app.config.get("SQLITE_MAINTENANCE_INTERVAL", 0),
+        sqlite_maintenance,
+    )
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, NamedTuple, Optional
+
+from flask import Flask, current_app, url_for
+
+from .stored_files import file_sha256
+
+
+# Символов SHA-256 в версии ассета
+DIGEST_LENGTH = 12
+
+# Папки загрузок лежат в static, но это не ассеты сайта
+UPLOAD_FOLDER_KEYS = ("UPLOAD_FOLDER", "CHAT_FILES_FOLDER", "TICKET_FILES_FOLDER")
+
+
+class AssetVersion(NamedTuple):
+    """Версия файла статики: хэш содержимого и mtime, по которому он посчитан."""
+
+    digest: str
+    mtime_ns: int
+
+
+def _asset_version(path: str) -> AssetVersion:
+    return AssetVersion(file_sha256(path)[:DIGEST_LENGTH], os.stat(path).st_mtime_ns)
+
+
+def build_manifest(app: Flask) -> Dict[str, AssetVersion]:
+    """Хэширует файлы static: путь относительно static -> версия."""
+    static_folder = app.static_folder
+    skipped = {os.path.abspath(app.config[key]) for key in UPLOAD_FOLDER_KEYS}
+    manifest: Dict[str, AssetVersion] = {}
+    for root, dirs, names in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) not in skipped]
+        for name in names:
+            if name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            filename = os.path.relpath(path, static_folder).replace(os.sep, "/")
+            manifest[filename] = _asset_version(path)
+    return manifest
+
+
+class StaticManifest:
+    """Манифест статики приложения, строится при первом обращении.
+
+    С STATIC_MANIFEST_RELOAD (по умолчанию в debug) версия файла
+    пересчитывается, если он изменился после построения манифеста.
+    """
+
+    def __init__(self, app: Flask) -> None:
+        self.app = app
+        self._versions: Optional[Dict[str, AssetVersion]] = None
+        self._lock = threading.Lock()
+
+    def _manifest(self) -> Dict[str, AssetVersion]:
+        if self._versions is None:
+            with self._lock:
+                if self._versions is None:
+                    self._versions = build_manifest(self.app)
+                    self.app.logger.info(f"Манифест статики: {len(self._versions)} файлов")
+        return self._versions
+
+    def version(self, filename: str) -> Optional[str]:
+        """Хэш содержимого файла статики или None, если файла нет."""
+        versions = self._manifest()
+        version = versions.get(filename)
+        if self.app.config["STATIC_MANIFEST_RELOAD"]:
+            path = os.path.join(self.app.static_folder, filename)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                return None
+            if version is None or version.mtime_ns != mtime_ns:
+                version = versions[filename] = _asset_version(path)
+        return version.digest if version else None
+
+
+def static_manifest() -> StaticManifest:
+    return current_app.extensions["static_manifest"]
+
+
+def static_url(filename: str) -> str:
+    """URL файла статики с версией по содержимому: /static/css/style.css?v=<хэш>.
+
+    URL меняется только вместе с файлом, поэтому отдается с неизменяемым
+    кэшем на год (services/http_cache.py).
+    """
+    version = static_manifest().version(filename)
+    if version is None:
+        return url_for("static", filename=filename)
+    return url_for("static", filename=filename, v=version)
+
+
+def is_fingerprinted(filename: str, version: Optional[str]) -> bool:
+    """Совпадает ли версия из URL с текущим хэшем файла."""
+    return bool(version) and static_manifest().version(filename) == version
+
+
+def init_static_manifest(app: Flask) -> None:
+    """Подключает манифест статики и функцию static_url() для шаблонов."""
+    app.extensions["static_manifest"] = StaticManifest(app)
+    app.jinja_env.globals["static_url"] = static_url
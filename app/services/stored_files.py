@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import uuid
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import delete, func, or_, select
+
+from .. import db
+from ..models import StoredFile, Ticket
+from .blob_store import link_to_blob, orphan_blob_paths
+from .file_cleanup import enqueue_file_deletions
+
+
+# Виды файлов хранилища
+KIND_MATERIAL = "material"      # Файл материала (лекции или практики)
+KIND_SOLUTION = "solution"      # Готовое решение практики от администратора
+KIND_SUBMISSION = "submission"  # Решение пользователя
+KIND_CHAT = "chat"              # Вложение сообщения чата
+KIND_TICKET = "ticket"          # Вложение тикета
+
+# Файлы, которые принадлежат строкам пользователя и удаляются вместе с ним.
+# Материалы остаются у предмета, даже если их автор удален
+PERSONAL_KINDS = (KIND_SUBMISSION, KIND_CHAT)
+
+# Разделы хранилища и папки загрузок из конфигурации. Путь в реестре —
+# раздел и путь относительно его папки: uploads/12/3/file.pdf
+STORAGE_AREAS = {
+    "uploads": "UPLOAD_FOLDER",
+    "chat_files": "CHAT_FILES_FOLDER",
+    "ticket_files": "TICKET_FILES_FOLDER",
+}
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class FileTooLargeError(ValueError):
+    """Загружаемый файл больше допустимого размера."""
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 файла на диске, читается блоками."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def storage_key(path: str) -> str:
+    """Путь реестра для файла на диске: раздел/путь относительно папки раздела.
+
+    Не зависит от папки развертывания и текущей папки процесса.
+    ValueError, если файл лежит вне папок хранилища.
+    """
+    full_path = os.path.abspath(path)
+    # Самая глубокая подходящая папка, если папки разделов вложены друг в друга
+    roots = sorted(
+        ((area, os.path.abspath(current_app.config[key])) for area, key in STORAGE_AREAS.items()),
+        key=lambda item: len(item[1]),
+        reverse=True,
+    )
+    for area, root in roots:
+        if full_path.startswith(root + os.sep):
+            return f"{area}/{os.path.relpath(full_path, root).replace(os.sep, '/')}"
+    raise ValueError(f"Файл {path} вне папок хранилища")
+
+
+def storage_path(key: str) -> str:
+    """Путь к файлу на диске для пути реестра по текущим папкам из конфигурации."""
+    area, _, relative = key.partition("/")
+    return os.path.abspath(
+        os.path.join(current_app.config[STORAGE_AREAS[area]], *relative.split("/"))
+    )
+
+
+def write_stream(
+    stream: BinaryIO, path: str, max_size: Optional[int] = None
+) -> Tuple[int, str]:
+    """Записывает поток в файл блоками и возвращает (размер, SHA-256).
+
+    Данные пишутся во временный файл рядом с path, размер и хэш считаются
+    на лету, поэтому память не зависит от размера файла. Если данных больше
+    max_size, запись прерывается с FileTooLargeError. Готовый файл атомарно
+    заменяет path: старый файл, возможно общий с хранилищем, не изменяется.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise FileTooLargeError(f"Файл больше {max_size} байт")
+                digest.update(chunk)
+                f.write(chunk)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return size, digest.hexdigest()
+
+
+def register_file(
+    path: str,
+    kind: str,
+    owner_id: Optional[int] = None,
+    subject_id: Optional[int] = None,
+    ticket_id: Optional[int] = None,
+    size: Optional[int] = None,
+    sha256: Optional[str] = None,
+) -> StoredFile:
+    """Записывает сохраненный файл в реестр в текущей транзакции.
+
+    Размер и хэш, посчитанные при записи (write_stream), передаются явно,
+    иначе читаются с диска. Файл связывается с хранилищем содержимого:
+    одинаковые файлы занимают место на диске один раз. Если файл перезаписан
+    по тому же пути, обновляется существующая запись. Коммит делает
+    вызывающий код.
+    """
+    key = storage_key(path)
+    stored = StoredFile.query.filter_by(path=key).first()
+    if stored is None:
+        stored = StoredFile(path=key)
+        db.session.add(stored)
+    previous_sha256 = stored.sha256
+    stored.kind = kind
+    stored.owner_id = owner_id
+    stored.subject_id = subject_id
+    stored.ticket_id = ticket_id
+    stored.size = os.path.getsize(path) if size is None else size
+    stored.sha256 = sha256 or file_sha256(path)
+    link_to_blob(path, stored.sha256)
+    if previous_sha256 and previous_sha256 != stored.sha256:
+        db.session.flush()
+        enqueue_file_deletions(orphan_blob_paths([previous_sha256]))
+    return stored
+
+
+def user_files_condition(user_ids: List[int]):
+    """Условие на файлы, которые удаляются вместе с пользователями:
+    личные файлы и все вложения их тикетов."""
+    user_tickets = select(Ticket.id).where(Ticket.user_id.in_(user_ids)).scalar_subquery()
+    return or_(
+        (StoredFile.owner_id.in_(user_ids)) & (StoredFile.kind.in_(PERSONAL_KINDS)),
+        StoredFile.ticket_id.in_(user_tickets),
+    )
+
+
+def file_paths(*criteria) -> List[str]:
+    """Пути на диске файлов реестра по условию."""
+    keys = db.session.execute(select(StoredFile.path).where(*criteria)).scalars().all()
+    return [storage_path(key) for key in keys]
+
+
+def forget_files(*criteria) -> int:
+    """Удаляет записи реестра по условию (файлы загрузок на диске не трогает).
+
+    Содержимое хранилища, на которое не осталось ссылок, ставится в очередь
+    удаления в текущей транзакции.
+    """
+    hashes = db.session.execute(
+        select(StoredFile.sha256).where(*criteria).distinct()
+    ).scalars().all()
+    count = db.session.execute(
+        delete(StoredFile).where(*criteria).execution_options(synchronize_session=False)
+    ).rowcount
+    enqueue_file_deletions(orphan_blob_paths(hashes))
+    return count
+
+
+def discard_files(*criteria) -> int:
+    """Ставит файлы реестра в очередь удаления и удаляет их записи.
+
+    Работает в текущей транзакции: после коммита нужно вызвать
+    wake_file_cleanup(). Возвращает число файлов.
+    """
+    paths = file_paths(*criteria)
+    enqueue_file_deletions(paths)
+    forget_files(*criteria)
+    return len(paths)
+
+
+def upload_paths(relative_paths: Iterable[Optional[str]]) -> List[str]:
+    """Пути реестра для путей из БД относительно UPLOAD_FOLDER."""
+    upload_base = current_app.config["UPLOAD_FOLDER"]
+    return [storage_key(os.path.join(upload_base, path)) for path in relative_paths if path]
+
+
+def storage_usage_by_owner(user_ids: Iterable[int]) -> Dict[int, int]:
+    """Занятое место в байтах по владельцам одним запросом."""
+    ids = list(user_ids)
+    if not ids:
+        return {}
+    return dict(db.session.execute(
+        select(StoredFile.owner_id, func.sum(StoredFile.size))
+        .where(StoredFile.owner_id.in_(ids))
+        .group_by(StoredFile.owner_id)
+    ).all())
+
+
+def storage_summary() -> Dict[str, int]:
+    """Число файлов, их общий размер и место на диске без повторов содержимого."""
+    files, size = db.session.execute(
+        select(func.count(StoredFile.id), func.coalesce(func.sum(StoredFile.size), 0))
+    ).one()
+    unique = (
+        select(func.max(StoredFile.size).label("size"))
+        .group_by(StoredFile.sha256)
+        .subquery()
+    )
+    disk = db.session.execute(select(func.coalesce(func.sum(unique.c.size), 0))).scalar()
+    return {"files": files, "size": size, "disk": disk}
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import update
+
+from .. import db
+from ..models import User
+from .background import PeriodicTask, start_periodic_task
+from .entitlement import clear_entitlements
+from .identity import clear_identities
+
+
+def expire_due_subscriptions(now: Optional[datetime] = None) -> Dict[str, int]:
+    """Снимает истекшие пробные, оплаченные и ручные подписки.
+
+    Выполняет три set-based UPDATE в одной транзакции и возвращает количество
+    затронутых строк: {'trials': ..., 'subscriptions': ..., 'access': ...}.
+    """
+    now = now or datetime.utcnow()
+
+    trials = db.session.execute(
+        update(User)
+        .where(
+            User.is_trial_subscription.is_(True),
+            User.trial_subscription_expires.isnot(None),
+            User.trial_subscription_expires <= now,
+        )
+        .values(is_trial_subscription=False, trial_subscription_expires=None)
+        .execution_options(synchronize_session=False)
+    )
+    subscriptions = db.session.execute(
+        update(User)
+        .where(
+            User.is_subscribed.is_(True),
+            User.subscription_expires.isnot(None),
+            User.subscription_expires <= now,
+        )
+        .values(is_subscribed=False, is_manual_subscription=False)
+        .execution_options(synchronize_session=False)
+    )
+    # access_until хранит самый поздний из грантов, поэтому если он прошёл,
+    # истекли все гранты пользователя
+    access = db.session.execute(
+        update(User)
+        .where(User.access_until.isnot(None), User.access_until <= now)
+        .values(access_until=None, access_kind=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    counts = {
+        "trials": trials.rowcount,
+        "subscriptions": subscriptions.rowcount,
+        "access": access.rowcount,
+    }
+    if any(counts.values()):
+        clear_entitlements()
+        clear_identities()
+        current_app.logger.info(f"Истекшие подписки сняты: {counts}")
+    return counts
+
+
+def start_subscription_sweeper(app: Flask) -> Optional[PeriodicTask]:
+    """Запускает периодическую очистку подписок (SUBSCRIPTION_SWEEP_INTERVAL секунд)."""
+    return start_periodic_task(
+        app,
+        "subscription_sweeper",
+        app.config.get("SUBSCRIPTION_SWEEP_INTERVAL", 0),
+        expire_due_subscriptions,
+    )
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional
+
+from flask import current_app
+from sqlalchemy import delete, or_, select, update
+
+from .. import db
+from ..models import (
+    ChatMessage,
+    EmailVerification,
+    Material,
+    Notification,
+    PasswordReset,
+    Payment,
+    StoredFile,
+    Subject,
+    Submission,
+    Ticket,
+    TicketFile,
+    TicketMessage,
+    User,
+)
+from .file_cleanup import wake_file_cleanup
+from .identity import invalidate_users
+from .stored_files import discard_files, user_files_condition
+
+
+# Обработчик прогресса массового удаления: (удалено, всего)
+ProgressCallback = Callable[[int, int], None]
+
+
+def _deletable_ids(user_ids: Iterable[int]) -> List[int]:
+    """Оставляет существующих пользователей, кроме администраторов."""
+    ids = list(dict.fromkeys(user_ids))
+    if not ids:
+        return []
+    return db.session.execute(
+        select(User.id).where(User.id.in_(ids), or_(User.is_admin.is_(False), User.is_admin.is_(None)))
+    ).scalars().all()
+
+
+def _delete_where(model, *criteria) -> int:
+    return db.session.execute(
+        delete(model).where(*criteria).execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def delete_users(user_ids: Iterable[int]) -> Dict[str, int]:
+    """Удаляет пользователей со всеми зависимыми строками в одной транзакции.
+
+    Каждая таблица очищается одним DELETE по списку пользователей. Файлы
+    пользователей выбираются из реестра, ставятся в очередь и удаляются
+    с диска фоновым воркером после коммита. Администраторы не удаляются.
+    Возвращает число удаленных строк по таблицам.
+    """
+    ids = _deletable_ids(user_ids)
+    if not ids:
+        return {"users": 0}
+
+    emails = select(User.email).where(User.id.in_(ids)).scalar_subquery()
+    ticket_ids = select(Ticket.id).where(Ticket.user_id.in_(ids)).scalar_subquery()
+    try:
+        # Файлы выбираются из реестра до удаления тикетов, по которым их ищут
+        files = discard_files(user_files_condition(ids))
+        counts = {
+            "ticket_files": _delete_where(TicketFile, TicketFile.ticket_id.in_(ticket_ids)),
+            "ticket_messages": _delete_where(
+                TicketMessage,
+                or_(TicketMessage.ticket_id.in_(ticket_ids), TicketMessage.user_id.in_(ids)),
+            ),
+            "tickets": _delete_where(Ticket, Ticket.user_id.in_(ids)),
+            "notifications": _delete_where(Notification, Notification.user_id.in_(ids)),
+            "email_verifications": _delete_where(EmailVerification, EmailVerification.user_id.in_(ids)),
+            "password_resets": _delete_where(PasswordReset, PasswordReset.email.in_(emails)),
+            "payments": _delete_where(Payment, Payment.user_id.in_(ids)),
+            "submissions": _delete_where(Submission, Submission.user_id.in_(ids)),
+            "chat_messages": _delete_where(ChatMessage, ChatMessage.user_id.in_(ids)),
+        }
+        # Созданные пользователем предметы, материалы и их файлы остаются без автора
+        for column in (Subject.created_by, Material.created_by, StoredFile.owner_id):
+            db.session.execute(
+                update(column.class_)
+                .where(column.in_(ids))
+                .values({column.key: None})
+                .execution_options(synchronize_session=False)
+            )
+        db.session.execute(
+            update(Ticket)
+            .where(Ticket.admin_id.in_(ids))
+            .values(admin_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        counts["users"] = _delete_where(User, User.id.in_(ids))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    invalidate_users(ids)
+    counts["files"] = files
+    if files:
+        wake_file_cleanup()
+    current_app.logger.info(f"Удалены пользователи {ids}: {counts}")
+    return counts
+
+
+def purge_group_users(
+    group_id: int,
+    batch_size: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """Удаляет всех пользователей группы (кроме администраторов) пачками.
+
+    Каждая пачка удаляется отдельной транзакцией через delete_users, после
+    каждой вызывается progress(удалено, всего). Возвращает суммарные счетчики.
+    """
+    batch_size = batch_size or current_app.config.get("USER_DELETE_BATCH_SIZE", 500)
+    members = select(User.id).where(
+        User.group_id == group_id,
+        or_(User.is_admin.is_(False), User.is_admin.is_(None)),
+    )
+    total = db.session.execute(
+        select(db.func.count()).select_from(members.subquery())
+    ).scalar()
+
+    totals: Counter = Counter()
+    while True:
+        ids = db.session.execute(members.order_by(User.id).limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        totals.update(delete_users(ids))
+        if progress is not None:
+            progress(totals["users"], total)
+    totals.setdefault("users", 0)
+    return dict(totals)
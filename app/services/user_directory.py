@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional
+
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.sql import ColumnElement, Select
+
+from .. import db
+from ..models import Group, User
+from .sqlite_profile import UNICODE_LOWER
+
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 100
+
+# Значение фильтра группы для пользователей без группы
+NO_GROUP = 0
+
+# Фильтры-флажки админки: имя параметра запроса -> колонка
+FLAG_FILTERS = {
+    "subscribed": User.is_subscribed,
+    "trial": User.is_trial_subscription,
+    "admin": User.is_admin,
+    "verified": User.is_verified,
+}
+
+# Сортировки админки. Все колонки уникальны, поэтому курсор — одно значение
+USER_SORTS = {
+    "id": User.id,
+    "username": User.username,
+    "email": User.email,
+}
+
+
+@dataclass(frozen=True)
+class UserFilters:
+    """Фильтры и сортировка списка пользователей в админке."""
+
+    search: str = ""
+    group_id: Optional[int] = None
+    flags: Mapping[str, bool] = field(default_factory=dict)
+    sort: str = "id"
+    descending: bool = False
+
+    @classmethod
+    def from_args(cls, args: Mapping[str, str]) -> "UserFilters":
+        """Разбирает параметры запроса, некорректные значения игнорируются."""
+        group = (args.get("group") or "").strip()
+        flags = {
+            name: args[name] == "1"
+            for name in FLAG_FILTERS
+            if args.get(name) in ("0", "1")
+        }
+        sort = args.get("sort", "id")
+        return cls(
+            search=(args.get("q") or "").strip(),
+            group_id=int(group) if group.isdigit() else None,
+            flags=flags,
+            sort=sort if sort in USER_SORTS else "id",
+            descending=args.get("order") == "desc",
+        )
+
+    def to_args(self) -> Dict[str, str]:
+        """Параметры запроса для ссылок пагинации и сортировки."""
+        args = {name: "1" if value else "0" for name, value in self.flags.items()}
+        if self.search:
+            args["q"] = self.search
+        if self.group_id is not None:
+            args["group"] = str(self.group_id)
+        if self.sort != "id":
+            args["sort"] = self.sort
+        if self.descending:
+            args["order"] = "desc"
+        return args
+
+
+class KeysetPage(NamedTuple):
+    """Страница пользователей и курсоры соседних страниц."""
+
+    items: List[User]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def encode_cursor(value: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Any:
+    """Возвращает значение курсора или None для пустого/поврежденного курсора."""
+    if not cursor:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+
+
+def _icontains(column, search: str) -> ColumnElement:
+    """Подстрока без учета регистра, в SQLite — и для кириллицы (py_lower)."""
+    if db.session.get_bind().dialect.name == "sqlite":
+        return getattr(func, UNICODE_LOWER)(column).contains(search.lower(), autoescape=True)
+    return column.icontains(search, autoescape=True)
+
+
+def user_directory_query(
+    search: str = "",
+    group_id: Optional[int] = None,
+    flags: Optional[Mapping[str, bool]] = None,
+) -> Select:
+    """Запрос пользователей с группой для админки (без сортировки).
+
+    search ищет подстроку без учета регистра в имени, email и названии группы,
+    group_id=NO_GROUP выбирает пользователей без группы, flags — значения
+    флажков из FLAG_FILTERS.
+    """
+    query = (
+        select(User)
+        .outerjoin(Group, User.group_id == Group.id)
+        .options(contains_eager(User.group))
+    )
+    search = (search or "").strip()
+    if search:
+        query = query.where(or_(
+            _icontains(User.username, search),
+            _icontains(User.email, search),
+            _icontains(Group.name, search),
+        ))
+    if group_id == NO_GROUP:
+        query = query.where(User.group_id.is_(None))
+    elif group_id is not None:
+        query = query.where(User.group_id == group_id)
+    for name, value in (flags or {}).items():
+        column = FLAG_FILTERS[name]
+        query = query.where(column.is_(True) if value else or_(column.is_(False), column.is_(None)))
+    return query
+
+
+def search_users(
+    search: str = "",
+    group_id: Optional[int] = None,
+    page: int = 1,
+    per_page: int = DEFAULT_PER_PAGE,
+) -> Pagination:
+    """Возвращает страницу пользователей (per_page не больше MAX_PER_PAGE)."""
+    return db.paginate(
+        user_directory_query(search, group_id).order_by(User.id),
+        page=page,
+        per_page=per_page,
+        max_per_page=MAX_PER_PAGE,
+        error_out=False,
+    )
+
+
+def users_keyset_page(
+    filters: UserFilters,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    per_page: int = DEFAULT_PER_PAGE,
+) -> KeysetPage:
+    """Возвращает страницу пользователей после курсора after или перед before.
+
+    Страница выбирается условием по колонке сортировки и LIMIT, без OFFSET,
+    поэтому стоимость не растет с номером страницы.
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    column = USER_SORTS[filters.sort]
+    query = user_directory_query(filters.search, filters.group_id, filters.flags)
+
+    before_value = decode_cursor(before)
+    after_value = None if before_value is not None else decode_cursor(after)
+    # Назад идем в обратном порядке и разворачиваем результат
+    backwards = before_value is not None
+    ascending = filters.descending == backwards
+    cursor = before_value if backwards else after_value
+    if cursor is not None:
+        query = query.where(column > cursor if ascending else column < cursor)
+    query = query.order_by(column.asc() if ascending else column.desc()).limit(per_page + 1)
+
+    items = db.session.execute(query).unique().scalars().all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if backwards:
+        items.reverse()
+
+    def item_cursor(user: User) -> str:
+        return encode_cursor(getattr(user, column.key))
+
+    if not items:
+        return KeysetPage(items, None, None)
+    if backwards:
+        return KeysetPage(items, item_cursor(items[-1]), item_cursor(items[0]) if has_more else None)
+    return KeysetPage(
+        items,
+        item_cursor(items[-1]) if has_more else None,
+        item_cursor(items[0]) if cursor is not None else None,
+    )
+
+
+def user_summary() -> Dict[str, int]:
+    """Счетчики пользователей для админки одним агрегирующим запросом."""
+    def count_true(column):
+        return func.coalesce(func.sum(case((column.is_(True), 1), else_=0)), 0)
+
+    row = db.session.execute(select(
+        func.count(User.id),
+        count_true(User.is_subscribed),
+        count_true(User.is_trial_subscription),
+        count_true(User.is_admin),
+        count_true(User.is_verified),
+    )).one()
+    total, subscribed, trial, admins, verified = row
+    return {
+        "total": total,
+        "subscribed": subscribed,
+        "unsubscribed": total - subscribed,
+        "trial": trial,
+        "admins": admins,
+        "verified": verified,
+    }
+
+
+def serialize_user(user: User) -> Dict[str, Any]:
+    """Данные пользователя для ответа API админки."""
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "group": {"id": user.group.id, "name": user.group.name} if user.group else None,
+        "is_admin": bool(user.is_admin),
+        "is_subscribed": bool(user.is_subscribed),
+        "subscription_expires": (
+            user.subscription_expires.isoformat() if user.subscription_expires else None
+        ),
+    }
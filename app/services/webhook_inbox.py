@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from flask import Flask, current_app
+from sqlalchemy.exc import IntegrityError
+
+from .. import db
+from ..models import Payment, PaymentWebhookEvent, User
+from ..utils.payment_service import forget_payment_status, get_payment_service
+from .background import PeriodicTask, get_periodic_task, start_periodic_task
+from .identity import invalidate_users
+
+
+TASK_NAME = "payment_webhooks"
+
+
+def _insert_ignore(values: Dict[str, Any]) -> bool:
+    """INSERT ... ON CONFLICT DO NOTHING по ключу (платеж, событие)."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        try:
+            db.session.add(PaymentWebhookEvent(**values))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    stmt = (
+        insert(PaymentWebhookEvent)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=["yookassa_payment_id", "event"])
+    )
+    result = db.session.execute(stmt)
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def enqueue_webhook_event(event: str, payment_data: Dict[str, Any]) -> bool:
+    """Сохраняет уведомление во входящий журнал.
+
+    Возвращает False, если такое событие для платежа уже было получено.
+    """
+    inserted = _insert_ignore(
+        {
+            "yookassa_payment_id": payment_data["id"],
+            "event": event or "",
+            "status": payment_data.get("status"),
+            "payload": json.dumps(payment_data, ensure_ascii=False),
+            "received_at": datetime.utcnow(),
+        }
+    )
+    if inserted:
+        task = get_periodic_task(current_app._get_current_object(), TASK_NAME)
+        if task is not None and task.is_running:
+            task.trigger()
+        else:
+            # Воркер не запущен — обрабатываем сразу, чтобы событие не зависло
+            process_webhook_inbox()
+    return inserted
+
+
+def _apply_event(event: PaymentWebhookEvent) -> Optional[int]:
+    """Применяет событие к платежу. Возвращает id пользователя, если он изменён."""
+    payment_record = Payment.query.filter_by(
+        yookassa_payment_id=event.yookassa_payment_id
+    ).first()
+    if not payment_record:
+        current_app.logger.error(
+            f"Платеж {event.yookassa_payment_id} из webhook не найден в базе данных"
+        )
+        return None
+
+    payment_data = json.loads(event.payload)
+    new_status = payment_data.get("status", "pending")
+    if new_status != payment_record.status:
+        payment_record.status = new_status
+        payment_record.updated_at = datetime.utcnow()
+        forget_payment_status(payment_record.yookassa_payment_id)
+
+    user = User.query.get(payment_record.user_id)
+    if not user:
+        return None
+
+    if new_status == "succeeded" and payment_data.get("paid", False):
+        # Статус succeeded мог уже записать опрос статуса без активации, поэтому
+        # повторную активацию отсекает отметка платежа, а не его статус. Повторы
+        # самого уведомления отбрасываются при вставке в журнал
+        if payment_record.activated_at is not None:
+            return None
+        subscription_days = get_payment_service().activate_subscription(
+            user, payment_record
+        )
+        current_app.logger.info(
+            f"Подписка активирована для пользователя {user.username} на {subscription_days} дней"
+        )
+        return user.id
+
+    if new_status == "canceled":
+        user.is_subscribed = False
+        user.subscription_expires = None
+        user.refresh_access()
+        current_app.logger.info(f"Подписка сброшена для пользователя {user.username}")
+        return user.id
+
+    return None
+
+
+def _record_failure(event: PaymentWebhookEvent, error: Exception) -> None:
+    """Запоминает ошибку применения события; после PAYMENT_WEBHOOK_MAX_ATTEMPTS оно больше не выбирается."""
+    event.attempts += 1
+    event.last_error = str(error)
+    if event.attempts >= current_app.config["PAYMENT_WEBHOOK_MAX_ATTEMPTS"]:
+        current_app.logger.error(
+            f"Webhook {event.event} платежа {event.yookassa_payment_id} не применен "
+            f"после {event.attempts} попыток: {error}"
+        )
+    else:
+        current_app.logger.warning(
+            f"Ошибка применения webhook {event.event} платежа {event.yookassa_payment_id}: {error}"
+        )
+
+
+def process_webhook_inbox(limit: int = 200) -> int:
+    """Применяет необработанные события по порядку поступления.
+
+    Каждое событие применяется в своей точке сохранения: ошибка откатывает
+    только его, увеличивает счетчик попыток и не мешает остальным. Более
+    поздние события того же платежа в этом проходе пропускаются, чтобы
+    события платежа применялись строго по порядку.
+    Возвращает количество обработанных событий.
+    """
+    events = (
+        PaymentWebhookEvent.query.filter(
+            PaymentWebhookEvent.processed_at.is_(None),
+            PaymentWebhookEvent.attempts < current_app.config["PAYMENT_WEBHOOK_MAX_ATTEMPTS"],
+        )
+        .order_by(PaymentWebhookEvent.id)
+        .limit(limit)
+        .all()
+    )
+    if not events:
+        return 0
+
+    changed_users = set()
+    failed_payments = set()
+    processed = 0
+    for event in events:
+        if event.yookassa_payment_id in failed_payments:
+            continue
+        try:
+            with db.session.begin_nested():
+                user_id = _apply_event(event)
+                event.processed_at = datetime.utcnow()
+        except Exception as e:
+            failed_payments.add(event.yookassa_payment_id)
+            _record_failure(event, e)
+            continue
+        processed += 1
+        if user_id is not None:
+            changed_users.add(user_id)
+    db.session.commit()
+
+    invalidate_users(changed_users)
+
+    current_app.logger.info(
+        f"Обработано webhook-событий: {processed} (с ошибкой: {len(failed_payments)})"
+    )
+    return processed
+
+
+def start_webhook_worker(app: Flask) -> Optional[PeriodicTask]:
+    """Запускает обработку журнала webhook'ов (PAYMENT_WEBHOOK_INTERVAL секунд)."""
+    return start_periodic_task(
+        app,
+        TASK_NAME,
+        app.config.get("PAYMENT_WEBHOOK_INTERVAL", 0),
+        process_webhook_inbox,
+    )
@@ -5,9 +5,22 @@
 import os
 import shutil
 from datetime import datetime
-from typing import Tuple, List
+from typing import List, Optional, Tuple
 from flask import current_app
 
+from ..models import StoredFile
+from ..services.file_cleanup import remove_paths
+from ..services.stored_files import (
+    KIND_TICKET,
+    FileTooLargeError,
+    file_paths,
+    forget_files,
+    register_file,
+    storage_key,
+    user_files_condition,
+    write_stream,
+)
+
 
 class FileStorageManager:
     """
@@ -152,22 +165,94 @@ class FileStorageManager:
         return full_path, relative_path
 
     @staticmethod
-    def save_file(file, full_path: str) -> bool:
+    def save_file(
+        file,
+        full_path: str,
+        kind: str,
+        owner_id: Optional[int] = None,
+        subject_id: Optional[int] = None,
+        ticket_id: Optional[int] = None,
+        max_size: Optional[int] = None,
+    ) -> Optional[StoredFile]:
         """
-        Сохраняет файл по указанному пути
+        Сохраняет файл по указанному пути и записывает его в реестр файлов
+
+        Файл копируется блоками во временный файл и атомарно переименовывается,
+        размер и хэш считаются при записи: файл не читается целиком в память
+        и не перечитывается с диска.
 
         Args:
             file: Файловый объект
             full_path: Полный путь для сохранения
+            kind: Вид файла (material, solution, submission, chat, ticket)
+            owner_id: ID пользователя, загрузившего файл
+            subject_id: ID предмета
+            ticket_id: ID тикета
+            max_size: Максимальный размер в байтах (по умолчанию без ограничения)
 
         Returns:
-            bool: True если файл сохранен успешно
+            Optional[StoredFile]: Запись реестра (коммит делает вызывающий код)
+            или None, если файл не сохранен
+
+        Raises:
+            FileTooLargeError: файл больше max_size, ничего не сохранено
         """
         try:
-            file.save(full_path)
-            return True
+            size, sha256 = write_stream(
+                getattr(file, "stream", file), full_path, max_size
+            )
+            return register_file(
+                full_path,
+                kind,
+                owner_id,
+                subject_id,
+                ticket_id,
+                size=size,
+                sha256=sha256,
+            )
+        except FileTooLargeError:
+            raise
         except Exception as e:
             current_app.logger.error(f"Ошибка сохранения файла {full_path}: {str(e)}")
+            return None
+
+    @staticmethod
+    def get_ticket_file_full_path(file_path: str) -> str:
+        """
+        Возвращает полный путь к файлу тикета по пути из TicketFile.file_path
+
+        Args:
+            file_path: Путь из БД (номер_тикета/файл или ticket_files/файл)
+
+        Returns:
+            str: Полный путь к файлу на диске
+        """
+        if file_path.startswith("ticket_files/"):
+            # Файлы ответов пользователя хранятся прямо в static/ticket_files
+            return os.path.join(current_app.static_folder, file_path)
+        ticket_base = current_app.config.get(
+            "TICKET_FILES_FOLDER", "app/static/ticket_files"
+        )
+        return os.path.join(ticket_base, file_path)
+
+    @staticmethod
+    def delete_stored_file(full_path: str) -> bool:
+        """
+        Удаляет файл с диска и из реестра файлов
+
+        Args:
+            full_path: Полный путь к файлу
+
+        Returns:
+            bool: True если файла больше нет на диске и в реестре
+        """
+        try:
+            key = storage_key(full_path)
+            remove_paths([full_path])
+            forget_files(StoredFile.path == key)
+            return True
+        except Exception as e:
+            current_app.logger.error(f"Ошибка удаления файла {full_path}: {str(e)}")
             return False
 
     @staticmethod
@@ -181,18 +266,9 @@ class FileStorageManager:
         Returns:
             bool: True если файл удален успешно
         """
-        try:
-            # Получаем полный путь к файлу
-            static_folder = current_app.static_folder
-            full_path = os.path.join(static_folder, relative_path)
-
-            if os.path.exists(full_path):
-                os.remove(full_path)
-                return True
-            return False
-        except Exception as e:
-            current_app.logger.error(f"Ошибка удаления файла {relative_path}: {str(e)}")
-            return False
+        return FileStorageManager.delete_stored_file(
+            os.path.join(current_app.static_folder, relative_path)
+        )
 
     @staticmethod
     def delete_ticket_files(ticket_id: int) -> bool:
@@ -206,15 +282,16 @@ class FileStorageManager:
             bool: True если файлы удалены успешно
         """
         try:
+            remove_paths(file_paths(StoredFile.ticket_id == ticket_id))
+            forget_files(StoredFile.ticket_id == ticket_id)
+
             ticket_base = current_app.config.get(
                 "TICKET_FILES_FOLDER", "app/static/ticket_files"
             )
             ticket_path = os.path.join(ticket_base, str(ticket_id))
-
             if os.path.exists(ticket_path):
                 shutil.rmtree(ticket_path)
-                return True
-            return False
+            return True
         except Exception as e:
             current_app.logger.error(
                 f"Ошибка удаления файлов тикета {ticket_id}: {str(e)}"
@@ -224,7 +301,9 @@ class FileStorageManager:
     @staticmethod
     def delete_user_files(user_id: int) -> bool:
         """
-        Удаляет все файлы пользователя (чаты, материалы)
+        Удаляет все файлы пользователя (чаты, решения, вложения тикетов)
+
+        Файлы выбираются из реестра по индексу владельца, без обхода папок.
 
         Args:
             user_id: ID пользователя
@@ -233,22 +312,9 @@ class FileStorageManager:
             bool: True если файлы удалены успешно
         """
         try:
-            # Удаляем файлы чата
-            chat_base = current_app.config.get(
-                "CHAT_FILES_FOLDER", "app/static/chat_files"
-            )
-            chat_path = os.path.join(chat_base, str(user_id))
-            if os.path.exists(chat_path):
-                shutil.rmtree(chat_path)
-
-            # Удаляем файлы материалов
-            upload_base = current_app.config.get("UPLOAD_FOLDER", "app/static/uploads")
-            if os.path.exists(upload_base):
-                for subject_folder in os.listdir(upload_base):
-                    user_path = os.path.join(upload_base, subject_folder, str(user_id))
-                    if os.path.exists(user_path):
-                        shutil.rmtree(user_path)
-
+            condition = user_files_condition([user_id])
+            remove_paths(file_paths(condition))
+            forget_files(condition)
             return True
         except Exception as e:
             current_app.logger.error(
@@ -302,50 +368,6 @@ class FileStorageManager:
         extension = filename.rsplit(".", 1)[1].lower()
         return extension in allowed_extensions
 
-    @staticmethod
-    def validate_file_size(file, max_size: int = None) -> bool:
-        """
-        Проверяет размер файла
-
-        Args:
-            file: Файловый объект
-            max_size: Максимальный размер в байтах (по умолчанию MAX_FILE_SIZE)
-
-        Returns:
-            bool: True если размер файла допустим
-        """
-        if max_size is None:
-            max_size = FileStorageManager.MAX_FILE_SIZE
-
-        file_size = FileStorageManager.get_file_size(file)
-        return file_size <= max_size
-
-    @staticmethod
-    def get_file_size(file) -> int:
-        """
-        Получает размер файла в байтах
-
-        Args:
-            file: Файловый объект
-
-        Returns:
-            int: Размер файла в байтах
-        """
-        try:
-            # Сохраняем текущую позицию
-            current_pos = file.tell()
-
-            # Перемещаемся в конец файла
-            file.seek(0, 2)
-            size = file.tell()
-
-            # Возвращаемся в исходную позицию
-            file.seek(current_pos)
-
-            return size
-        except Exception:
-            return 0
-
     @staticmethod
     def format_file_size(size_bytes: int) -> str:
         """
@@ -369,13 +391,16 @@ class FileStorageManager:
         return f"{size_bytes:.1f} {size_names[i]}"
 
     @staticmethod
-    def process_ticket_files(files: List, ticket_id: int) -> List[dict]:
+    def process_ticket_files(
+        files: List, ticket_id: int, owner_id: Optional[int] = None
+    ) -> List[dict]:
         """
         Обрабатывает файлы тикета и возвращает информацию о сохраненных файлах
 
         Args:
             files: Список файловых объектов
             ticket_id: ID тикета
+            owner_id: ID пользователя, загрузившего файлы
 
         Returns:
             List[dict]: Список словарей с информацией о файлах
@@ -386,11 +411,6 @@ class FileStorageManager:
             if not file or not file.filename or not file.filename.strip():
                 continue
 
-            # Проверяем размер файла
-            if not FileStorageManager.validate_file_size(file):
-                current_app.logger.warning(f"Файл {file.filename} слишком большой")
-                continue
-
             # Проверяем расширение файла
             if not FileStorageManager.is_allowed_file(file.filename):
                 current_app.logger.warning(
@@ -403,12 +423,24 @@ class FileStorageManager:
                 ticket_id, file.filename
             )
 
-            # Сохраняем файл
-            if FileStorageManager.save_file(file, full_path):
+            # Сохраняем файл, размер проверяется при записи
+            try:
+                stored = FileStorageManager.save_file(
+                    file,
+                    full_path,
+                    KIND_TICKET,
+                    owner_id,
+                    ticket_id=ticket_id,
+                    max_size=FileStorageManager.MAX_FILE_SIZE,
+                )
+            except FileTooLargeError:
+                current_app.logger.warning(f"Файл {file.filename} слишком большой")
+                continue
+            if stored:
                 file_info = {
                     "file_path": relative_path,
                     "file_name": file.filename,
-                    "file_size": FileStorageManager.get_file_size(file),
+                    "file_size": stored.size,
                     "file_type": FileStorageManager.get_file_type(file.filename),
                 }
                 saved_files.append(file_info)
@@ -5,10 +5,70 @@
 import uuid
 from datetime import datetime, timedelta
 from ..models import db, Payment, User
+from ..services.cache import TTLCache
+from ..services.entitlement import (
+    get_cached_entitlement,
+    remember_entitlement,
+)
+from ..services.identity import invalidate_user
 from flask import current_app
-from typing import Dict, Any
-import requests
-import base64
+from typing import TYPE_CHECKING, Dict, Any
+
+if TYPE_CHECKING:
+    # requests импортируется лениво, при первом обращении к API ЮKassa
+    from .yookassa_client import YooKassaClient
+
+
+# Финальные статусы платежа, которые больше не меняются
+TERMINAL_PAYMENT_STATUSES = ("succeeded", "canceled")
+
+# Кэш ответов get_payment_status: payment_id -> dict
+payment_status_cache = TTLCache(ttl=10)
+
+
+def forget_payment_status(payment_id: str) -> None:
+    """Сбрасывает закэшированный статус после изменения платежа"""
+    payment_status_cache.delete(payment_id)
+
+
+def get_yookassa_client() -> "YooKassaClient":
+    """
+    Возвращает общий для процесса HTTP-клиент ЮKassa текущего приложения
+
+    Возвращает:
+        YooKassaClient: Клиент с пулом соединений
+    """
+    client = current_app.extensions.get("yookassa_client")
+    if client is None:
+        from .yookassa_client import YooKassaClient
+
+        config = current_app.config
+        client = YooKassaClient(
+            base_url=config["YOOKASSA_API_URL"],
+            shop_id=config["YOOKASSA_SHOP_ID"],
+            secret_key=config["YOOKASSA_SECRET_KEY"],
+            pool_size=config["YOOKASSA_POOL_SIZE"],
+            connect_timeout=config["YOOKASSA_CONNECT_TIMEOUT"],
+            read_timeout=config["YOOKASSA_READ_TIMEOUT"],
+            max_retries=config["YOOKASSA_MAX_RETRIES"],
+            backoff_factor=config["YOOKASSA_RETRY_BACKOFF"],
+        )
+        current_app.extensions["yookassa_client"] = client
+    return client
+
+
+def get_payment_service() -> "YooKassaService":
+    """
+    Возвращает общий для процесса экземпляр сервиса платежей
+
+    Сервис не хранит состояния запроса, поэтому создается один раз
+    на приложение и переиспользует пул соединений клиента.
+    """
+    service = current_app.extensions.get("yookassa_service")
+    if service is None:
+        service = YooKassaService()
+        current_app.extensions["yookassa_service"] = service
+    return service
 
 
 class YooKassaService:
@@ -18,7 +78,7 @@ class YooKassaService:
         """Инициализация сервиса с настройками из конфигурации"""
         self.shop_id = current_app.config["YOOKASSA_SHOP_ID"]
         self.secret_key = current_app.config["YOOKASSA_SECRET_KEY"]
-        self.base_url = "https://api.yookassa.ru/v3"
+        self.base_url = current_app.config["YOOKASSA_API_URL"]
 
         # Проверяем, что ключи настроены корректно
         if not self.shop_id or not self.secret_key:
@@ -30,11 +90,6 @@ class YooKassaService:
             self.simulation_mode = False
             current_app.logger.info("Режим реальных платежей ЮKassa активирован")
 
-    def _get_auth_header(self) -> str:
-        """Создает заголовок авторизации для API ЮKassa"""
-        auth_string = f"{self.shop_id}:{self.secret_key}"
-        return base64.b64encode(auth_string.encode()).decode()
-
     def _get_subscription_days(self, amount: float) -> int:
         """
         Определяет количество дней подписки по сумме платежа
@@ -63,6 +118,30 @@ class YooKassaService:
             )
             return 30
 
+    def activate_subscription(self, user: User, payment_record: Payment) -> int:
+        """
+        Активирует оплаченную подписку и пересчитывает право доступа пользователя.
+        Платеж помечается activated_at: вызывающий код активирует только платежи
+        без этой отметки. Коммит выполняет вызывающий код.
+
+        Параметры:
+            user (User): Владелец платежа
+            payment_record (Payment): Успешный платеж
+
+        Возвращает:
+            int: Количество дней подписки
+        """
+        user.is_subscribed = True
+
+        # Определяем период подписки по сумме платежа
+        subscription_days = self._get_subscription_days(payment_record.amount)
+        user.subscription_expires = datetime.utcnow() + timedelta(
+            days=subscription_days
+        )
+        user.refresh_access(has_paid=True)
+        payment_record.activated_at = datetime.utcnow()
+        return subscription_days
+
     def _make_api_request(
         self, endpoint: str, method: str = "GET", data: Dict[str, Any] = None
     ) -> Dict[str, Any]:
@@ -81,20 +160,10 @@ class YooKassaService:
             current_app.logger.info(f"Симуляция API запроса: {method} {endpoint}")
             return {"simulation": True, "status": "success"}
 
-        url = f"{self.base_url}/{endpoint}"
-        headers = {
-            "Authorization": f"Basic {self._get_auth_header()}",
-            "Content-Type": "application/json",
-            "Idempotence-Key": str(uuid.uuid4()),
-        }
+        from requests.exceptions import RequestException
 
         try:
-            if method == "GET":
-                response = requests.get(url, headers=headers)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, json=data)
-            else:
-                raise ValueError(f"Неподдерживаемый HTTP метод: {method}")
+            response = get_yookassa_client().request(method, endpoint, data)
 
             if response.status_code == 200:
                 return response.json()
@@ -104,7 +173,7 @@ class YooKassaService:
                 )
                 return {"error": f"HTTP {response.status_code}"}
 
-        except requests.exceptions.RequestException as e:
+        except RequestException as e:
             current_app.logger.error(f"Ошибка сетевого запроса к ЮKassa: {str(e)}")
             return {"error": str(e)}
 
@@ -281,12 +350,41 @@ class YooKassaService:
         """
         Получает статус платежа из ЮKassa
 
+        Ответ кэшируется по payment_id: промежуточные статусы на
+        PAYMENT_STATUS_CACHE_TTL секунд, финальные (succeeded, canceled) -
+        бессрочно. Запись кэша сбрасывается при изменении платежа.
+
         Параметры:
             payment_id (str): ID платежа
 
         Возвращает:
             Dict[str, Any]: Информация о статусе платежа
         """
+        cached = payment_status_cache.get(payment_id)
+        if cached is not None:
+            return dict(cached)
+
+        status = self._fetch_payment_status(payment_id)
+        if "error" not in status:
+            ttl = (
+                None
+                if status.get("status") in TERMINAL_PAYMENT_STATUSES
+                else current_app.config["PAYMENT_STATUS_CACHE_TTL"]
+            )
+            payment_status_cache.set(payment_id, dict(status), ttl=ttl)
+        return status
+
+    @staticmethod
+    def _update_payment_status(payment_record: Payment, status: str) -> None:
+        """Сохраняет статус платежа, только если он изменился"""
+        if payment_record.status == status:
+            return
+        payment_record.status = status
+        payment_record.updated_at = datetime.utcnow()
+        db.session.commit()
+
+    def _fetch_payment_status(self, payment_id: str) -> Dict[str, Any]:
+        """Получает статус платежа из ЮKassa без обращения к кэшу"""
         try:
             current_app.logger.info(f"Получение статуса платежа: {payment_id}")
 
@@ -310,9 +408,7 @@ class YooKassaService:
                 # Если платеж создан более 5 минут назад и статус все еще pending,
                 # считаем что он был отменен
                 if (datetime.utcnow() - payment_record.created_at) > timedelta(minutes=5):
-                    payment_record.status = "canceled"
-                    payment_record.updated_at = datetime.utcnow()
-                    db.session.commit()
+                    self._update_payment_status(payment_record, "canceled")
                     
                     current_app.logger.info(
                         f"Симуляция: платеж {payment_id} помечен как отмененный (таймаут)"
@@ -329,9 +425,7 @@ class YooKassaService:
                     }
                 else:
                     # Платеж в обработке
-                    payment_record.status = "pending"
-                    payment_record.updated_at = datetime.utcnow()
-                    db.session.commit()
+                    self._update_payment_status(payment_record, "pending")
 
                     current_app.logger.info(
                         f"Симуляция: платеж {payment_id} в обработке"
@@ -357,9 +451,9 @@ class YooKassaService:
                     return api_response
 
                 # Обновляем статус в базе данных
-                payment_record.status = api_response.get("status", "pending")
-                payment_record.updated_at = datetime.utcnow()
-                db.session.commit()
+                self._update_payment_status(
+                    payment_record, api_response.get("status", "pending")
+                )
 
                 return {
                     "payment_id": payment_id,
@@ -404,6 +498,10 @@ class YooKassaService:
                 current_app.logger.error(f"Платеж {payment_id} не найден в базе данных")
                 return False
 
+            if payment_record.activated_at is not None:
+                # Подписка по этому платежу уже активирована (webhook или сверка)
+                return True
+
             # Проверяем статус платежа
             payment_status = self.get_payment_status(payment_id)
 
@@ -416,18 +514,14 @@ class YooKassaService:
             # Активируем подписку пользователя
             user = User.query.get(payment_record.user_id)
             if user:
-                user.is_subscribed = True
-
-                # Определяем период подписки по сумме платежа
-                subscription_days = self._get_subscription_days(payment_record.amount)
-                user.subscription_expires = datetime.utcnow() + timedelta(
-                    days=subscription_days
-                )
-
                 payment_record.status = "succeeded"
                 payment_record.updated_at = datetime.utcnow()
 
+                subscription_days = self.activate_subscription(user, payment_record)
+
                 db.session.commit()
+                invalidate_user(user.id)
+                forget_payment_status(payment_id)
                 current_app.logger.info(
                     f"Подписка активирована для пользователя {user.username} на {subscription_days} дней"
                 )
@@ -445,70 +539,29 @@ class YooKassaService:
         """
         Проверяет активность подписки пользователя
 
+        Результат кэшируется по user.id в рамках запроса и между запросами
+        (см. services/entitlement.py) до ближайшего истечения подписки.
+
         Параметры:
             user (User): Пользователь для проверки
 
         Возвращает:
             bool: True если подписка активна
         """
-        # Сначала проверяем пробную подписку
-        if user.is_trial_subscription:
-            if user.trial_subscription_expires and user.trial_subscription_expires < datetime.utcnow():
-                # Пробная подписка истекла
-                user.is_trial_subscription = False
-                user.trial_subscription_expires = None
-                db.session.commit()
-                current_app.logger.info(
-                    f"Пробная подписка пользователя {user.username} истекла"
-                )
-                return False
-            return True
-
-        if not user.is_subscribed:
-            return False
+        cached = get_cached_entitlement(user.id)
+        if cached is not None:
+            return cached
 
-        # Если подписка выдана вручную администратором, пропускаем проверку платежей
-        if user.is_manual_subscription:
-            current_app.logger.info(
-                f"Пользователь {user.username} имеет ручно выданную подписку"
-            )
-            if (
-                user.subscription_expires
-                and user.subscription_expires < datetime.utcnow()
-            ):
-                # Подписка истекла
-                user.is_subscribed = False
-                user.is_manual_subscription = False
-                db.session.commit()
-                current_app.logger.info(
-                    f"Ручная подписка пользователя {user.username} истекла"
-                )
-                return False
-            return True
-
-        # Проверяем, есть ли успешный платеж для этой подписки
-        successful_payment = (
-            Payment.query.filter_by(user_id=user.id, status="succeeded")
-            .order_by(Payment.created_at.desc())
-            .first()
-        )
+        is_active = self._check_user_subscription(user)
+        remember_entitlement(user.id, is_active, user.access_until)
+        return is_active
 
-        if not successful_payment:
-            # Нет успешного платежа - сбрасываем подписку
-            user.is_subscribed = False
-            db.session.commit()
-            current_app.logger.warning(
-                f"Пользователь {user.username} имеет подписку без успешного платежа - сброс"
-            )
-            return False
-
-        if user.subscription_expires and user.subscription_expires < datetime.utcnow():
-            # Подписка истекла
-            user.is_subscribed = False
-            db.session.commit()
-            return False
-
-        return True
+    def _check_user_subscription(self, user: User) -> bool:
+        """
+        Проверяет подписку по денормализованному access_until без обращения к кэшу.
+        Только чтение: флаги истекших подписок снимает subscription_sweeper.
+        """
+        return user.has_access()
 
     def get_trial_subscription_info(self, user: User) -> dict:
         """
@@ -536,10 +589,7 @@ class YooKassaService:
         
         now = datetime.utcnow()
         if user.trial_subscription_expires < now:
-            # Пробная подписка истекла
-            user.is_trial_subscription = False
-            user.trial_subscription_expires = None
-            db.session.commit()
+            # Пробная подписка истекла, флаги снимет subscription_sweeper
             return {
                 'is_trial': False,
                 'days_left': 0,
@@ -0,0 +1,150 @@
+"""
+HTTP-клиент API ЮKassa с пулом соединений, таймаутами и повторами
+"""
+
+import re
+import time
+import uuid
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class LatencyStats:
+    """Потокобезопасная статистика задержек запросов по типам эндпоинтов"""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def observe(self, label: str, seconds: float, error: bool = False) -> None:
+        """Учитывает один вызов"""
+        with self._lock:
+            stat = self._stats.setdefault(
+                label, {"count": 0, "errors": 0, "total": 0.0, "max": 0.0}
+            )
+            stat["count"] += 1
+            stat["total"] += seconds
+            stat["max"] = max(stat["max"], seconds)
+            if error:
+                stat["errors"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Возвращает копию статистики
+
+        Возвращает:
+            Dict[str, Dict[str, float]]: label -> count, errors, avg, max (секунды)
+        """
+        with self._lock:
+            return {
+                label: {
+                    "count": stat["count"],
+                    "errors": stat["errors"],
+                    "avg": stat["total"] / stat["count"] if stat["count"] else 0.0,
+                    "max": stat["max"],
+                }
+                for label, stat in self._stats.items()
+            }
+
+    def summary(self) -> str:
+        """Строка для лога: label n=... errors=... avg=...ms max=...ms"""
+        return "; ".join(
+            f"{label} n={stat['count']} errors={stat['errors']} "
+            f"avg={stat['avg'] * 1000:.0f}ms max={stat['max'] * 1000:.0f}ms"
+            for label, stat in sorted(self.snapshot().items())
+        ) or "нет запросов"
+
+
+class YooKassaClient:
+    """
+    Долгоживущий клиент API ЮKassa.
+
+    Один экземпляр на процесс: requests.Session держит keep-alive соединения
+    в пуле, поэтому повторные запросы не проходят TLS-рукопожатие заново.
+    Идемпотентные GET-запросы повторяются с экспоненциальной задержкой.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        base_url: str,
+        shop_id: str,
+        secret_key: str,
+        pool_size: int = 10,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.latency = LatencyStats()
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+
+        self.session = requests.Session()
+        self.session.auth = (shop_id, secret_key)
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @staticmethod
+    def _label(method: str, endpoint: str) -> str:
+        """Метка для метрики без идентификаторов платежей"""
+        return f"{method} " + re.sub(r"^payments/[^/]+", "payments/{id}", endpoint)
+
+    def request(
+        self, method: str, endpoint: str, data: Optional[Dict[str, Any]] = None
+    ) -> requests.Response:
+        """
+        Выполняет запрос к API и учитывает его задержку
+
+        Параметры:
+            method (str): HTTP метод (GET или POST)
+            endpoint (str): Конечная точка API относительно base_url
+            data (Dict[str, Any]): Тело POST-запроса
+
+        Возвращает:
+            requests.Response: Ответ API
+        """
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Неподдерживаемый HTTP метод: {method}")
+
+        headers = {}
+        if method == "POST":
+            headers["Idempotence-Key"] = str(uuid.uuid4())
+
+        started = time.perf_counter()
+        error = True
+        try:
+            response = self.session.request(
+                method,
+                f"{self.base_url}/{endpoint}",
+                json=data,
+                headers=headers,
+                timeout=self.timeout,
+            )
+            error = response.status_code >= 400
+            return response
+        finally:
+            self.latency.observe(
+                self._label(method, endpoint), time.perf_counter() - started, error
+            )
+
+    def close(self) -> None:
+        """Закрывает соединения пула"""
+        self.session.close()
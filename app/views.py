@@ -8,12 +8,12 @@ from flask import (
     current_app,
     jsonify,
     session,
+    abort,
 )
 from flask_login import login_user, logout_user, login_required, current_user
 from .models import (
     User,
     Material,
-    Submission,
     Subject,
     Payment,
     ChatMessage,
@@ -28,6 +28,7 @@ from .models import (
     Group,
     SubjectGroup,
     SiteSettings,
+    StoredFile,
 )
 from .forms import (
     LoginForm,
@@ -45,12 +46,39 @@ from .forms import (
     SiteSettingsForm,
 )
 from . import db, login_manager
-from .utils.payment_service import YooKassaService
+from .utils.payment_service import forget_payment_status, get_payment_service
 from .utils.email_service import EmailService
+from .services.identity import clear_identities, invalidate_user, load_cached_user
+from .services.webhook_inbox import enqueue_webhook_event
+from .services.user_deletion import delete_users, purge_group_users
+from .services.stored_files import (
+    KIND_CHAT,
+    KIND_MATERIAL,
+    KIND_SOLUTION,
+    KIND_SUBMISSION,
+    KIND_TICKET,
+    FileTooLargeError,
+    discard_files,
+    storage_summary,
+    storage_usage_by_owner,
+    upload_paths,
+)
+from .services.file_cleanup import wake_file_cleanup
+from .services.file_delivery import can_download, resolve_file, send_stored_file
+from .services.user_directory import (
+    DEFAULT_PER_PAGE,
+    KeysetPage,
+    UserFilters,
+    search_users,
+    serialize_user,
+    user_summary,
+    users_keyset_page,
+)
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
 import random
 import string
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 import json
@@ -65,6 +93,8 @@ from .services.shortlink_service import (
     reset_clicks,
     update_rule,
     delete_short_link,
+    short_links_page,
+    count_short_links,
 )
 
 bp = Blueprint("main", __name__)
@@ -83,13 +113,6 @@ def inject_json_parser():
     return dict(parse_json=parse_json)
 
 
-@bp.app_context_processor
-def inject_timestamp():
-    """Добавляет timestamp для предотвращения кэширования CSS/JS"""
-    from time import time
-    return dict(timestamp=int(time()))
-
-
 @bp.app_context_processor
 def inject_moment():
     """Добавляет функцию moment для форматирования дат"""
@@ -125,7 +148,7 @@ def inject_moment():
 @login_manager.user_loader
 def load_user(user_id):
     try:
-        return User.query.get(int(user_id))
+        return load_cached_user(int(user_id))
     except Exception as e:
         current_app.logger.error(f"Error loading user {user_id}: {e}")
         return None
@@ -139,7 +162,7 @@ def index():
     if current_user.is_authenticated:
         # Проверяем подписку пользователя
         try:
-            payment_service = YooKassaService()
+            payment_service = get_payment_service()
             is_subscribed = payment_service.check_user_subscription(current_user)
         except Exception as e:
             current_app.logger.error(f"Error checking subscription in index: {e}")
@@ -213,9 +236,9 @@ def subscription():
                 f"Создание платежа - period: {period}, amount: {amount}"
             )
 
-            # Создаем сервис платежей
-            payment_service = YooKassaService()
-            current_app.logger.info("Сервис платежей создан")
+            # Получаем сервис платежей
+            payment_service = get_payment_service()
+            current_app.logger.info("Сервис платежей получен")
 
             # Создаем "Умный платеж" с выбранной ценой
             return_url = url_for("main.payment_success", _external=True)
@@ -271,84 +294,38 @@ def subscription():
 
 @bp.route("/payment/webhook", methods=["POST"])
 def payment_webhook():
-    """Обработка webhook'ов от ЮKassa"""
+    """Прием webhook'ов от ЮKassa: только запись во входящий журнал"""
     try:
         # Получаем данные от ЮKassa
-        data = request.get_json()
-        current_app.logger.info(f"Получен webhook от ЮKassa: {data}")
+        data = request.get_json(silent=True)
 
         if not data:
             current_app.logger.error("Пустые данные в webhook")
             return "OK", 200
 
-        # Проверяем тип события
         event = data.get("event")
-        payment_data = data.get("object", {})
+        payment_data = data.get("object") or {}
         payment_id = payment_data.get("id")
 
         if not payment_id:
             current_app.logger.error("Payment ID не найден в webhook")
             return "OK", 200
 
-        current_app.logger.info(
-            f"Обработка webhook: event={event}, payment_id={payment_id}"
-        )
-
-        # Находим платеж в базе данных
-        payment_record = Payment.query.filter_by(yookassa_payment_id=payment_id).first()
-
-        if not payment_record:
-            current_app.logger.error(f"Платеж {payment_id} не найден в базе данных")
-            return "OK", 200
-
-        # Обновляем статус платежа
-        payment_record.status = payment_data.get("status", "pending")
-        payment_record.updated_at = datetime.utcnow()
-
-        # Если платеж успешен, активируем подписку
-        if payment_data.get("status") == "succeeded" and payment_data.get(
-            "paid", False
-        ):
-            current_app.logger.info(f"Платеж {payment_id} успешен, активируем подписку")
-
-            user = User.query.get(payment_record.user_id)
-            if user:
-                user.is_subscribed = True
-
-                # Определяем период подписки по сумме платежа
-                payment_service = YooKassaService()
-                subscription_days = payment_service._get_subscription_days(
-                    payment_record.amount
-                )
-                user.subscription_expires = datetime.utcnow() + timedelta(
-                    days=subscription_days
-                )
-
-                current_app.logger.info(
-                    f"Подписка активирована для пользователя {user.username} на {subscription_days} дней"
-                )
-        
-        # Если платеж отменен, сбрасываем подписку пользователя
-        elif payment_data.get("status") == "canceled":
-            current_app.logger.info(f"Платеж {payment_id} отменен, сбрасываем подписку")
-            
-            user = User.query.get(payment_record.user_id)
-            if user:
-                user.is_subscribed = False
-                user.subscription_expires = None
-                current_app.logger.info(
-                    f"Подписка сброшена для пользователя {user.username}"
-                )
-
-        db.session.commit()
-        current_app.logger.info(
-            f"Webhook обработан успешно: payment_id={payment_id}, status={payment_data.get('status')}"
-        )
+        # Платеж и подписку обновляет воркер журнала (services/webhook_inbox.py)
+        if enqueue_webhook_event(event, payment_data):
+            current_app.logger.info(
+                f"Webhook принят: event={event}, payment_id={payment_id}"
+            )
+        else:
+            current_app.logger.info(
+                f"Повторный webhook проигнорирован: event={event}, payment_id={payment_id}"
+            )
 
         return "OK", 200
 
     except Exception as e:
         current_app.logger.error(f"Ошибка обработки webhook: {str(e)}")
+        db.session.rollback()
         return "OK", 200  # Всегда возвращаем 200, чтобы ЮKassa не повторял запрос
 
 
@@ -370,8 +347,8 @@ def payment_success():
     if source == "yookassa":
         current_app.logger.info("Обнаружен возврат от ЮKassa - проверяем статус платежа")
         
-        # Создаем сервис платежей для проверки статуса
-        payment_service = YooKassaService()
+        # Получаем сервис платежей для проверки статуса
+        payment_service = get_payment_service()
         
         # Проверяем статус платежа
         if payment_id:
@@ -420,8 +397,8 @@ def payment_success():
             flash("Ошибка поиска платежей. Попробуйте оформить подписку снова.", "error")
             return redirect(url_for("main.subscription"))
 
-    # Создаем сервис платежей
-    payment_service = YooKassaService()
+    # Получаем сервис платежей
+    payment_service = get_payment_service()
     current_app.logger.info("Обработка платежа")
 
     # Проверяем, что платеж существует и принадлежит текущему пользователю
@@ -540,9 +517,11 @@ def payment_cancel():
         try:
             payment_record = Payment.query.filter_by(yookassa_payment_id=payment_id).first()
             if payment_record:
-                payment_record.status = "canceled"
-                payment_record.updated_at = datetime.utcnow()
-                db.session.commit()
+                if payment_record.status != "canceled":
+                    payment_record.status = "canceled"
+                    payment_record.updated_at = datetime.utcnow()
+                    db.session.commit()
+                forget_payment_status(payment_id)
                 current_app.logger.info(f"Статус платежа {payment_id} обновлен на 'canceled'")
             else:
                 current_app.logger.warning(f"Платеж {payment_id} не найден в базе данных")
@@ -566,8 +545,8 @@ def payment_status():
     if form.validate_on_submit():
         payment_id = form.payment_id.data
         try:
-            # Создаем сервис платежей
-            payment_service = YooKassaService()
+            # Получаем сервис платежей
+            payment_service = get_payment_service()
             status = payment_service.get_payment_status(payment_id)
 
             if "error" in status:
@@ -586,7 +565,7 @@ def payment_status():
 def api_payment_status(payment_id):
     """API для проверки статуса платежа"""
     try:
-        payment_service = YooKassaService()
+        payment_service = get_payment_service()
         status = payment_service.get_payment_status(payment_id)
         return jsonify(status)
     except Exception as e:
@@ -599,8 +578,8 @@ def api_payment_status(payment_id):
 def profile():
     """Страница профиля пользователя"""
     try:
-        # Создаем сервис платежей
-        payment_service = YooKassaService()
+        # Получаем сервис платежей
+        payment_service = get_payment_service()
         # Проверяем актуальность подписки
         is_subscribed = payment_service.check_user_subscription(current_user)
     except Exception as e:
@@ -625,8 +604,8 @@ def subject_detail(subject_id):
     # Проверяем подписку для аутентифицированных пользователей
     if current_user.is_authenticated:
         try:
-            # Создаем сервис платежей
-            payment_service = YooKassaService()
+            # Получаем сервис платежей
+            payment_service = get_payment_service()
             # Проверяем подписку пользователя
             if not payment_service.check_user_subscription(current_user):
                 flash("Для доступа к предметам необходима активная подписка.", "warning")
@@ -700,7 +679,9 @@ def subject_detail(subject_id):
                 )
 
                 # Сохраняем файл
-                if FileStorageManager.save_file(file, full_path):
+                if FileStorageManager.save_file(
+                    file, full_path, KIND_MATERIAL, current_user.id, subject.id
+                ):
                     filename = relative_path
 
             if form.type.data == "assignment" and form.solution_file.data:
@@ -716,7 +697,13 @@ def subject_detail(subject_id):
                 )
 
                 # Сохраняем файл решения
-                if FileStorageManager.save_file(solution_file, full_solution_path):
+                if FileStorageManager.save_file(
+                    solution_file,
+                    full_solution_path,
+                    KIND_SOLUTION,
+                    current_user.id,
+                    subject.id,
+                ):
                     solution_filename = relative_solution_path
             material = Material(
                 title=form.title.data,
@@ -729,6 +716,8 @@ def subject_detail(subject_id):
             )
             db.session.add(material)
             db.session.commit()
+            # Перезаписанный файл с тем же именем мог освободить содержимое хранилища
+            wake_file_cleanup()
             flash("Материал добавлен")
             return redirect(url_for("main.subject_detail", subject_id=subject.id))
     return render_template(
@@ -748,11 +737,14 @@ def delete_subject(subject_id):
         flash("Доступ запрещён")
         return redirect(url_for("main.index"))
     subject = Subject.query.get_or_404(subject_id)
+    # Файлы материалов и решений предмета удаляются с диска после коммита
+    discard_files(StoredFile.subject_id == subject.id)
     # Удаляем все материалы этого предмета
     for material in subject.materials:
         db.session.delete(material)
     db.session.delete(subject)
     db.session.commit()
+    wake_file_cleanup()
     flash("Предмет удалён")
     return redirect(url_for("main.index"))
 
@@ -886,6 +878,7 @@ def email_verification():
                     is_trial_subscription=trial_enabled,  # Активируем пробную подписку только если включено
                     trial_subscription_expires=datetime.utcnow() + timedelta(days=14) if trial_enabled else None,  # 14 дней пробной подписки
                 )
+                user.refresh_access()
                 db.session.add(user)
                 db.session.commit()
 
@@ -1039,6 +1032,7 @@ def password_reset_confirm():
                 user.password = generate_password_hash(new_password)
                 reset.is_used = True
                 db.session.commit()
+                invalidate_user(user.id)
 
                 current_app.logger.info(
                     f"Password reset successful for user {user.username} ({user.email})"
@@ -1130,8 +1124,8 @@ def handle_404(error):
 def material_detail(material_id):
     material = Material.query.get_or_404(material_id)
 
-    # Создаем сервис платежей
-    payment_service = YooKassaService()
+    # Получаем сервис платежей
+    payment_service = get_payment_service()
     # Проверяем подписку пользователя
     if not payment_service.check_user_subscription(current_user):
         flash("Для доступа к материалам необходима активная подписка.", "warning")
@@ -1162,9 +1156,12 @@ def add_solution_file(material_id):
         )
 
         # Сохраняем файл
-        if FileStorageManager.save_file(file, full_path):
+        if FileStorageManager.save_file(
+            file, full_path, KIND_SOLUTION, current_user.id, subject.id
+        ):
             material.solution_file = relative_path
             db.session.commit()
+            wake_file_cleanup()
             flash("Готовая практика добавлена")
     return redirect(url_for("main.subject_detail", subject_id=material.subject_id))
 
@@ -1174,8 +1171,8 @@ def add_solution_file(material_id):
 def submit_solution(material_id):
     material = Material.query.get_or_404(material_id)
 
-    # Создаем сервис платежей и проверяем подписку
-    payment_service = YooKassaService()
+    # Получаем сервис платежей и проверяем подписку
+    payment_service = get_payment_service()
     if not payment_service.check_user_subscription(current_user):
         flash("Для загрузки решений необходима активная подписка.", "warning")
         return redirect(url_for("main.subscription"))
@@ -1198,21 +1195,35 @@ def submit_solution(material_id):
         )
 
         # Сохраняем файл
-        if FileStorageManager.save_file(file, full_path):
+        if FileStorageManager.save_file(
+            file, full_path, KIND_SUBMISSION, current_user.id, subject.id
+        ):
             # Обновить или создать Submission
             from .models import Submission
 
-            submission = Submission.query.filter_by(
-                user_id=current_user.id, material_id=material.id
-            ).first()
+            filters = dict(user_id=current_user.id, material_id=material.id)
+            submission = Submission.query.filter_by(**filters).first()
             if not submission:
-                submission = Submission(
-                    user_id=current_user.id, material_id=material.id
-                )
-                db.session.add(submission)
-            submission.file = relative_path
-            db.session.commit()
-            flash("Решение загружено")
+                # Вставка в точке сохранения: при гонке откатывается только она,
+                # а запись файла в реестре остается в транзакции
+                try:
+                    with db.session.begin_nested():
+                        submission = Submission(**filters)
+                        db.session.add(submission)
+                except IntegrityError:
+                    # Параллельная загрузка уже создала сдачу — обновляем её
+                    submission = Submission.query.filter_by(**filters).first()
+            if submission is None:
+                # Сдачу удалили параллельно (вместе с материалом или пользователем)
+                discard_files(StoredFile.path.in_(upload_paths([relative_path])))
+                db.session.commit()
+                wake_file_cleanup()
+                flash("Не удалось сохранить решение, попробуйте еще раз", "error")
+            else:
+                submission.file = relative_path
+                db.session.commit()
+                wake_file_cleanup()
+                flash("Решение загружено")
     return redirect(url_for("main.subject_detail", subject_id=material.subject_id))
 
 
@@ -1224,8 +1235,15 @@ def delete_material(material_id):
         return redirect(url_for("main.index"))
     material = Material.query.get_or_404(material_id)
     subject_id = material.subject_id
+    # Файлы материала и решений к нему удаляются с диска после коммита
+    paths = upload_paths(
+        [material.file, material.solution_file]
+        + [submission.file for submission in material.submissions]
+    )
+    discard_files(StoredFile.path.in_(paths))
     db.session.delete(material)
     db.session.commit()
+    wake_file_cleanup()
     flash("Материал удалён")
     return redirect(url_for("main.subject_detail", subject_id=subject_id))
 
@@ -1383,6 +1401,7 @@ def admin_users():
                 )
                 user.password = generate_password_hash(new_password)
                 db.session.commit()
+                invalidate_user(user.id)
                 password_map[user.id] = new_password
                 flash(f"Пароль для пользователя {user.username} сброшен")
             else:
@@ -1408,108 +1427,14 @@ def admin_users():
                     flash("Нельзя удалить администратора", "error")
                 else:
                     username = user.username
-                    current_app.logger.info(
-                        f"Начинаем удаление пользователя {username} (ID: {user.id})"
+                    counts = delete_users([user.id])
+                    flash(
+                        f"Пользователь {username} удалён "
+                        f"(решений: {counts.get('submissions', 0)}, "
+                        f"платежей: {counts.get('payments', 0)}, "
+                        f"тикетов: {counts.get('tickets', 0)}, "
+                        f"сообщений чата: {counts.get('chat_messages', 0)})"
                     )
-
-                    # Удаляем все связанные данные пользователя
-                    try:
-                        # Удаляем уведомления
-                        notifications_count = Notification.query.filter_by(
-                            user_id=user.id
-                        ).count()
-                        Notification.query.filter_by(user_id=user.id).delete()
-                        current_app.logger.info(
-                            f"Удалено уведомлений: {notifications_count}"
-                        )
-
-                        # Удаляем сообщения тикетов
-                        ticket_messages_count = TicketMessage.query.filter_by(
-                            user_id=user.id
-                        ).count()
-                        TicketMessage.query.filter_by(user_id=user.id).delete()
-                        current_app.logger.info(
-                            f"Удалено сообщений тикетов: {ticket_messages_count}"
-                        )
-
-                        # Удаляем тикеты пользователя
-                        tickets_count = Ticket.query.filter_by(user_id=user.id).count()
-                        Ticket.query.filter_by(user_id=user.id).delete()
-                        current_app.logger.info(f"Удалено тикетов: {tickets_count}")
-
-                        # Удаляем коды подтверждения email
-                        email_verifications_count = EmailVerification.query.filter_by(
-                            user_id=user.id
-                        ).count()
-                        EmailVerification.query.filter_by(user_id=user.id).delete()
-                        current_app.logger.info(
-                            f"Удалено кодов подтверждения email: {email_verifications_count}"
-                        )
-
-                        # Удаляем платежи
-                        payments_count = Payment.query.filter_by(
-                            user_id=user.id
-                        ).count()
-                        Payment.query.filter_by(user_id=user.id).delete()
-                        current_app.logger.info(f"Удалено платежей: {payments_count}")
-
-                        # Удаляем решения
-                        submissions_count = Submission.query.filter_by(
-                            user_id=user.id
-                        ).count()
-                        Submission.query.filter_by(user_id=user.id).delete()
-                        current_app.logger.info(f"Удалено решений: {submissions_count}")
-
-                        # Удаляем сообщения чата
-                        chat_messages_count = ChatMessage.query.filter_by(
-                            user_id=user.id
-                        ).count()
-                        ChatMessage.query.filter_by(user_id=user.id).delete()
-                        current_app.logger.info(
-                            f"Удалено сообщений чата: {chat_messages_count}"
-                        )
-
-                        # Удаляем файлы пользователя с использованием FileStorageManager
-                        from .utils.file_storage import FileStorageManager
-
-                        if FileStorageManager.delete_user_files(user.id):
-                            current_app.logger.info(
-                                f"Файлы пользователя {user.id} успешно удалены"
-                            )
-                        else:
-                            current_app.logger.warning(
-                                f"Ошибка при удалении файлов пользователя {user.id}"
-                            )
-
-                        # Удаляем файлы тикетов
-                        for ticket in Ticket.query.filter_by(user_id=user.id).all():
-                            if FileStorageManager.delete_ticket_files(ticket.id):
-                                current_app.logger.info(
-                                    f"Файлы тикета {ticket.id} успешно удалены"
-                                )
-                            else:
-                                current_app.logger.warning(
-                                    f"Ошибка при удалении файлов тикета {ticket.id}"
-                                )
-
-                        # Удаляем самого пользователя
-                        db.session.delete(user)
-                        db.session.commit()
-                        current_app.logger.info(
-                            f"Пользователь {username} успешно удален"
-                        )
-                        flash(f"Пользователь {username} удалён")
-
-                    except Exception as e:
-                        current_app.logger.error(
-                            f"Ошибка при удалении связанных данных пользователя {username}: {str(e)}"
-                        )
-                        import traceback
-
-                        current_app.logger.error(f"Traceback: {traceback.format_exc()}")
-                        db.session.rollback()
-                        flash(f"Ошибка при удалении пользователя {username}", "error")
-                        return redirect(url_for("main.admin_users"))
             else:
                 flash("Пользователь не найден", "error")
         except Exception as e:
@@ -1535,6 +1460,7 @@ def admin_users():
                         else "снят с администратора"
                     )
                     db.session.commit()
+                    invalidate_user(user.id)
                     flash(f"Пользователь {user.username} {status}")
             else:
                 flash("Пользователь не найден", "error")
@@ -1566,6 +1492,7 @@ def admin_users():
                     flash(f"Пользователь {user.username} убран из группы")
                 
                 db.session.commit()
+                invalidate_user(user.id)
             else:
                 flash("Пользователь не найден", "error")
         except Exception as e:
@@ -1607,8 +1534,10 @@ def admin_users():
                         True  # Устанавливаем флаг ручной подписки
                     )
                     status = "выдана на 30 дней"
+                user.refresh_access()
 
                 db.session.commit()
+                invalidate_user(user.id)
                 current_app.logger.info(
                     f"Подписка успешно изменена: {user.username} - {status}"
                 )
@@ -1685,33 +1614,83 @@ def admin_users():
             db.session.rollback()
             flash("Ошибка обновления правил короткой ссылки", "error")
 
-    # Получаем все короткие ссылки
+    # Страница коротких ссылок (от новых к старым)
     try:
-        short_links = ShortLink.query.order_by(ShortLink.created_at.desc()).all()
+        short_links, short_links_next = short_links_page(
+            before_id=request.args.get("links_before", type=int)
+        )
+        short_links_total = count_short_links()
     except Exception as e:
         current_app.logger.error(f"Error loading short links: {e}")
-        short_links = []
+        short_links, short_links_next, short_links_total = [], None, 0
         flash("Ошибка загрузки коротких ссылок.", "error")
 
-    # Получаем всех пользователей с информацией о подписке
+    # Страница пользователей с фильтрами и счетчики по всем пользователям
+    filters = UserFilters.from_args(request.args)
     try:
-        users = User.query.all()
+        users_page = users_keyset_page(
+            filters,
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+            per_page=request.args.get("per_page", DEFAULT_PER_PAGE, type=int),
+        )
+        summary = user_summary()
+        # Занятое место пользователей страницы и всего хранилища из реестра файлов
+        storage_usage = storage_usage_by_owner(user.id for user in users_page.items)
+        storage = storage_summary()
     except Exception as e:
         current_app.logger.error(f"Error loading users: {e}")
-        users = []
+        users_page = KeysetPage([], None, None)
+        summary = dict.fromkeys(("total", "subscribed", "unsubscribed", "trial", "admins", "verified"), 0)
+        storage_usage, storage = {}, {"files": 0, "size": 0, "disk": 0}
         flash("Ошибка загрузки пользователей.", "error")
 
     return render_template(
         "admin/users.html",
-        users=users,
+        users=users_page.items,
+        users_page=users_page,
+        filters=filters,
+        filter_args=filters.to_args(),
+        summary=summary,
+        storage_usage=storage_usage,
+        storage=storage,
         form=form,
         password_map=password_map,
         message=message,
         short_links=short_links,
-        groups=Group.query.all(),  # Добавляем группы для модальных окон
+        short_links_next=short_links_next,
+        short_links_total=short_links_total,
+        groups=Group.query.order_by(Group.name).all(),  # Для фильтра и модальных окон
     )
 
 
+@bp.route("/api/admin/users")
+@login_required
+def api_admin_users():
+    """API справочника пользователей для админки: поиск и постраничный вывод"""
+    if not current_user.is_admin:
+        return jsonify({"success": False, "error": "Доступ запрещен"}), 403
+
+    try:
+        pagination = search_users(
+            search=request.args.get("q", ""),
+            group_id=request.args.get("group_id", type=int),
+            page=request.args.get("page", 1, type=int),
+            per_page=request.args.get("per_page", DEFAULT_PER_PAGE, type=int),
+        )
+        return jsonify({
+            "success": True,
+            "users": [serialize_user(user) for user in pagination.items],
+            "page": pagination.page,
+            "per_page": pagination.per_page,
+            "pages": pagination.pages,
+            "total": pagination.total,
+        })
+    except Exception as e:
+        current_app.logger.error(f"Error in api_admin_users: {e}")
+        return jsonify({"success": False, "error": "Ошибка загрузки пользователей"}), 500
+
+
 @bp.route("/admin/groups", methods=["GET", "POST"])
 @login_required
 def admin_groups():
@@ -1781,6 +1760,8 @@ def admin_groups():
                         current_app.logger.info(f"Статус активности обновлен: {group.is_active}")
                     
                     db.session.commit()
+                    # Группа закэширована вместе с пользователями
+                    clear_identities()
                     
                     # Возвращаем JSON ответ для AJAX
                     if request.headers.get('Accept') == 'application/json':
@@ -1861,6 +1842,28 @@ def admin_groups():
                 else:
                     flash("Ошибка при удалении группы", "error")
 
+        # Удаление всех пользователей группы (кроме администраторов)
+        elif request.form.get("action") == "purge_users":
+            try:
+                group_id = int(request.form.get("group_id"))
+                group = Group.query.get(group_id)
+                if group:
+                    group_name = group.name
+                    counts = purge_group_users(group_id)
+                    current_app.logger.info(f"Очищена группа '{group_name}': {counts}")
+                    flash(
+                        f"Из группы '{group_name}' удалено пользователей: {counts['users']} "
+                        f"(решений: {counts.get('submissions', 0)}, "
+                        f"платежей: {counts.get('payments', 0)}, "
+                        f"тикетов: {counts.get('tickets', 0)})"
+                    )
+                else:
+                    flash("Группа не найдена", "error")
+            except Exception as e:
+                current_app.logger.error(f"Ошибка удаления пользователей группы: {str(e)}")
+                db.session.rollback()
+                flash("Ошибка при удалении пользователей группы", "error")
+
     # Получаем все группы
     try:
         groups = Group.query.order_by(Group.name).all()
@@ -2011,27 +2014,6 @@ def admin_settings():
     return render_template("admin/settings.html", form=form)
 
 
-# Добавляю context_processor для передачи users и формы на все страницы
-@bp.app_context_processor
-def inject_admin_users():
-    """
-    Context processor для передачи списка пользователей в шаблоны.
-
-    Возвращает:
-        dict: Словарь с ключом 'users' для использования в шаблонах
-    """
-    try:
-        users = (
-            User.query.all()
-            if current_user.is_authenticated and current_user.is_admin
-            else []
-        )
-    except Exception as e:
-        current_app.logger.error(f"Error in inject_admin_users: {e}")
-        users = []
-    return dict(users=users)
-
-
 @bp.app_context_processor
 def inject_subscription_status():
     """
@@ -2049,7 +2031,7 @@ def inject_subscription_status():
             current_app.logger.info(f"is_trial_subscription: {current_user.is_trial_subscription}")
             current_app.logger.info(f"trial_subscription_expires: {current_user.trial_subscription_expires}")
             
-            payment_service = YooKassaService()
+            payment_service = get_payment_service()
             is_subscribed = payment_service.check_user_subscription(current_user)
             
             # Получаем информацию о пробной подписке
@@ -2083,6 +2065,21 @@ def wiki():
     """
     return render_template("static/wiki.html")
 
+@bp.route("/files/<area>/<path:filename>")
+@login_required
+def download_file(area, filename):
+    """
+    Скачивание загруженного файла (материала, решения, вложения чата или тикета)
+    с проверкой подписки, группы или владельца тикета.
+    """
+    stored = resolve_file(area, filename)
+    if stored is None:
+        abort(404)
+    if not can_download(current_user, stored):
+        abort(403)
+    return send_stored_file(stored, download_name=request.args.get("name"))
+
+
 # Чат-система
 @bp.route("/chat/messages")
 @login_required
@@ -2103,6 +2100,11 @@ def get_chat_messages():
                     "username": msg.user.username,
                     "message": msg.message,
                     "file_path": msg.file_path,
+                    "file_url": (
+                        url_for("main.download_file", area="chat_files", filename=msg.file_path)
+                        if msg.file_path
+                        else None
+                    ),
                     "file_name": msg.file_name,
                     "file_type": msg.file_type,
                     "created_at": msg.created_at.strftime("%H:%M"),
@@ -2169,14 +2171,6 @@ def send_chat_message():
                     {"success": False, "error": "Неподдерживаемый тип файла"}
                 )
 
-            # Проверяем размер файла (максимум 10MB)
-            if len(file.read()) > 10 * 1024 * 1024:
-                return jsonify(
-                    {"success": False, "error": "Файл слишком большой (максимум 10MB)"}
-                )
-
-            file.seek(0)  # Возвращаем указатель в начало
-
             # Сохраняем файл
             from werkzeug.utils import secure_filename
 
@@ -2189,8 +2183,20 @@ def send_chat_message():
                 current_user.id, filename
             )
 
-            # Сохраняем файл
-            if FileStorageManager.save_file(file, full_path):
+            # Сохраняем файл, размер (максимум 10MB) проверяется при записи
+            try:
+                stored = FileStorageManager.save_file(
+                    file,
+                    full_path,
+                    KIND_CHAT,
+                    current_user.id,
+                    max_size=FileStorageManager.MAX_FILE_SIZE,
+                )
+            except FileTooLargeError:
+                return jsonify(
+                    {"success": False, "error": "Файл слишком большой (максимум 10MB)"}
+                )
+            if stored:
                 # Определяем тип файла
                 file_type = FileStorageManager.get_file_type(filename)
 
@@ -2212,6 +2218,15 @@ def send_chat_message():
                 "username": current_user.username,
                 "message": chat_message.message,
                 "file_path": chat_message.file_path,
+                "file_url": (
+                    url_for(
+                        "main.download_file",
+                        area="chat_files",
+                        filename=chat_message.file_path,
+                    )
+                    if chat_message.file_path
+                    else None
+                ),
                 "file_name": chat_message.file_name,
                 "file_type": chat_message.file_type,
                 "created_at": chat_message.created_at.strftime("%H:%M"),
@@ -2402,12 +2417,6 @@ def upload_ticket_file(ticket_id: int):
 
         from .utils.file_storage import FileStorageManager
 
-        # Проверяем размер файла
-        if not FileStorageManager.validate_file_size(file):
-            return jsonify(
-                {"success": False, "error": "Файл слишком большой (максимум 10MB)"}
-            )
-
         # Проверяем тип файла
         if not FileStorageManager.is_allowed_file(file.filename):
             return jsonify({"success": False, "error": "Неподдерживаемый тип файла"})
@@ -2417,14 +2426,27 @@ def upload_ticket_file(ticket_id: int):
             ticket_id, file.filename
         )
 
-        # Сохраняем файл
-        if FileStorageManager.save_file(file, full_path):
+        # Сохраняем файл, размер проверяется при записи
+        try:
+            stored = FileStorageManager.save_file(
+                file,
+                full_path,
+                KIND_TICKET,
+                current_user.id,
+                ticket_id=ticket.id,
+                max_size=FileStorageManager.MAX_FILE_SIZE,
+            )
+        except FileTooLargeError:
+            return jsonify(
+                {"success": False, "error": "Файл слишком большой (максимум 10MB)"}
+            )
+        if stored:
             # Создаем запись о файле
             ticket_file = TicketFile(
                 ticket_id=ticket.id,
                 file_path=relative_path,
                 file_name=file.filename,
-                file_size=FileStorageManager.get_file_size(file),
+                file_size=stored.size,
                 file_type=FileStorageManager.get_file_type(file.filename),
             )
 
@@ -2477,11 +2499,14 @@ def delete_ticket_file(ticket_id: int, file_id: int):
 
         from .utils.file_storage import FileStorageManager
 
-        # Удаляем файл с диска
-        if FileStorageManager.delete_file(ticket_file.file_path):
+        # Удаляем файл с диска и из реестра
+        if FileStorageManager.delete_stored_file(
+            FileStorageManager.get_ticket_file_full_path(ticket_file.file_path)
+        ):
             # Удаляем запись из БД
             db.session.delete(ticket_file)
             db.session.commit()
+            wake_file_cleanup()
 
             return jsonify({"success": True, "message": "Файл успешно удален"})
         else:
@@ -2515,6 +2540,12 @@ def get_ticket_files(ticket_id: int):
                     "type": ticket_file.file_type,
                     "uploaded_at": ticket_file.uploaded_at.strftime("%d.%m.%Y %H:%M"),
                     "path": ticket_file.file_path,
+                    "url": url_for(
+                        "main.download_file",
+                        area="ticket_files",
+                        filename=ticket_file.file_path,
+                        name=ticket_file.file_name,
+                    ),
                 }
             )
 
@@ -2559,7 +2590,9 @@ def create_ticket():
             from .utils.file_storage import FileStorageManager
 
             # Обрабатываем файлы тикета
-            saved_files = FileStorageManager.process_ticket_files(files, ticket.id)
+            saved_files = FileStorageManager.process_ticket_files(
+                files, ticket.id, current_user.id
+            )
 
             # Создаем записи о файлах в БД
             for file_info in saved_files:
@@ -2687,6 +2720,7 @@ def user_response_to_ticket():
         if files:
             import os
             from werkzeug.utils import secure_filename
+            from .utils.file_storage import FileStorageManager
 
             upload_dir = os.path.join(current_app.static_folder, "ticket_files")
             if not os.path.exists(upload_dir):
@@ -2694,14 +2728,6 @@ def user_response_to_ticket():
 
             for file in files:
                 if file and file.filename and file.filename.strip():
-                    # Проверяем размер файла (максимум 10MB)
-                    file.seek(0, 2)
-                    file_size = file.tell()
-                    file.seek(0)
-
-                    if file_size > 10 * 1024 * 1024:  # 10MB
-                        continue
-
                     # Проверяем расширение файла
                     allowed_extensions = {
                         "png",
@@ -2732,7 +2758,20 @@ def user_response_to_ticket():
                     )
 
                     file_path = os.path.join(upload_dir, unique_filename)
-                    file.save(file_path)
+                    # Размер (максимум 10MB) проверяется при записи
+                    try:
+                        stored = FileStorageManager.save_file(
+                            file,
+                            file_path,
+                            KIND_TICKET,
+                            current_user.id,
+                            ticket_id=ticket.id,
+                            max_size=FileStorageManager.MAX_FILE_SIZE,
+                        )
+                    except FileTooLargeError:
+                        continue
+                    if not stored:
+                        continue
 
                     # Определяем тип файла
                     if file_extension in {"png", "jpg", "jpeg", "gif"}:
@@ -2747,7 +2786,7 @@ def user_response_to_ticket():
                         ticket_id=ticket.id,
                         file_path=f"ticket_files/{unique_filename}",
                         file_name=filename,
-                        file_size=file_size,
+                        file_size=stored.size,
                         file_type=file_type,
                     )
 
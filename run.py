@@ -1,6 +1,8 @@
 from app import create_app
+from app.services.background import start_background_tasks
 
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8001)
\ No newline at end of file
+    start_background_tasks(app)
+    app.run(host='0.0.0.0', port=8001)
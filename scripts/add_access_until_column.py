@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Скрипт для добавления колонок access_until/access_kind в таблицу user
+и заполнения их для существующих пользователей
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import User, Payment
+
+def add_access_until_column():
+    """Добавляет колонки access_until/access_kind и индекс, затем пересчитывает доступ"""
+    app = create_app()
+
+    with app.app_context():
+        print("Добавление колонок access_until/access_kind в таблицу user...")
+
+        try:
+            from sqlalchemy import text
+            result = db.session.execute(text("PRAGMA table_info(user)"))
+            columns = [row[1] for row in result.fetchall()]
+
+            if 'access_until' not in columns:
+                db.session.execute(text("ALTER TABLE user ADD COLUMN access_until DATETIME"))
+                print("✅ Колонка access_until добавлена")
+            else:
+                print("✅ Колонка access_until уже существует")
+
+            if 'access_kind' not in columns:
+                db.session.execute(text("ALTER TABLE user ADD COLUMN access_kind VARCHAR(20)"))
+                print("✅ Колонка access_kind добавлена")
+            else:
+                print("✅ Колонка access_kind уже существует")
+
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_user_access_until ON user (access_until)"
+            ))
+            db.session.commit()
+            print("✅ Индекс ix_user_access_until создан")
+
+        except Exception as e:
+            print(f"❌ Ошибка при добавлении колонок: {e}")
+            db.session.rollback()
+            return
+
+        print("Пересчет права доступа для существующих пользователей...")
+
+        try:
+            # Одним запросом получаем пользователей с успешными платежами
+            paid_user_ids = {
+                row[0] for row in db.session.query(Payment.user_id)
+                .filter(Payment.status == 'succeeded')
+                .distinct()
+            }
+
+            updated = 0
+            for user in User.query.yield_per(500):
+                user.refresh_access(has_paid=user.id in paid_user_ids)
+                if user.access_kind:
+                    updated += 1
+            db.session.commit()
+
+            print(f"✅ Пересчитано пользователей с доступом: {updated}")
+
+        except Exception as e:
+            print(f"❌ Ошибка при пересчете доступа: {e}")
+            db.session.rollback()
+            return
+
+        print("\n🎉 Миграция завершена успешно!")
+
+if __name__ == '__main__':
+    add_access_until_column()
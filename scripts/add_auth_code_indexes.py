@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Скрипт для добавления индексов в таблицы email_verification и password_reset
+и удаления накопившихся использованных и истекших кодов
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.services.auth_codes import purge_auth_codes
+
+INDEXES = [
+    ("ix_email_verification_email_is_used", "email_verification", "email, is_used"),
+    ("ix_email_verification_user_id", "email_verification", "user_id"),
+    ("ix_email_verification_is_used_expires_at", "email_verification", "is_used, expires_at"),
+    ("ix_password_reset_code_is_used_expires_at", "password_reset", "code, is_used, expires_at"),
+    ("ix_password_reset_email_is_used", "password_reset", "email, is_used"),
+    ("ix_password_reset_is_used_expires_at", "password_reset", "is_used, expires_at"),
+]
+
+def add_auth_code_indexes():
+    """Создает индексы для поиска кодов и очищает устаревшие коды"""
+    app = create_app()
+
+    with app.app_context():
+        print("Добавление индексов для кодов подтверждения и восстановления...")
+
+        try:
+            from sqlalchemy import text
+            for name, table, columns in INDEXES:
+                db.session.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+                ))
+                print(f"✅ Индекс {name} создан")
+            db.session.execute(text("ANALYZE email_verification"))
+            db.session.execute(text("ANALYZE password_reset"))
+            db.session.commit()
+
+        except Exception as e:
+            print(f"❌ Ошибка при создании индексов: {e}")
+            db.session.rollback()
+            return
+
+        print("Удаление использованных и истекших кодов...")
+
+        try:
+            counts = purge_auth_codes()
+            print(
+                f"✅ Удалено кодов подтверждения: {counts['email_verifications']}, "
+                f"кодов восстановления: {counts['password_resets']}"
+            )
+        except Exception as e:
+            print(f"❌ Ошибка при удалении кодов: {e}")
+            db.session.rollback()
+            return
+
+        print("\n🎉 Миграция завершена успешно!")
+
+if __name__ == '__main__':
+    add_auth_code_indexes()
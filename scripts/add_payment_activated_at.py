@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Скрипт для добавления колонки activated_at в таблицу payment
+и отметки уже примененных успешных платежей
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+
+def add_payment_activated_at():
+    """Добавляет колонку activated_at и отмечает успешные платежи как примененные"""
+    app = create_app()
+
+    with app.app_context():
+        print("Добавление колонки activated_at в таблицу payment...")
+
+        try:
+            from sqlalchemy import text
+            result = db.session.execute(text("PRAGMA table_info(payment)"))
+            columns = [row[1] for row in result.fetchall()]
+
+            if 'activated_at' not in columns:
+                db.session.execute(text("ALTER TABLE payment ADD COLUMN activated_at DATETIME"))
+                print("✅ Колонка activated_at добавлена")
+            else:
+                print("✅ Колонка activated_at уже существует")
+
+            # Успешные платежи до миграции уже продлили подписку: повторная
+            # активация по запоздавшему webhook продлила бы ее второй раз
+            result = db.session.execute(text(
+                "UPDATE payment SET activated_at = COALESCE(updated_at, created_at) "
+                "WHERE status = 'succeeded' AND activated_at IS NULL"
+            ))
+            db.session.commit()
+            print(f"✅ Отмечено успешных платежей: {result.rowcount}")
+
+        except Exception as e:
+            print(f"❌ Ошибка при добавлении колонки: {e}")
+            db.session.rollback()
+            return
+
+        print("\n🎉 Миграция завершена успешно!")
+
+if __name__ == '__main__':
+    add_payment_activated_at()
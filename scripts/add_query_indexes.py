@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Скрипт для добавления индексов под частые запросы приложения
+
+Перед созданием уникального индекса на submission (user_id, material_id)
+удаляет дубликаты сдач, оставляя самую последнюю. Файлы сдач не удаляются.
+
+Проверить планы запросов после миграции:
+    python3 scripts/check_query_plans.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+
+INDEXES = [
+    ("ix_payment_user_id_status_created_at", "payment", "user_id, status, created_at", False),
+    ("ix_payment_user_id_created_at", "payment", "user_id, created_at", False),
+    ("ix_payment_status_created_at", "payment", "status, created_at", False),
+    ("ix_notification_user_id_is_read_created_at", "notification", "user_id, is_read, created_at", False),
+    ("ix_chat_message_created_at", "chat_message", "created_at", False),
+    ("ix_chat_message_user_id", "chat_message", "user_id", False),
+    ("ix_material_subject_id_type", "material", "subject_id, type", False),
+    ("ix_submission_user_id_material_id", "submission", "user_id, material_id", True),
+    ("ix_submission_material_id", "submission", "material_id", False),
+    ("ix_ticket_user_id", "ticket", "user_id", False),
+    ("ix_ticket_created_at", "ticket", "created_at", False),
+    ("ix_ticket_file_ticket_id", "ticket_file", "ticket_id", False),
+    ("ix_ticket_message_ticket_id_is_admin", "ticket_message", "ticket_id, is_admin", False),
+    ("ix_ticket_message_user_id", "ticket_message", "user_id", False),
+    ("ix_user_group_id", '"user"', "group_id", False),
+]
+
+def add_query_indexes():
+    """Удаляет дубликаты сдач и создает индексы"""
+    app = create_app()
+
+    with app.app_context():
+        from sqlalchemy import text
+
+        print("Удаление дубликатов сдач заданий...")
+
+        try:
+            result = db.session.execute(text(
+                """
+                DELETE FROM submission
+                WHERE id NOT IN (
+                    SELECT MAX(id) FROM submission GROUP BY user_id, material_id
+                )
+                """
+            ))
+            db.session.commit()
+            print(f"✅ Удалено дубликатов: {result.rowcount}")
+
+        except Exception as e:
+            print(f"❌ Ошибка при удалении дубликатов: {e}")
+            db.session.rollback()
+            return
+
+        print("Добавление индексов...")
+
+        try:
+            for name, table, columns, unique in INDEXES:
+                db.session.execute(text(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+                ))
+                print(f"✅ Индекс {name} создан")
+            db.session.execute(text("ANALYZE"))
+            db.session.commit()
+
+        except Exception as e:
+            print(f"❌ Ошибка при создании индексов: {e}")
+            db.session.rollback()
+            return
+
+        print("\n🎉 Миграция завершена успешно!")
+
+if __name__ == '__main__':
+    add_query_indexes()
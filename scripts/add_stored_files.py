@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Скрипт для создания реестра файлов stored_file и заполнения его файлами,
+загруженными до появления реестра
+
+Один раз обходит папки UPLOAD_FOLDER, CHAT_FILES_FOLDER и TICKET_FILES_FOLDER
+и определяет вид и владельца файла по структуре папок:
+    uploads/id_предмета/файл                    — материал или готовое решение
+    uploads/id_предмета/id_пользователя/файл    — решение пользователя
+    chat_files/id_пользователя/файл             — вложение чата
+    ticket_files/номер_тикета/файл              — вложение тикета
+    ticket_files/номер_тикета_user_response_... — вложение ответа в тикете
+Одинаковые файлы связываются с хранилищем содержимого BLOB_FOLDER и занимают
+место на диске один раз. Уже записанные файлы только связываются
+с хранилищем, скрипт можно запускать повторно.
+
+Записи с абсолютными путями (реестр до перехода на пути относительно папок
+разделов) переводятся в вид раздел/путь: uploads/12/3/file.pdf.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import StoredFile, Subject, Ticket, User
+from app.services.blob_store import link_to_blob
+from app.services.stored_files import (
+    KIND_CHAT,
+    KIND_MATERIAL,
+    KIND_SOLUTION,
+    KIND_SUBMISSION,
+    KIND_TICKET,
+    register_file,
+    storage_key,
+    storage_summary,
+)
+
+COMMIT_EVERY = 500
+
+
+def _files(folder):
+    """Файлы папки и ее подпапок: (путь, части пути относительно папки)"""
+    for root, _dirs, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(root, name)
+            yield path, os.path.relpath(path, folder).split(os.sep)
+
+
+def _int(value):
+    return int(value) if value.isdigit() else None
+
+
+def collect_files(config):
+    """Возвращает файлы хранилища: (путь, вид, владелец, предмет, тикет)"""
+    subjects = {row[0] for row in db.session.query(Subject.id)}
+    users = {row[0] for row in db.session.query(User.id)}
+    ticket_owners = dict(db.session.query(Ticket.id, Ticket.user_id))
+
+    for path, parts in _files(config["UPLOAD_FOLDER"]):
+        subject_id = _int(parts[0]) if len(parts) > 1 else None
+        if subject_id not in subjects:
+            continue
+        if len(parts) == 2:
+            kind = KIND_SOLUTION if parts[1].startswith(("solution_", "admin_solution_")) else KIND_MATERIAL
+            yield path, kind, None, subject_id, None
+        elif len(parts) == 3 and _int(parts[1]) in users:
+            yield path, KIND_SUBMISSION, int(parts[1]), subject_id, None
+
+    for path, parts in _files(config["CHAT_FILES_FOLDER"]):
+        if len(parts) == 2 and _int(parts[0]) in users:
+            yield path, KIND_CHAT, int(parts[0]), None, None
+
+    for path, parts in _files(config["TICKET_FILES_FOLDER"]):
+        if len(parts) == 2:
+            ticket_id = _int(parts[0])
+        else:
+            ticket_id = _int(parts[0].split("_", 1)[0])
+        if ticket_id in ticket_owners:
+            yield path, KIND_TICKET, ticket_owners[ticket_id], None, ticket_id
+
+
+def add_stored_files():
+    """Создает таблицу реестра и записывает в нее существующие файлы"""
+    app = create_app()
+
+    with app.app_context():
+        print("Создание таблицы stored_file...")
+
+        try:
+            StoredFile.__table__.create(db.engine, checkfirst=True)
+            print("✅ Таблица stored_file готова")
+        except Exception as e:
+            print(f"❌ Ошибка при создании таблицы: {e}")
+            return
+
+        print("Перевод абсолютных путей реестра в пути относительно папок разделов...")
+
+        converted = unmatched = 0
+        try:
+            for stored in StoredFile.query.all():
+                if not os.path.isabs(stored.path):
+                    continue
+                try:
+                    stored.path = storage_key(stored.path)
+                    converted += 1
+                except ValueError:
+                    # Файл вне текущих папок разделов: папка развертывания сменилась
+                    # или файл удален. Запись будет создана заново при обходе папок
+                    db.session.delete(stored)
+                    unmatched += 1
+            db.session.commit()
+        except Exception as e:
+            print(f"❌ Ошибка при переводе путей: {e}")
+            db.session.rollback()
+            return
+        print(f"✅ Переведено путей: {converted}, удалено записей вне папок разделов: {unmatched}")
+
+        print("Заполнение реестра файлов...")
+
+        known = dict(db.session.query(StoredFile.path, StoredFile.sha256))
+        added = skipped = 0
+        try:
+            for path, kind, owner_id, subject_id, ticket_id in collect_files(app.config):
+                sha256 = known.get(storage_key(path))
+                if sha256:
+                    link_to_blob(path, sha256)
+                    skipped += 1
+                    continue
+                register_file(path, kind, owner_id, subject_id, ticket_id)
+                added += 1
+                if added % COMMIT_EVERY == 0:
+                    db.session.commit()
+                    print(f"   📁 Записано файлов: {added}")
+            db.session.commit()
+        except Exception as e:
+            print(f"❌ Ошибка при заполнении реестра: {e}")
+            db.session.rollback()
+            return
+
+        summary = storage_summary()
+        print(f"✅ Записано файлов: {added}, уже были в реестре: {skipped}")
+        print(
+            f"💾 Файлы занимают {summary['disk']} байт вместо {summary['size']}: "
+            f"одинаковое содержимое хранится один раз"
+        )
+        print("\n🎉 Миграция завершена успешно!")
+
+if __name__ == '__main__':
+    add_stored_files()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Скрипт для добавления колонок attempts/last_error в журнал webhook'ов ЮKassa
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+
+def add_webhook_event_attempts():
+    """Добавляет колонки attempts/last_error в таблицу payment_webhook_event"""
+    app = create_app()
+
+    with app.app_context():
+        print("Добавление колонок attempts/last_error в таблицу payment_webhook_event...")
+
+        try:
+            from sqlalchemy import text
+            result = db.session.execute(text("PRAGMA table_info(payment_webhook_event)"))
+            columns = [row[1] for row in result.fetchall()]
+
+            if 'attempts' not in columns:
+                db.session.execute(text(
+                    "ALTER TABLE payment_webhook_event ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+                ))
+                print("✅ Колонка attempts добавлена")
+            else:
+                print("✅ Колонка attempts уже существует")
+
+            if 'last_error' not in columns:
+                db.session.execute(text("ALTER TABLE payment_webhook_event ADD COLUMN last_error TEXT"))
+                print("✅ Колонка last_error добавлена")
+            else:
+                print("✅ Колонка last_error уже существует")
+
+            db.session.commit()
+
+        except Exception as e:
+            print(f"❌ Ошибка при добавлении колонок: {e}")
+            db.session.rollback()
+            return
+
+        print("\n🎉 Миграция завершена успешно!")
+
+if __name__ == '__main__':
+    add_webhook_event_attempts()
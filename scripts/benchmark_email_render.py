@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк рендеринга писем с кодом
+
+Использование:
+    python scripts/benchmark_email_render.py
+    python scripts/benchmark_email_render.py --count 20000
+
+Сравнивает рендеринг скомпилированного Jinja-шаблона на каждое письмо с подстановкой
+кода в заранее отрендеренное письмо (render_email).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Бенчмарку не нужны фоновые задачи приложения
+for name in ("SUBSCRIPTION_SWEEP_INTERVAL", "PAYMENT_RECONCILE_INTERVAL", "PAYMENT_WEBHOOK_INTERVAL", "MAIL_QUEUE_INTERVAL"):
+    os.environ.setdefault(name, "0")
+
+from app import create_app
+from app.utils.email_service import render_email
+
+TEMPLATES = ("verification", "resend_verification", "password_reset")
+
+
+def measure(func, count: int) -> float:
+    """Возвращает среднее время одного вызова в микросекундах"""
+    started = time.perf_counter()
+    for i in range(count):
+        func(f"{i % 1000000:06d}")
+    return (time.perf_counter() - started) / count * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк рендеринга писем")
+    parser.add_argument("--count", type=int, default=5000, help="Писем на каждый шаблон")
+    args = parser.parse_args()
+
+    print("📊 БЕНЧМАРК РЕНДЕРИНГА ПИСЕМ")
+    print("=" * 60)
+
+    app = create_app()
+    with app.app_context():
+        for name in TEMPLATES:
+            html_template = app.jinja_env.get_template(f"email/{name}.html")
+            text_template = app.jinja_env.get_template(f"email/{name}.txt")
+
+            def full_render(code: str) -> None:
+                spaced_code = " ".join(code)
+                html_template.render(code=spaced_code)
+                text_template.render(code=spaced_code)
+
+            def cached_render(code: str) -> None:
+                render_email(name, code)
+
+            # Прогрев: компиляция шаблонов и заполнение кэша
+            full_render("000000")
+            cached_render("000000")
+
+            full = measure(full_render, args.count)
+            cached = measure(cached_render, args.count)
+            print(f"\n✉️  {name}")
+            print(f"   Полный рендеринг:   {full:8.1f} мкс/письмо")
+            print(f"   Подстановка кода:   {cached:8.1f} мкс/письмо")
+            print(f"   ⚡ Ускорение:        {full / cached:8.1f}x")
+
+    print("\n✅ Бенчмарк завершен!")
+
+
+if __name__ == "__main__":
+    main()
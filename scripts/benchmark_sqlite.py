@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк смешанной нагрузки чтения/записи на SQLite
+
+Использование:
+    python scripts/benchmark_sqlite.py
+    python scripts/benchmark_sqlite.py --seconds 10 --writers 4 --readers 8
+
+Запускает одинаковую нагрузку на временной БД с настройками SQLite по
+умолчанию и с профилем приложения (WAL, busy_timeout, mmap и т. д.)
+и сравнивает пропускную способность и число ошибок "database is locked".
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from app.services.sqlite_profile import install_sqlite_profile, sqlite_pragmas
+
+
+def run_workload(pragmas: dict, seconds: float, writers: int, readers: int) -> dict:
+    """Запускает нагрузку на новой временной БД и возвращает счетчики"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            pool_size=writers + readers,
+        )
+        install_sqlite_profile(engine, pragmas)
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE message (id INTEGER PRIMARY KEY, user_id INTEGER, body TEXT, created_at REAL)"
+            ))
+            connection.execute(text("CREATE INDEX ix_message_created_at ON message (created_at)"))
+
+        counts = {"reads": 0, "writes": 0, "locked": 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def add(key: str) -> None:
+            with lock:
+                counts[key] += 1
+
+        def writer(worker_id: int) -> None:
+            while time.monotonic() < deadline:
+                try:
+                    with engine.begin() as connection:
+                        connection.execute(
+                            text("INSERT INTO message (user_id, body, created_at) VALUES (:u, :b, :t)"),
+                            {"u": worker_id, "b": "x" * 200, "t": time.time()},
+                        )
+                    add("writes")
+                except OperationalError:
+                    add("locked")
+
+        def reader() -> None:
+            while time.monotonic() < deadline:
+                try:
+                    with engine.connect() as connection:
+                        connection.execute(text(
+                            "SELECT * FROM message ORDER BY created_at DESC LIMIT 150"
+                        )).fetchall()
+                    add("reads")
+                except OperationalError:
+                    add("locked")
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        threads += [threading.Thread(target=reader) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    counts["ops_per_sec"] = (counts["reads"] + counts["writes"]) / seconds
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк профиля SQLite")
+    parser.add_argument("--seconds", type=float, default=5, help="Длительность каждого прогона")
+    parser.add_argument("--writers", type=int, default=4, help="Потоков записи")
+    parser.add_argument("--readers", type=int, default=8, help="Потоков чтения")
+    args = parser.parse_args()
+
+    print("📊 БЕНЧМАРК ПРОФИЛЯ SQLITE")
+    print("=" * 60)
+
+    pragmas = sqlite_pragmas(create_app().config)
+    print(f"   Профиль: {pragmas}")
+
+    results = {}
+    for name, profile in (("По умолчанию", {}), ("Профиль приложения", pragmas)):
+        print(f"\n⏱️  {name}: {args.writers} писателей, {args.readers} читателей, {args.seconds:.0f} с")
+        result = run_workload(profile, args.seconds, args.writers, args.readers)
+        results[name] = result
+        print(f"   Чтений:   {result['reads']}")
+        print(f"   Записей:  {result['writes']}")
+        print(f"   Ошибок блокировки: {result['locked']}")
+        print(f"   Операций в секунду: {result['ops_per_sec']:.0f}")
+
+    before, after = results["По умолчанию"], results["Профиль приложения"]
+    if before["ops_per_sec"]:
+        print(f"\n⚡ Ускорение: {after['ops_per_sec'] / before['ops_per_sec']:.1f}x")
+    print("\n✅ Бенчмарк завершен!")
+
+
+if __name__ == "__main__":
+    main()
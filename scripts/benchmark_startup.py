@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк холодного запуска приложения: импорт, create_app и первый запрос
+
+Использование:
+    python3 scripts/benchmark_startup.py
+    python3 scripts/benchmark_startup.py --runs 10 --path /login --max-ms 800
+
+Каждый прогон выполняется в отдельном процессе, чтобы импорты были
+холодными. Сравнивает обычный запуск и FAST_START=True. С --max-ms
+завершается с кодом 1, если медиана быстрого запуска дольше порога.
+Перед быстрым запуском выполните scripts/bootstrap_app.py.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Замер выполняется в дочернем процессе
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+status = app.test_client().get(sys.argv[1]).status_code
+finished = time.perf_counter()
+print(json.dumps({
+    "import": (imported - started) * 1000,
+    "create_app": (created - imported) * 1000,
+    "first_request": (finished - created) * 1000,
+    "total": (finished - started) * 1000,
+    "status": status,
+    "modules": sorted(name for name in ("requests", "alembic") if name in sys.modules),
+}))
+"""
+
+STAGES = ("import", "create_app", "first_request", "total")
+
+
+def run_once(fast_start: bool, path: str) -> dict:
+    """Запускает приложение в новом процессе и возвращает замеры в миллисекундах"""
+    env = dict(os.environ, FAST_START=str(fast_start))
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, path],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк запуска приложения")
+    parser.add_argument("--runs", type=int, default=5, help="Прогонов для каждого режима")
+    parser.add_argument("--path", default="/login", help="URL первого запроса")
+    parser.add_argument("--max-ms", type=float, help="Порог медианы быстрого запуска, мс")
+    args = parser.parse_args()
+
+    print("📊 БЕНЧМАРК ЗАПУСКА ПРИЛОЖЕНИЯ")
+    print("=" * 60)
+
+    medians = {}
+    for name, fast_start in (("Обычный запуск", False), ("FAST_START=True", True)):
+        runs = [run_once(fast_start, args.path) for _ in range(args.runs)]
+        medians[name] = {stage: statistics.median(run[stage] for run in runs) for stage in STAGES}
+        print(f"\n⏱️  {name}: {args.runs} прогонов, GET {args.path} -> {runs[-1]['status']}")
+        for stage in STAGES:
+            print(f"   {stage:<14} {medians[name][stage]:8.1f} мс")
+        print(f"   Загружены при старте: {', '.join(runs[-1]['modules']) or 'нет'}")
+
+    before, after = medians["Обычный запуск"]["total"], medians["FAST_START=True"]["total"]
+    print(f"\n⚡ Ускорение: {before / after:.1f}x ({before - after:.0f} мс)")
+
+    if args.max_ms is not None and after > args.max_ms:
+        print(f"❌ Быстрый запуск {after:.0f} мс дольше порога {args.max_ms:.0f} мс")
+        sys.exit(1)
+    print("\n✅ Бенчмарк завершен!")
+
+
+if __name__ == "__main__":
+    main()
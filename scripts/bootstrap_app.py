@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Скрипт подготовки окружения перед запуском приложения с FAST_START=True
+
+Использование:
+    python3 scripts/bootstrap_app.py
+
+Создает директории загрузок, логов и файла SQLite, проверяет подключение
+к базе данных и создает недостающие таблицы. Новые колонки и индексы
+существующих таблиц добавляют скрипты scripts/add_*.py.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Подготовку выполняет обычный запуск фабрики приложения
+os.environ["FAST_START"] = "False"
+
+from app import create_app, db
+
+
+def bootstrap_app() -> None:
+    """Создает директории и таблицы приложения"""
+    print("🚀 ПОДГОТОВКА ОКРУЖЕНИЯ ПРИЛОЖЕНИЯ")
+    print("=" * 60)
+
+    app = create_app()
+    for key in ("UPLOAD_FOLDER", "CHAT_FILES_FOLDER", "TICKET_FILES_FOLDER", "LOG_FILE"):
+        print(f"✅ {key}: {app.config[key]}")
+
+    with app.app_context():
+        print(f"✅ БД: {db.engine.url.render_as_string(hide_password=True)}")
+        tables = db.inspect(db.engine).get_table_names()
+    print(f"✅ Таблиц в базе данных: {len(tables)}")
+    print("\n🎉 Окружение готово, приложение можно запускать с FAST_START=True")
+
+
+if __name__ == "__main__":
+    bootstrap_app()
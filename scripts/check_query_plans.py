@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Скрипт для проверки планов частых запросов приложения
+
+Использование:
+    python3 scripts/check_query_plans.py
+
+Для каждого запроса из app/views.py выполняет EXPLAIN QUERY PLAN и
+завершается с кодом 1, если хотя бы один запрос читает таблицу целиком
+(SCAN без индекса). Индексы добавляет scripts/add_query_indexes.py.
+"""
+
+import os
+import re
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import joinedload
+
+from app import create_app, db
+from app.models import (
+    Group,
+    ChatMessage,
+    EmailVerification,
+    Material,
+    Notification,
+    PasswordReset,
+    Payment,
+    ShortLink,
+    StoredFile,
+    Submission,
+    Ticket,
+    TicketFile,
+    TicketMessage,
+    User,
+)
+from app.services.payment_reconciliation import RECONCILE_STATUSES
+from app.services.stored_files import user_files_condition
+from app.services.user_directory import user_directory_query
+
+# Полное чтение таблицы: "SCAN payment", но не "SCAN payment USING INDEX ..."
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def query_shapes():
+    """Запросы в том виде, в котором их выполняют представления и сервисы"""
+    now = datetime.utcnow()
+    return [
+        # Платежи
+        ("Последний платеж пользователя",
+         Payment.query.filter_by(user_id=1).order_by(Payment.created_at.desc()).limit(1)),
+        ("Платеж пользователя по ID ЮKassa",
+         Payment.query.filter_by(yookassa_payment_id="x", user_id=1).limit(1)),
+        ("Успешный платеж пользователя",
+         Payment.query.filter_by(user_id=1, status="succeeded").limit(1)),
+        ("Зависшие платежи для сверки",
+         Payment.query.filter(Payment.status.in_(RECONCILE_STATUSES), Payment.created_at <= now)),
+        # Уведомления
+        ("Непрочитанные уведомления",
+         Notification.query.filter_by(user_id=1, is_read=False).order_by(Notification.created_at.desc())),
+        # Чат
+        ("Последние сообщения чата",
+         ChatMessage.query.order_by(ChatMessage.created_at.desc()).limit(150)),
+        # Материалы и сдачи
+        ("Лекции предмета",
+         Material.query.filter_by(subject_id=1, type="lecture")),
+        ("Задания предмета со сдачами",
+         Material.query.options(joinedload(Material.submissions)).filter_by(subject_id=1, type="assignment")),
+        ("Сдача пользователя по заданию",
+         Submission.query.filter_by(user_id=1, material_id=1).limit(1)),
+        # Тикеты
+        ("Список тикетов",
+         Ticket.query.join(User, Ticket.user_id == User.id).order_by(Ticket.created_at.desc())),
+        ("Тикеты пользователя",
+         Ticket.query.filter_by(user_id=1)),
+        ("Сообщения тикета",
+         TicketMessage.query.filter_by(ticket_id=1)),
+        ("Ответ администратора в тикете",
+         TicketMessage.query.filter_by(ticket_id=1, is_admin=True).limit(1)),
+        ("Файлы тикета",
+         TicketFile.query.filter_by(ticket_id=1)),
+        # Коды подтверждения и восстановления
+        ("Код подтверждения email",
+         EmailVerification.query.filter_by(id=1, code="000000", is_used=False).limit(1)),
+        ("Код восстановления пароля",
+         PasswordReset.query.filter_by(code="AAAAAAAA", is_used=False).filter(PasswordReset.expires_at > now).limit(1)),
+        # Админка пользователей
+        ("Страница пользователей после курсора",
+         user_directory_query().where(User.id > 100).order_by(User.id).limit(51)),
+        ("Страница пользователей группы",
+         user_directory_query(group_id=1).order_by(User.id).limit(51)),
+        ("Страница пользователей по имени",
+         user_directory_query(flags={"admin": True})
+         .where(User.username > "m").order_by(User.username).limit(51)),
+        ("Страница коротких ссылок",
+         ShortLink.query.filter(ShortLink.id < 100).order_by(ShortLink.id.desc()).limit(51)),
+        ("Группы для фильтра", Group.query.order_by(Group.name)),
+        # Удаление пользователя администратором
+        ("Удаление уведомлений пользователя", delete(Notification).where(Notification.user_id == 1)),
+        ("Удаление сообщений тикетов пользователя", delete(TicketMessage).where(TicketMessage.user_id == 1)),
+        ("Удаление тикетов пользователя", delete(Ticket).where(Ticket.user_id == 1)),
+        ("Удаление кодов подтверждения пользователя", delete(EmailVerification).where(EmailVerification.user_id == 1)),
+        ("Удаление платежей пользователя", delete(Payment).where(Payment.user_id == 1)),
+        ("Удаление сдач пользователя", delete(Submission).where(Submission.user_id == 1)),
+        ("Удаление сообщений чата пользователя", delete(ChatMessage).where(ChatMessage.user_id == 1)),
+        ("Удаление старых кодов восстановления",
+         delete(PasswordReset).where(PasswordReset.email == "x", PasswordReset.is_used.is_(False))),
+        # Реестр файлов
+        ("Файлы удаляемых пользователей", select(StoredFile.path).where(user_files_condition([1, 2]))),
+        ("Файлы предмета", select(StoredFile.path).where(StoredFile.subject_id == 1)),
+        ("Файлы тикета из реестра", select(StoredFile.path).where(StoredFile.ticket_id == 1)),
+        ("Место, занятое пользователями страницы",
+         select(StoredFile.owner_id, func.sum(StoredFile.size))
+         .where(StoredFile.owner_id.in_([1, 2])).group_by(StoredFile.owner_id)),
+    ]
+
+
+def explain(statement) -> list:
+    """Возвращает строки EXPLAIN QUERY PLAN для запроса"""
+    if hasattr(statement, "statement"):
+        statement = statement.statement
+    connection = db.session.connection()
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")
+    return [row[-1] for row in rows]
+
+
+def check_query_plans() -> bool:
+    """Проверяет планы всех запросов. Возвращает True, если полных сканирований нет"""
+    print("🔍 ПРОВЕРКА ПЛАНОВ ЗАПРОСОВ")
+    print("=" * 60)
+
+    app = create_app()
+    failed = []
+    with app.app_context():
+        if db.engine.dialect.name != "sqlite":
+            print("⚠️ Проверка поддерживает только SQLite")
+            return True
+
+        for name, statement in query_shapes():
+            plan = explain(statement)
+            scans = [m.group(1) for m in map(FULL_SCAN.match, plan) if m]
+            print(f"\n{'❌' if scans else '✅'} {name}")
+            for line in plan:
+                print(f"   {line}")
+            if scans:
+                failed.append((name, scans))
+
+    print("\n" + "=" * 60)
+    if failed:
+        for name, scans in failed:
+            print(f"❌ {name}: полное сканирование {', '.join(scans)}")
+        print("\nЗапустите scripts/add_query_indexes.py и повторите проверку.")
+        return False
+
+    print("✅ Все запросы используют индексы")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_query_plans() else 1)
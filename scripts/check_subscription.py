@@ -9,7 +9,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from datetime import datetime
 from app import create_app, db
-from app.models import User
+from app.models import User, ACCESS_UNLIMITED
 
 def check_subscription(username):
     """Проверяет подписку пользователя"""
@@ -29,29 +29,28 @@ def check_subscription(username):
         print(f"✅ Подтвержден: {'Да' if user.is_verified else 'Нет'}")
         print("-" * 40)
         
-        # Проверяем подписку
-        if user.is_subscribed:
+        # Проверяем право доступа по денормализованной колонке access_until
+        kind_labels = {
+            'trial': '🎁 Тип: Пробная подписка',
+            'manual': '🔧 Тип: Выдана вручную администратором',
+            'paid': '💳 Тип: Оплачена через ЮKassa',
+        }
+        
+        if user.has_access():
             print("🎫 Статус подписки: АКТИВНА")
             
-            if user.subscription_expires:
-                now = datetime.utcnow()
-                days_left = (user.subscription_expires - now).days
-                
-                print(f"📅 Дата окончания: {user.subscription_expires.strftime('%d.%m.%Y %H:%M:%S')}")
-                print(f"⏰ Осталось дней: {days_left}")
-                
-                if days_left > 0:
-                    print("✅ Подписка действительна")
-                else:
-                    print("❌ Подписка истекла")
-            else:
+            if user.access_until == ACCESS_UNLIMITED:
                 print("📅 Дата окончания: БЕЗ ОГРАНИЧЕНИЙ")
-                print("✅ Подписка действительна")
-            
-            if user.is_manual_subscription:
-                print("🔧 Тип: Выдана вручную администратором")
             else:
-                print("💳 Тип: Оплачена через ЮKassa")
+                days_left = (user.access_until - datetime.utcnow()).days
+                print(f"📅 Дата окончания: {user.access_until.strftime('%d.%m.%Y %H:%M:%S')}")
+                print(f"⏰ Осталось дней: {days_left}")
+            print("✅ Подписка действительна")
+            print(kind_labels.get(user.access_kind, f"Тип: {user.access_kind}"))
+        elif user.access_until:
+            print("🎫 Статус подписки: ИСТЕКЛА")
+            print(f"📅 Дата окончания: {user.access_until.strftime('%d.%m.%Y %H:%M:%S')}")
+            print(kind_labels.get(user.access_kind, f"Тип: {user.access_kind}"))
         else:
             print("🎫 Статус подписки: НЕАКТИВНА")
             print("❌ Пользователь не имеет подписки")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Скрипт для снятия истекших пробных, оплаченных и ручных подписок.
+
+Использование:
+    python3 scripts/expire_subscriptions.py                 # однократный запуск
+    python3 scripts/expire_subscriptions.py --loop          # запуск каждые 600 секунд
+    python3 scripts/expire_subscriptions.py --loop --interval 60
+
+Подходит для cron/systemd timer. Встроенная фоновая очистка в процессе
+приложения управляется переменной SUBSCRIPTION_SWEEP_INTERVAL.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.subscription_sweeper import expire_due_subscriptions
+
+
+def sweep_once() -> None:
+    """Выполняет одну очистку и печатает результат."""
+    counts = expire_due_subscriptions()
+    print(
+        f"✅ Снято пробных подписок: {counts['trials']}, "
+        f"подписок: {counts['subscriptions']}, "
+        f"записей доступа: {counts['access']}"
+    )
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Снятие истекших подписок cysu")
+    parser.add_argument("--loop", action="store_true", help="Запускать периодически")
+    parser.add_argument("--interval", type=int, default=600, help="Интервал в секундах для --loop")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> None:
+    args = parse_args(argv)
+    app = create_app()
+    with app.app_context():
+        sweep_once()
+        while args.loop:
+            time.sleep(args.interval)
+            sweep_once()
+
+
+if __name__ == "__main__":
+    try:
+        main(sys.argv[1:])
+    except KeyboardInterrupt:
+        print("\n❌ Остановлено пользователем")
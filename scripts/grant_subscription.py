@@ -7,7 +7,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from datetime import datetime, date
+from datetime import datetime
 from app import create_app, db
 from app.models import User
 
@@ -27,8 +27,8 @@ def grant_subscription(username):
         print(f"Email: {user.email}")
         print(f"Текущий статус подписки: {'Активна' if user.is_subscribed else 'Неактивна'}")
         
-        if user.subscription_expires:
-            print(f"Текущая дата окончания: {user.subscription_expires.strftime('%d.%m.%Y')}")
+        if user.access_until:
+            print(f"Текущий доступ до: {user.access_until.strftime('%d.%m.%Y')} ({user.access_kind})")
         
         # Устанавливаем подписку до 99 года (2099-12-31)
         subscription_end = datetime(2099, 12, 31, 23, 59, 59)
@@ -36,12 +36,13 @@ def grant_subscription(username):
         user.is_subscribed = True
         user.subscription_expires = subscription_end
         user.is_manual_subscription = True  # Подписка выдана вручную
+        user.refresh_access()
         
         db.session.commit()
         
         print(f"✅ Подписка выдана пользователю {user.username}")
-        print(f"📅 Дата окончания: {subscription_end.strftime('%d.%m.%Y')}")
-        print(f"⏰ Время окончания: {subscription_end.strftime('%H:%M:%S')}")
+        print(f"📅 Доступ до: {user.access_until.strftime('%d.%m.%Y')}")
+        print(f"⏰ Время окончания: {user.access_until.strftime('%H:%M:%S')}")
         
         return True
 
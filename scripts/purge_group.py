@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Скрипт для удаления всех пользователей группы (например, выпускников)
+
+Использование:
+    python3 scripts/purge_group.py 12
+    python3 scripts/purge_group.py 12 --batch-size 1000 --delete-group
+
+Пользователи удаляются пачками по USER_DELETE_BATCH_SIZE вместе с решениями,
+платежами, тикетами, уведомлениями и сообщениями чата. Администраторы
+не удаляются. Файлы пользователей удаляются с диска сразу после каждой пачки.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import Group, User
+from app.services.user_deletion import purge_group_users
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Удаление всех пользователей группы")
+    parser.add_argument("group_id", type=int, help="ID группы")
+    parser.add_argument("--batch-size", type=int, help="Пользователей в одной транзакции")
+    parser.add_argument(
+        "--delete-group",
+        action="store_true",
+        help="Удалить саму группу, если в ней не осталось пользователей",
+    )
+    return parser.parse_args(argv)
+
+
+def print_progress(done: int, total: int) -> None:
+    print(f"   🗑️ Удалено пользователей: {done} из {total}")
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    app = create_app()
+    with app.app_context():
+        group = db.session.get(Group, args.group_id)
+        if group is None:
+            print(f"❌ Группа {args.group_id} не найдена")
+            return 1
+
+        print(f"👥 Удаление пользователей группы '{group.name}' (ID: {group.id})")
+        counts = purge_group_users(group.id, args.batch_size, print_progress)
+        print(f"✅ Удалено пользователей: {counts['users']}")
+        for name, count in sorted(counts.items()):
+            if name != "users":
+                print(f"   {name}: {count}")
+
+        if args.delete_group:
+            if User.query.filter_by(group_id=group.id).first() is not None:
+                print("⚠️ В группе остались администраторы, группа не удалена")
+            else:
+                db.session.delete(group)
+                db.session.commit()
+                print(f"✅ Группа '{group.name}' удалена")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Скрипт для сверки зависших платежей со статусами в ЮKassa.
+
+Использование:
+    python3 scripts/reconcile_payments.py
+    python3 scripts/reconcile_payments.py --older-than 30 --workers 16 --batch-size 100
+
+Приложение также выполняет сверку в фоне каждые PAYMENT_RECONCILE_INTERVAL секунд.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.payment_reconciliation import reconcile_pending_payments
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Сверка зависших платежей cysu")
+    parser.add_argument("--older-than", type=int, default=None, help="Возраст платежа в минутах")
+    parser.add_argument("--workers", type=int, default=None, help="Параллельных запросов к API")
+    parser.add_argument("--batch-size", type=int, default=None, help="Платежей в одной транзакции")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> None:
+    args = parse_args(argv)
+    app = create_app()
+    with app.app_context():
+        counts = reconcile_pending_payments(
+            older_than_minutes=args.older_than,
+            max_workers=args.workers,
+            batch_size=args.batch_size,
+        )
+        client = app.extensions.get("yookassa_client")
+    print(
+        f"✅ Проверено: {counts['checked']}, обновлено: {counts['updated']}, "
+        f"активировано подписок: {counts['activated']}, ошибок: {counts['errors']}"
+    )
+    if client is not None:
+        print(f"⏱️ Задержки API ЮKassa: {client.latency.summary()}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
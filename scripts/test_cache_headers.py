@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Скрипт для проверки заголовков кэширования ответов EduFlow
+
+Использование:
+    python scripts/test_cache_headers.py
+
+Через тестовый клиент запрашивает ответы каждого класса политики
+кэширования (services/http_cache.py): статику с хэшем и без, закрытый
+файл через /files, HTML-страницу, JSON и страницу ошибки. Проверяет
+Cache-Control, ETag/Last-Modified и ответ 304 на условный запрос.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+FAILED = []
+
+
+def check(name: str, passed: bool, detail: str = "") -> None:
+    """Печатает результат проверки и запоминает провалы"""
+    print(f"   {'✅' if passed else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not passed:
+        FAILED.append(name)
+
+
+def login(client, user_id) -> None:
+    """Входит в тестовом клиенте под пользователем (None — выход)"""
+    with client.session_transaction() as session:
+        session.clear()
+        if user_id is not None:
+            session["_user_id"] = str(user_id)
+            session["_fresh"] = True
+
+
+def check_static(client, app) -> None:
+    """Статика без версии: публичный кэш, ETag, Last-Modified и 304"""
+    print("\n📦 Статика без версии")
+    response = client.get("/static/css/style.css")
+    cache_control = response.headers.get("Cache-Control", "")
+    check(
+        "public, max-age=STATIC_CACHE_MAX_AGE",
+        cache_control == f"public, max-age={app.config['STATIC_CACHE_MAX_AGE']}",
+        cache_control,
+    )
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    check("ETag и Last-Modified", bool(etag and last_modified))
+    response.close()
+
+    response = client.get("/static/css/style.css", headers={"If-None-Match": etag})
+    check("304 на If-None-Match", response.status_code == 304, str(response.status_code))
+    response = client.get("/static/css/style.css", headers={"If-Modified-Since": last_modified})
+    check("304 на If-Modified-Since", response.status_code == 304, str(response.status_code))
+
+
+def check_versioned_static(client, app) -> None:
+    """Статика из static_url(): неизменяемый кэш на год, только для хэша содержимого"""
+    print("\n📌 Статика с хэшем содержимого")
+    from app.services.static_manifest import static_url
+
+    with app.test_request_context():
+        url = static_url("css/style.css")
+    check("static_url() добавляет хэш", "?v=" in url, url)
+    response = client.get(url)
+    cache_control = response.headers.get("Cache-Control", "")
+    check("public, max-age=31536000, immutable", cache_control == "public, max-age=31536000, immutable", cache_control)
+    response.close()
+
+    response = client.get("/static/css/style.css?v=stale")
+    cache_control = response.headers.get("Cache-Control", "")
+    check(
+        "Чужая версия не кэшируется навсегда",
+        cache_control == f"public, max-age={app.config['STATIC_CACHE_MAX_AGE']}",
+        cache_control,
+    )
+    response.close()
+
+
+def check_upload(client, app, admin_id) -> None:
+    """Закрытый файл через /files: только кэш браузера с проверкой"""
+    print("\n🔒 Закрытый файл")
+    from app import db
+    from app.models import StoredFile
+    from app.services.stored_files import KIND_MATERIAL, register_file
+
+    with app.app_context():
+        # Файл и его копия в хранилище содержимого — во временной папке
+        temp_root = tempfile.mkdtemp()
+        app.config["UPLOAD_FOLDER"] = temp_root
+        app.config["BLOB_FOLDER"] = os.path.join(temp_root, "blobs")
+        path = os.path.join(temp_root, "cache_test.pdf")
+        with open(path, "wb") as f:
+            f.write(b"%PDF cache test")
+        stored_path = register_file(path, KIND_MATERIAL).path
+        db.session.commit()
+
+    try:
+        login(client, admin_id)
+        response = client.get("/files/uploads/cache_test.pdf")
+        cache_control = response.headers.get("Cache-Control", "")
+        check("Ответ 200", response.status_code == 200, str(response.status_code))
+        check("private, no-cache", cache_control == "private, no-cache", cache_control)
+        etag = response.headers.get("ETag")
+        check("ETag и Last-Modified", bool(etag and response.headers.get("Last-Modified")))
+        response.close()
+        response = client.get("/files/uploads/cache_test.pdf", headers={"If-None-Match": etag})
+        check("304 на If-None-Match", response.status_code == 304, str(response.status_code))
+    finally:
+        login(client, None)
+        with app.app_context():
+            StoredFile.query.filter_by(path=stored_path).delete()
+            db.session.commit()
+        shutil.rmtree(temp_root)
+
+
+def check_dynamic(client, admin_id) -> None:
+    """Страницы и JSON: закрытый кэш, ETag по телу и 304"""
+    print("\n📄 Страница")
+    response = client.get("/wiki")
+    cache_control = response.headers.get("Cache-Control", "")
+    check("private, no-cache", cache_control == "private, no-cache", cache_control)
+    etag = response.headers.get("ETag")
+    check("ETag по телу ответа", bool(etag))
+    response = client.get("/wiki", headers={"If-None-Match": etag})
+    check("304 на If-None-Match", response.status_code == 304 and not response.data, str(response.status_code))
+
+    print("\n🚫 Ошибка")
+    response = client.get("/no-such-page-for-cache-test")
+    cache_control = response.headers.get("Cache-Control", "")
+    check("private, no-cache без ETag", cache_control == "private, no-cache" and "ETag" not in response.headers, cache_control)
+
+    if admin_id is None:
+        return
+    print("\n🧾 JSON")
+    login(client, admin_id)
+    response = client.get("/api/admin/users")
+    cache_control = response.headers.get("Cache-Control", "")
+    check("private, no-cache", cache_control == "private, no-cache", cache_control)
+    etag = response.headers.get("ETag")
+    response = client.get("/api/admin/users", headers={"If-None-Match": etag})
+    check("304 на If-None-Match", bool(etag) and response.status_code == 304, str(response.status_code))
+    login(client, None)
+
+
+def test_cache_headers() -> None:
+    """Основная функция проверки заголовков кэширования"""
+    print("🗂️ ПРОВЕРКА ЗАГОЛОВКОВ КЭШИРОВАНИЯ")
+    print("=" * 60)
+
+    from app import create_app
+    from app.models import User
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        admin = User.query.filter_by(is_admin=True).first()
+        admin_id = admin.id if admin else None
+
+    check_static(client, app)
+    check_versioned_static(client, app)
+    if admin_id is None:
+        print("\n⚠️ Нет администратора: проверки закрытого файла и JSON пропущены")
+    else:
+        check_upload(client, app, admin_id)
+    check_dynamic(client, admin_id)
+
+    print("\n" + "=" * 60)
+    if FAILED:
+        print(f"❌ Провалено проверок: {len(FAILED)}")
+        sys.exit(1)
+    print("🎉 Все проверки пройдены")
+
+
+if __name__ == "__main__":
+    test_cache_headers()
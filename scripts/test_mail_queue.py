@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования очереди исходящих писем на локальном SMTP-приемнике
+
+Использование:
+    pip install aiosmtpd
+    python scripts/test_mail_queue.py
+
+Поднимает SMTP-приемник aiosmtpd, ставит письма в очередь и проверяет,
+что воркер отправляет их одним соединением и удаляет текст отправленных
+писем, при недоступном сервере откладывает отправку с повтором, а старые
+письма удаляются очисткой очереди.
+"""
+
+import os
+import sys
+import socket
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    print("❌ Для теста нужен aiosmtpd: pip install aiosmtpd")
+    sys.exit(1)
+
+TEST_RECIPIENT_DOMAIN = "mailqueue.test"
+
+
+class SinkHandler:
+    """Приемник, запоминающий полученные письма и число SMTP-сессий"""
+
+    def __init__(self) -> None:
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port() -> int:
+    """Возвращает свободный локальный порт"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_mail_queue() -> None:
+    """Основная функция тестирования очереди писем"""
+    print("📬 ТЕСТИРОВАНИЕ ОЧЕРЕДИ ПИСЕМ")
+    print("=" * 60)
+
+    handler = SinkHandler()
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+
+    os.environ.update(
+        {
+            "MAIL_SERVER": "127.0.0.1",
+            "MAIL_PORT": str(port),
+            "MAIL_USE_TLS": "False",
+            "MAIL_USE_SSL": "False",
+            "MAIL_USERNAME": "",
+            "MAIL_PASSWORD": "",
+            "MAIL_DEFAULT_SENDER": "noreply@" + TEST_RECIPIENT_DOMAIN,
+            # Воркер запускаем вручную, чтобы видеть результат каждого прохода
+            "MAIL_QUEUE_INTERVAL": "0",
+        }
+    )
+
+    from flask_mail import Message
+    from app import create_app, db
+    from app.models import OutboundEmail
+    from app.services import mail_queue
+    from app.utils.email_service import EmailService
+
+    app = create_app()
+    # Без воркера письма отправляются сразу только в режиме тестирования
+    app.testing = True
+    recipient_filter = OutboundEmail.recipient.like(f"%@{TEST_RECIPIENT_DOMAIN}")
+
+    with app.app_context():
+        try:
+            # Письма копятся в очереди, пока воркер не запущен
+            original_process = mail_queue.process_mail_queue
+            mail_queue.process_mail_queue = lambda batch_size=None: {}
+            try:
+                for i in range(5):
+                    EmailService.send_verification_email(
+                        f"user{i}@{TEST_RECIPIENT_DOMAIN}", f"{i:06d}"
+                    )
+            finally:
+                mail_queue.process_mail_queue = original_process
+
+            queued = OutboundEmail.query.filter(recipient_filter, OutboundEmail.status == "pending").count()
+            print(f"   {'✅' if queued == 5 else '❌'} В очереди писем: {queued}")
+
+            counts = mail_queue.process_mail_queue(batch_size=2)
+            print(f"   📊 Результат: {counts}")
+            checks = [
+                ("Все письма отправлены", counts["sent"] == 5),
+                ("Приемник получил 5 писем", len(handler.messages) == 5),
+                ("Использовано одно SMTP-соединение", len(handler.sessions) == 1),
+                (
+                    "Текст отправленных писем удален",
+                    OutboundEmail.query.filter(
+                        recipient_filter,
+                        OutboundEmail.status == "sent",
+                        (OutboundEmail.html_body.isnot(None)) | (OutboundEmail.text_body.isnot(None)),
+                    ).count() == 0,
+                ),
+            ]
+            for name, passed in checks:
+                print(f"   {'✅' if passed else '❌'} {name}")
+
+            # Сервер недоступен: письмо откладывается с повтором
+            controller.stop()
+            mail_queue.enqueue_email(
+                Message(
+                    subject="Повтор",
+                    recipients=[f"retry@{TEST_RECIPIENT_DOMAIN}"],
+                    body="test",
+                )
+            )
+            email = OutboundEmail.query.filter_by(recipient=f"retry@{TEST_RECIPIENT_DOMAIN}").first()
+            retried = email.status == "pending" and email.attempts == 1 and email.last_error
+            print(f"   {'✅' if retried else '❌'} Письмо отложено после ошибки подключения")
+
+            # Отправленные письма старше срока хранения удаляются
+            OutboundEmail.query.filter(recipient_filter, OutboundEmail.status == "sent").update(
+                {"created_at": datetime.utcnow() - timedelta(days=app.config["MAIL_QUEUE_RETENTION_DAYS"] + 1)},
+                synchronize_session=False,
+            )
+            db.session.commit()
+            mail_queue.purge_mail_queue()
+            left = OutboundEmail.query.filter(recipient_filter).count()
+            print(f"   {'✅' if left == 1 else '❌'} Старые отправленные письма удалены, в очереди: {left}")
+
+        finally:
+            OutboundEmail.query.filter(recipient_filter).delete(synchronize_session=False)
+            db.session.commit()
+            if controller._thread is not None:
+                controller.stop()
+
+    print("\n✅ Тестирование очереди писем завершено!")
+
+
+if __name__ == "__main__":
+    test_mail_queue()
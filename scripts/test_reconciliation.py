@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования сверки зависших платежей на локальной заглушке API ЮKassa
+
+Использование:
+    python scripts/test_reconciliation.py
+
+Поднимает HTTP-заглушку /v3/payments/{id}, создает тестовые платежи
+и проверяет, что сверка обновляет статусы и активирует подписки.
+"""
+
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Статусы, которые вернет заглушка
+STUB_PAYMENTS = {
+    "test_reconcile_ok": {"status": "succeeded", "paid": True},
+    "test_reconcile_cancel": {"status": "canceled", "paid": False},
+    "test_reconcile_wait": {"status": "pending", "paid": False},
+}
+
+
+class YooKassaStubHandler(BaseHTTPRequestHandler):
+    """Заглушка GET /v3/payments/{id}"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        payment_id = self.path.rstrip("/").split("/")[-1]
+        payment = STUB_PAYMENTS.get(payment_id)
+        if payment is None:
+            body = b"{}"
+            self.send_response(404)
+        else:
+            body = json.dumps({"id": payment_id, **payment}).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_stub() -> ThreadingHTTPServer:
+    """Запускает заглушку на свободном порту"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), YooKassaStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_reconciliation() -> None:
+    """Основная функция тестирования сверки"""
+    print("🔄 ТЕСТИРОВАНИЕ СВЕРКИ ПЛАТЕЖЕЙ")
+    print("=" * 60)
+
+    server = start_stub()
+    os.environ["YOOKASSA_API_URL"] = f"http://127.0.0.1:{server.server_port}/v3"
+    os.environ["YOOKASSA_SHOP_ID"] = "test-shop"
+    os.environ["YOOKASHA_SECRET_KEY"] = "test-secret"
+    os.environ["PAYMENT_RECONCILE_INTERVAL"] = "0"
+
+    from app import create_app, db
+    from app.models import User, Payment
+    from app.services.payment_reconciliation import reconcile_pending_payments
+
+    app = create_app()
+
+    with app.app_context():
+        user = User(
+            username="test_reconcile_user",
+            email="test_reconcile@test.com",
+            password="test",
+        )
+        db.session.add(user)
+        db.session.commit()
+
+        created_at = datetime.utcnow() - timedelta(hours=1)
+        for payment_id in STUB_PAYMENTS:
+            db.session.add(
+                Payment(
+                    user_id=user.id,
+                    yookassa_payment_id=payment_id,
+                    amount=app.config["SUBSCRIPTION_PRICES"]["1"],
+                    status="pending",
+                    created_at=created_at,
+                )
+            )
+        db.session.commit()
+
+        try:
+            counts = reconcile_pending_payments(older_than_minutes=5, max_workers=3, batch_size=2)
+            print(f"   📊 Результат: {counts}")
+
+            statuses = {
+                p.yookassa_payment_id: p.status
+                for p in Payment.query.filter_by(user_id=user.id).all()
+            }
+            db.session.refresh(user)
+
+            checks = [
+                ("Проверены все платежи", counts["checked"] == len(STUB_PAYMENTS)),
+                ("Успешный платеж обновлен", statuses["test_reconcile_ok"] == "succeeded"),
+                ("Отмененный платеж обновлен", statuses["test_reconcile_cancel"] == "canceled"),
+                ("Ожидающий платеж не изменен", statuses["test_reconcile_wait"] == "pending"),
+                ("Подписка активирована", user.is_subscribed and user.has_access()),
+            ]
+            for name, passed in checks:
+                print(f"   {'✅' if passed else '❌'} {name}")
+
+            # Повторная сверка не должна ничего менять
+            repeat = reconcile_pending_payments(older_than_minutes=5)
+            print(f"   {'✅' if repeat['updated'] == 0 else '❌'} Повторная сверка идемпотентна")
+
+        finally:
+            Payment.query.filter_by(user_id=user.id).delete()
+            db.session.delete(user)
+            db.session.commit()
+            server.shutdown()
+
+    print("\n✅ Тестирование сверки платежей завершено!")
+
+
+if __name__ == "__main__":
+    test_reconciliation()